@@ -1,9 +1,31 @@
 import os
-from flask import Flask, jsonify, request
+import atexit
+from flask import Flask, Response, jsonify, request, send_file
 from flask_cors import CORS
+from werkzeug.exceptions import RequestedRangeNotSatisfiable
 from dotenv import load_dotenv
 from supabase import create_client
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+import instrumentation
+from jobs import create_job_queue
+from notifications import NotificationDispatcher, create_coalescer
+from fanout import run_concurrently
+from counters import create_counters
+from view_log import create_view_buffer
+from shared_link_views import create_shared_link_views
+from caching import TTLCache
+from signed_urls import create_signed_url_cache, storage_path
+from pdf_cache import create_pdf_cache, download_source, signed_url_source
+from categories import create_category_registry
+from http_cache import conditional_json
+from response_cache import create_response_cache
+from encoding import create_response_encoder
+from pagination import PaperListing
+from search_index import FACETS, SORTS, create_paper_search
+from visibility import create_viewer_contexts
+from permissions import create_permission_resolver
+from loaders import create_author_loader, create_profile_loader
+from auth import InvalidToken, create_authentication
 
 # Load environment variables
 load_dotenv()
@@ -11,9 +33,104 @@ load_dotenv()
 # Initialize Supabase client
 supabase_url = os.environ.get("SUPABASE_URL")
 supabase_key = os.environ.get("SUPABASE_KEY")
-supabase = create_client(supabase_url, supabase_key)
+
+USE_LOCAL_DATA = os.environ.get("AGORA_DATA_BACKEND") == "local"
+
+if USE_LOCAL_DATA:
+    # In-memory stand-in for offline profiling and load tests
+    from local_supabase import create_local_client
+    supabase = create_local_client()
+else:
+    supabase = create_client(supabase_url, supabase_key)
+
+# Time every upstream call and attribute it to the calling endpoint
+supabase = instrumentation.InstrumentedClient(supabase)
+
+# Create papers and their author rows atomically through the
+# create_paper_with_authors RPC (see sql/create_paper_with_authors.sql)
+USE_PAPER_RPC = os.environ.get("AGORA_PAPER_RPC") == "1"
+
+# Browser cache lifetime for published PDFs served by the PDF proxy
+PUBLISHED_PDF_MAX_AGE = int(os.environ.get("AGORA_PUBLISHED_PDF_MAX_AGE_SECONDS", 300))
+
+# Background workers for side effects that don't need to block a response
+job_queue = create_job_queue()
+
+# Profiles and paper author lists, batched into one query per table and cached
+profile_loader = create_profile_loader(supabase)
+author_loader = create_author_loader(supabase)
+
+# Fan out author notifications in bulk, off the request path, merging
+# repeated likes/comments/feedback on the same paper
+notifier = NotificationDispatcher(
+    supabase,
+    job_queue,
+    create_coalescer(supabase, job_queue),
+    profiles=profile_loader,
+    authors=author_loader,
+)
+
+# Per-paper like/comment/feedback/view totals, updated as those rows are written
+counters = create_counters(supabase, job_queue)
+
+# Paper views are deduplicated in memory and written in batches
+view_log = create_view_buffer(supabase, job_queue, counters)
+
+# Shared-link views are summed in memory and applied as atomic increments
+shared_link_views = create_shared_link_views(supabase, job_queue)
+
+# Resolved shared links (link, paper, author names) by access key
+shared_link_cache = TTLCache(
+    maxsize=int(os.environ.get("AGORA_SHARED_LINK_CACHE_SIZE", 10000)),
+    ttl=float(os.environ.get("AGORA_SHARED_LINK_CACHE_SECONDS", 60))
+)
+
+# Signed PDF URLs are reused until shortly before they expire
+pdf_urls = create_signed_url_cache(supabase.storage, 'papers')
+
+# Categories are served and resolved from memory; browsers revalidate the
+# list with its ETag after CATEGORY_MAX_AGE seconds
+category_registry = create_category_registry(supabase, job_queue)
+CATEGORY_MAX_AGE = int(os.environ.get("AGORA_CATEGORY_MAX_AGE_SECONDS", 60))
+
+# Bearer tokens are verified locally against the project's JWT secret or
+# JWKS (see auth.py); a user_id parameter must name the token's user
+authentication = create_authentication(supabase, job_queue, supabase_url, supabase_key)
+
+# Authorship and staff checks, memoized per request and batched across papers
+permissions = create_permission_resolver(supabase)
+
+# Staff flag and authored paper ids per user, for the paper list filters
+viewer_contexts = create_viewer_contexts(supabase, permissions)
+
+# Serialized GET responses with ETags, dropped by tag when the data changes
+response_cache = create_response_cache()
+
+# Ranked full-text search over papers, kept in memory (see search_index.py)
+paper_search = create_paper_search(supabase, category_registry, job_queue)
+if paper_search is not None:
+    # Popularity sorting follows the reconciled engagement totals
+    counters.add_listener(paper_search.engagement_changed)
+SEARCH_FETCH_BATCH = 100
+SUGGEST_LIMIT = 8
+SUGGEST_LIMIT_MAX = 20
+
+# Fast JSON encoding for large lists, compressed when the client accepts it
+encoder = create_response_encoder()
+
+# Optionally serve PDFs ourselves from a local disk cache instead of
+# handing out signed storage URLs (see pdf_cache.py)
+pdf_cache = None
+
+if os.environ.get("AGORA_PDF_PROXY") == "1":
+    pdf_cache = create_pdf_cache(
+        download_source(supabase.storage, 'papers') if USE_LOCAL_DATA else signed_url_source(pdf_urls)
+    )
 
 app = Flask(__name__)
+instrumentation.init_app(app)
+authentication.init_app(app)
+encoder.init_app(app)
 CORS(app, 
      resources={r"/*": {"origins": "*"}}, 
      methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
@@ -24,6 +141,11 @@ def test():
     # Simple test endpoint that doesn't use jsonify
     return "Backend is running!"
 
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Per-route handler time and upstream call histograms in Prometheus format"""
+    return Response(instrumentation.registry.render(), mimetype=instrumentation.PROMETHEUS_CONTENT_TYPE)
+
 @app.route('/hello', methods=['GET'])
 def hello_alt():
     return jsonify({"message": "Welcome to Agora!"})
@@ -34,6 +156,7 @@ def hello():
 
 # Add Supabase-related routes
 @app.route('/api/validate-token', methods=['POST'])
+@authentication.exempt
 def validate_token():
     try:
         # Get the token from the request
@@ -43,14 +166,17 @@ def validate_token():
         if not token:
             return jsonify({"error": "No token provided"}), 400
             
-        # Verify the token with Supabase
-        response = supabase.auth.get_user(token)
+        # Verified locally when we have the signing key, by Supabase otherwise
+        try:
+            user = authentication.verifier.verify(token)
+        except InvalidToken as e:
+            return jsonify({"error": str(e), "valid": False}), 401
         
         return jsonify({
             "valid": True,
             "user": {
-                "id": response.user.id,
-                "email": response.user.email
+                "id": user.id,
+                "email": user.email
             }
         })
     except Exception as e:
@@ -59,43 +185,82 @@ def validate_token():
 @app.route('/api/categories', methods=['GET'])
 def get_categories():
     try:
-        response = supabase.table('categories').select('*').execute()
-        return jsonify(response.data)
+        body, etag = category_registry.response()
+        return conditional_json(body, etag, max_age=CATEGORY_MAX_AGE)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/papers', methods=['GET'])
+@response_cache.cached(ttl=60, tags=('papers',), public=True)
 def get_papers():
     try:
-        response = supabase.table('papers').select('*').eq('status', 'published').execute()
-        return jsonify(response.data)
+        listing = PaperListing.from_args(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+        
+    try:
+        include_pdf_urls = request.args.get('include_pdf_urls') == 'true'
+        
+        def published_papers():
+            return supabase.table('papers')\
+                .select(listing.columns('pdf_url') if include_pdf_urls else listing.columns())\
+                .eq('status', 'published')
+        papers = listing.fetch(published_papers)
+        
+        if listing.fields is not None and 'categories' in listing.fields:
+            category_registry.embed(papers)
+        
+        if include_pdf_urls:
+            attach_signed_pdf_urls(papers)
+            
+        return encoder.json(listing.result(papers, extra=('signed_pdf_url',)))
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+def author_profiles(paper_id):
+    """Profiles of a paper's authors in author order, from the batching loaders"""
+    authors = author_loader.load(paper_id) or []
+    profiles = profile_loader.load_many([author['author_id'] for author in authors])
+    return [profiles[str(author['author_id'])] for author in authors if profiles.get(str(author['author_id']))]
+
+def attach_signed_pdf_urls(papers):
+    """Add signed_pdf_url to each paper, signing every uncached PDF in one storage call"""
+    urls = pdf_urls.get_many([storage_path(paper.get('pdf_url')) for paper in papers])
+    
+    for paper in papers:
+        paper['signed_pdf_url'] = urls.get(storage_path(paper.get('pdf_url')))
+        
+    return papers
+
 @app.route('/api/papers/<paper_id>', methods=['GET'])
+@response_cache.cached(ttl=60, tags=('paper:{paper_id}',), public=True)
 def get_paper(paper_id):
     try:
-        # Get paper details with category information
-        paper_response = supabase.table('papers').select('*, categories(id, name)').eq('id', paper_id).single().execute()
-        paper = paper_response.data
+        # Paper, authors and figures don't depend on each other, so fetch them together
+        results = run_concurrently({
+            "paper": lambda: supabase.table('papers')\
+                .select('*')\
+                .eq('id', paper_id)\
+                .single()\
+                .execute(),
+            "authors": lambda: supabase.table('paper_authors')\
+                .select('*, profiles(id, full_name, email)')\
+                .eq('paper_id', paper_id)\
+                .execute(),
+            "figures": lambda: supabase.table('figures')\
+                .select('*')\
+                .eq('paper_id', paper_id)\
+                .order('figure_order')\
+                .execute()
+        })
+        paper = results['paper'].data
         
         if not paper:
             return jsonify({"error": "Paper not found"}), 404
         
-        # Get authors
-        authors_response = supabase.table('paper_authors')\
-            .select('*, profiles(id, full_name, email)')\
-            .eq('paper_id', paper_id)\
-            .execute()
-        authors = authors_response.data
-        
-        # Get figures
-        figures_response = supabase.table('figures')\
-            .select('*')\
-            .eq('paper_id', paper_id)\
-            .order('figure_order', ascending=True)\
-            .execute()
-        figures = figures_response.data
+        category_registry.embed([paper])
+        authors = results['authors'].data
+        figures = results['figures'].data
         
         return jsonify({
             "paper": paper,
@@ -106,6 +271,87 @@ def get_paper(paper_id):
         print(f"Error fetching paper details: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/papers/<paper_id>/bundle', methods=['GET'])
+def get_paper_bundle(paper_id):
+    """Everything the paper details page needs, fetched concurrently in one request"""
+    try:
+        user_id = request.args.get('user_id')
+        time_period = int(request.args.get('time_period', 30))
+        
+        calls = {
+            "paper": lambda: supabase.table('papers')\
+                .select('*')\
+                .eq('id', paper_id)\
+                .single()\
+                .execute(),
+            "authors": lambda: supabase.table('paper_authors')\
+                .select('*, profiles(id, full_name, email)')\
+                .eq('paper_id', paper_id)\
+                .execute(),
+            "figures": lambda: supabase.table('figures')\
+                .select('*')\
+                .eq('paper_id', paper_id)\
+                .order('figure_order')\
+                .execute(),
+            "counters": lambda: counters.stats(paper_id, time_period),
+            "comments": lambda: supabase.table('paper_comments')\
+                .select('*, profiles(id, full_name)')\
+                .eq('paper_id', paper_id)\
+                .order('created_at')\
+                .execute(),
+            # All feedback is fetched; private items are dropped below unless the viewer is an author
+            "feedback": lambda: supabase.table('paper_feedback')\
+                .select('*, profiles(id, full_name)')\
+                .eq('paper_id', paper_id)\
+                .order('created_at', desc=True)\
+                .execute(),
+            "review_assignments": lambda: supabase.table('review_assignments')\
+                .select('id, reviewer_id, status, assigned_at, profiles(id, full_name, email)')\
+                .eq('paper_id', paper_id)\
+                .execute()
+        }
+        
+        if user_id:
+            calls["user_like"] = lambda: supabase.table('paper_likes')\
+                .select('id')\
+                .eq('paper_id', paper_id)\
+                .eq('user_id', user_id)\
+                .execute()
+        
+        results = run_concurrently(calls)
+        paper = results['paper'].data
+        
+        if not paper:
+            return jsonify({"error": "Paper not found"}), 404
+        
+        category_registry.embed([paper])
+        authors = results['authors'].data
+        comments = results['comments'].data
+        all_feedback = results['feedback'].data
+        stats = results['counters']
+        
+        # Same rule as GET /feedback: authors see everything, others only public feedback
+        is_author = bool(user_id) and any(author['author_id'] == user_id for author in authors)
+        feedback = all_feedback if is_author else [item for item in all_feedback if not item.get('is_private')]
+        
+        return jsonify({
+            "paper": paper,
+            "authors": authors,
+            "figures": results['figures'].data,
+            "likes": {
+                "count": stats['like_count'],
+                "user_liked": bool(user_id) and len(results['user_like'].data) > 0
+            },
+            "comments": comments,
+            "feedback": feedback,
+            "stats": dict(stats, time_period_days=time_period),
+            "review_assignments": results['review_assignments'].data,
+            "is_author": is_author
+        })
+    except Exception as e:
+        print(f"Error fetching paper bundle: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
 # Add these endpoints to your app.py file
 
 @app.route('/api/papers', methods=['POST'])
@@ -120,49 +366,91 @@ def create_paper():
             if field not in data:
                 return jsonify({"error": f"Missing required field: {field}"}), 400
         
-        # Insert paper into Supabase
-        response = supabase.table('papers').insert({
+        paper_data = {
             "title": data['title'],
             "abstract": data['abstract'],
             "category_id": data['category_id'],
             "status": "draft",
             "pdf_url": data['pdf_url']
-        }).execute()
+        }
         
-        if len(response.data) == 0:
-            return jsonify({"error": "Failed to create paper"}), 500
-            
-        paper_id = response.data[0]['id']
+        # Resolve all co-author emails in a single query
+        co_authors = data.get('co_authors') or []
+        emails = [co_author['email'] for co_author in co_authors]
+        profile_ids = {}
         
-        # Add author information
-        author_data = {
-            "paper_id": paper_id,
+        if emails:
+            profiles_response = supabase.table('profiles')\
+                .select('id, email')\
+                .in_('email', emails)\
+                .execute()
+            profile_ids = {profile['email']: profile['id'] for profile in profiles_response.data}
+        
+        # Corresponding author first, then every co-author that was found
+        author_rows = [{
             "author_id": data['author_id'],
             "is_corresponding": True,
             "author_order": 1
-        }
+        }]
+        added_ids = {data['author_id']}
+        co_author_results = []
         
-        author_response = supabase.table('paper_authors').insert(author_data).execute()
+        for co_author in co_authors:
+            co_author_id = profile_ids.get(co_author['email'])
+            
+            if not co_author_id:
+                status = "not_found"
+            elif co_author_id in added_ids:
+                status = "duplicate"
+            else:
+                status = "added"
+                added_ids.add(co_author_id)
+                author_rows.append({
+                    "author_id": co_author_id,
+                    "is_corresponding": False,
+                    "author_order": co_author['order']
+                })
+                
+            co_author_results.append({
+                "email": co_author['email'],
+                "status": status,
+                "author_id": co_author_id
+            })
         
-        # Handle co-authors if present
-        if 'co_authors' in data and len(data['co_authors']) > 0:
-            for co_author in data['co_authors']:
-                # Lookup user by email
-                user_response = supabase.table('profiles')\
-                    .select('id')\
-                    .eq('email', co_author['email'])\
-                    .execute()
+        if USE_PAPER_RPC:
+            # Paper and author rows written atomically in one round trip
+            rpc_response = supabase.rpc('create_paper_with_authors', {
+                "paper": paper_data,
+                "authors": author_rows
+            }).execute()
+            paper_id = rpc_response.data
+            
+            if not paper_id:
+                return jsonify({"error": "Failed to create paper"}), 500
+        else:
+            response = supabase.table('papers').insert(paper_data).execute()
+            
+            if len(response.data) == 0:
+                return jsonify({"error": "Failed to create paper"}), 500
                 
-                if len(user_response.data) > 0:
-                    co_author_id = user_response.data[0]['id']
-                    supabase.table('paper_authors').insert({
-                        "paper_id": paper_id,
-                        "author_id": co_author_id,
-                        "is_corresponding": False,
-                        "author_order": co_author['order']
-                    }).execute()
-        
-        return jsonify({"success": True, "paper_id": paper_id})
+            paper_id = response.data[0]['id']
+            
+            # Insert all author rows in one bulk write
+            supabase.table('paper_authors')\
+                .insert([dict(author, paper_id=paper_id) for author in author_rows])\
+                .execute()
+        
+        viewer_contexts.invalidate(*added_ids)
+        author_loader.invalidate(paper_id)
+        if paper_search is not None:
+            paper_search.paper_changed(paper_id)
+        
+        return jsonify({
+            "success": True,
+            "paper_id": paper_id,
+            "co_authors": co_author_results,
+            "unresolved_emails": [result['email'] for result in co_author_results if result['status'] == 'not_found']
+        })
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -196,8 +484,25 @@ def get_user_papers():
 @app.route('/api/categories/list', methods=['GET'])
 def list_categories():
     try:
-        response = supabase.table('categories').select('*').execute()
-        return jsonify(response.data)
+        body, etag = category_registry.response()
+        return conditional_json(body, etag, max_age=CATEGORY_MAX_AGE)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/categories/refresh', methods=['POST'])
+def refresh_categories():
+    """Reload the category registry after categories were edited (staff only)"""
+    try:
+        user_id = (request.json or {}).get('user_id')
+        
+        if not user_id:
+            return jsonify({"error": "User ID is required"}), 400
+            
+        if not permissions.current().is_staff(user_id):
+            return jsonify({"error": "Only staff can refresh categories"}), 403
+            
+        count = category_registry.refresh()
+        return jsonify({"success": True, "categories": count})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -227,6 +532,8 @@ def create_review():
         
         if len(response.data) == 0:
             return jsonify({"error": "Failed to create review"}), 500
+        
+        response_cache.invalidate(f"reviews:{data['paper_id']}")
             
         # Update review assignment status if it exists
         supabase.table('review_assignments')\
@@ -240,6 +547,7 @@ def create_review():
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/papers/<paper_id>/reviews', methods=['GET'])
+@response_cache.cached(ttl=30, tags=('reviews:{paper_id}',), public=True)
 def get_paper_reviews(paper_id):
     """Get all reviews for a specific paper"""
     try:
@@ -276,13 +584,7 @@ def create_review_assignment():
             return jsonify({"error": "Reviewer already assigned to this paper"}), 400
         
         # Check if reviewer is an author of the paper
-        author_check = supabase.table('paper_authors')\
-            .select('id')\
-            .eq('paper_id', data['paper_id'])\
-            .eq('author_id', data['reviewer_id'])\
-            .execute()
-            
-        if len(author_check.data) > 0:
+        if permissions.current().is_author(data['reviewer_id'], data['paper_id']):
             return jsonify({"error": "Cannot assign an author as a reviewer of their own paper"}), 400
         
         # Insert assignment into Supabase
@@ -296,18 +598,8 @@ def create_review_assignment():
         if len(response.data) == 0:
             return jsonify({"error": "Failed to create assignment"}), 500
             
-        # Update paper status if necessary
-        paper_response = supabase.table('papers')\
-            .select('status')\
-            .eq('id', data['paper_id'])\
-            .single()\
-            .execute()
-            
-        if paper_response.data['status'] in ['submitted', 'draft']:
-            supabase.table('papers')\
-                .update({"status": "under_review"})\
-                .eq('id', data['paper_id'])\
-                .execute()
+        # Move the paper into review in the background if necessary
+        job_queue.enqueue('advance_paper_to_review', data['paper_id'])
                 
         return jsonify({
             "success": True, 
@@ -370,18 +662,8 @@ def create_batch_review_assignments():
         if len(response.data) == 0:
             return jsonify({"error": "Failed to create assignments"}), 500
         
-        # Update paper status if necessary
-        paper_response = supabase.table('papers')\
-            .select('status')\
-            .eq('id', paper_id)\
-            .single()\
-            .execute()
-            
-        if paper_response.data['status'] in ['submitted', 'draft']:
-            supabase.table('papers')\
-                .update({"status": "under_review"})\
-                .eq('id', paper_id)\
-                .execute()
+        # Move the paper into review in the background if necessary
+        job_queue.enqueue('advance_paper_to_review', paper_id)
         
         return jsonify({
             "success": True,
@@ -392,6 +674,21 @@ def create_batch_review_assignments():
         print(f"Error in batch review assignment: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
+@job_queue.task('advance_paper_to_review')
+def advance_paper_to_review(paper_id):
+    """Move a submitted or draft paper to under_review once a reviewer is assigned"""
+    supabase.table('papers')\
+        .update({"status": "under_review"})\
+        .eq('id', paper_id)\
+        .in_('status', ['submitted', 'draft'])\
+        .execute()
+    
+    invalidate_shared_links(paper_id=paper_id)
+    response_cache.invalidate('papers', f"paper:{paper_id}")
+    
+    if paper_search is not None:
+        paper_search.index_paper(paper_id)
+
 @app.route('/api/review-assignments/<assignment_id>', methods=['DELETE'])
 def delete_review_assignment(assignment_id):
     """Remove a reviewer assignment"""
@@ -498,24 +795,19 @@ def update_paper_status(paper_id):
             .eq('id', paper_id)\
             .execute()
         
-        # Get paper authors for notification
-        authors_response = supabase.table('paper_authors')\
-            .select('author_id, profiles(email, full_name)')\
-            .eq('paper_id', paper_id)\
-            .execute()
+        invalidate_shared_links(paper_id=paper_id)
+        response_cache.invalidate('papers', f"paper:{paper_id}")
         
-        # Create status change notification in the database
-        status_message = get_status_change_message(current_status, new_status, paper_title)
-        
-        for author in authors_response.data:
-            supabase.table('notifications').insert({
-                "user_id": author['author_id'],
-                "message": status_message,
-                "type": "paper_status",
-                "related_id": paper_id,
-                "read": False,
-                "created_at": datetime.now().isoformat()
-            }).execute()
+        if paper_search is not None:
+            paper_search.set_status(paper_id, new_status)
+        
+        # Notify all paper authors of the status change
+        notifier.notify_paper_authors(
+            paper_id,
+            "paper_status",
+            get_status_change_message(current_status, new_status, '{paper_title}'),
+            paper_title=paper_title
+        )
         
         return jsonify({
             "success": True,
@@ -585,13 +877,7 @@ def get_user_review_assignments():
 def get_paper_likes(paper_id):
     """Get likes for a specific paper"""
     try:
-        # Get like count
-        count_response = supabase.table('paper_likes')\
-            .select('id', 'count')\
-            .eq('paper_id', paper_id)\
-            .execute()
-            
-        like_count = count_response.count
+        like_count = counters.totals(paper_id)['likes']
         
         # Check if current user liked the paper
         current_user = request.args.get('user_id')
@@ -623,26 +909,18 @@ def toggle_paper_like(paper_id):
         if not user_id:
             return jsonify({"error": "User ID is required"}), 400
         
-        # Check if like already exists
-        existing_query = (
+        # Unlike: Remove the like if it exists
+        delete_query = (
             supabase.table('paper_likes')
-            .select('id')
+            .delete()
             .eq('paper_id', paper_id)
             .eq('user_id', user_id)
         )
         
-        existing = existing_query.execute()
+        deleted = delete_query.execute()
         
-        if existing.data and len(existing.data) > 0:
-            # Unlike: Remove the like
-            delete_query = (
-                supabase.table('paper_likes')
-                .delete()
-                .eq('paper_id', paper_id)
-                .eq('user_id', user_id)
-            )
-            
-            delete_query.execute()
+        if deleted.data and len(deleted.data) > 0:
+            counters.record(paper_id, 'likes', -len(deleted.data))
             return jsonify({"liked": False})
         else:
             # Like: Add a new like
@@ -652,56 +930,16 @@ def toggle_paper_like(paper_id):
             )
             
             insert_query.execute()
+            counters.record(paper_id, 'likes')
             
-            # Get paper details
-            paper_query = (
-                supabase.table('papers')
-                .select('title')
-                .eq('id', paper_id)
-                .single()
-            )
-            
-            paper = paper_query.execute()
-            
-            # Get paper authors to notify them
-            authors_query = (
-                supabase.table('paper_authors')
-                .select('author_id')
-                .eq('paper_id', paper_id)
-            )
-            
-            authors = authors_query.execute()
-            
-            # Get user's name
-            user_profile_query = (
-                supabase.table('profiles')
-                .select('full_name')
-                .eq('id', user_id)
-                .single()
+            # Notify the authors (except the user who liked)
+            notifier.notify_paper_authors(
+                paper_id,
+                "like",
+                "{actor_name} liked your paper '{paper_title}'",
+                actor_id=user_id
             )
             
-            user_profile = user_profile_query.execute()
-            
-            # Create notifications for authors (except the user who liked)
-            if paper.data and user_profile.data:
-                paper_title = paper.data['title']
-                liker_name = user_profile.data['full_name']
-                
-                for author in authors.data:
-                    author_id = author['author_id']
-                    
-                    # Don't notify yourself if you like your own paper
-                    if author_id != user_id:
-                        notification = {
-                            "user_id": author_id,
-                            "related_id": paper_id,
-                            "type": "like",
-                            "message": f"{liker_name} liked your paper '{paper_title}'",
-                            "read": False
-                        }
-                        
-                        supabase.table('notifications').insert(notification).execute()
-            
             return jsonify({"liked": True})
     except Exception as e:
         print(f"Error toggling like: {str(e)}")
@@ -709,6 +947,7 @@ def toggle_paper_like(paper_id):
 
 # Paper Comments API
 @app.route('/api/papers/<paper_id>/comments', methods=['GET'])
+@response_cache.cached(ttl=15, tags=('comments:{paper_id}',), public=True)
 def get_paper_comments(paper_id):
     """Get comments for a specific paper"""
     try:
@@ -747,6 +986,9 @@ def add_paper_comment(paper_id):
             
         if not response.data or len(response.data) == 0:
             return jsonify({"error": "Failed to create comment"}), 500
+        
+        counters.record(paper_id, 'comments')
+        response_cache.invalidate(f"comments:{paper_id}")
             
         # Get the newly created comment with user info
         new_comment_query = (
@@ -758,43 +1000,15 @@ def add_paper_comment(paper_id):
         
         new_comment = new_comment_query.execute()
         
-        # Create notifications for paper authors
-        paper_query = (
-            supabase.table('papers')
-            .select('title')
-            .eq('id', paper_id)
-            .single()
-        )
-        
-        paper = paper_query.execute()
-        
-        authors_query = (
-            supabase.table('paper_authors')
-            .select('author_id')
-            .eq('paper_id', paper_id)
-        )
-        
-        authors = authors_query.execute()
-        
-        if paper.data and new_comment.data:
-            paper_title = paper.data['title']
-            commenter_name = new_comment.data['profiles']['full_name']
-            commenter_id = data['user_id']
-            
-            for author in authors.data:
-                author_id = author['author_id']
-                
-                # Don't notify yourself
-                if author_id != commenter_id:
-                    notification = {
-                        "user_id": author_id,
-                        "related_id": paper_id,
-                        "type": "comment",
-                        "message": f"{commenter_name} commented on your paper '{paper_title}'",
-                        "read": False
-                    }
-                    
-                    supabase.table('notifications').insert(notification).execute()
+        # Notify the paper authors (except the commenter)
+        if new_comment.data:
+            notifier.notify_paper_authors(
+                paper_id,
+                "comment",
+                "{actor_name} commented on your paper '{paper_title}'",
+                actor_id=data['user_id'],
+                actor_name=new_comment.data['profiles']['full_name']
+            )
             
         return jsonify(new_comment.data)
     except Exception as e:
@@ -814,6 +1028,8 @@ def update_comment(comment_id):
             .update({"content": data['content']})\
             .eq('id', comment_id)\
             .execute()
+        
+        response_cache.invalidate(*(f"comments:{comment['paper_id']}" for comment in response.data or []))
             
         return jsonify({"success": True})
     except Exception as e:
@@ -827,6 +1043,10 @@ def delete_comment(comment_id):
             .delete()\
             .eq('id', comment_id)\
             .execute()
+        
+        for comment in response.data or []:
+            counters.record(comment['paper_id'], 'comments', -1)
+            response_cache.invalidate(f"comments:{comment['paper_id']}")
             
         return jsonify({"success": True})
     except Exception as e:
@@ -834,29 +1054,20 @@ def delete_comment(comment_id):
 
 # Paper Feedback API
 @app.route('/api/papers/<paper_id>/feedback', methods=['GET'])
+@response_cache.cached(ttl=15, tags=('feedback:{paper_id}',))
 def get_paper_feedback(paper_id):
     """Get feedback for a specific paper"""
     try:
         # Check if user is an author
         user_id = request.args.get('user_id')
-        is_author = False
-        
-        if user_id:
-            author_check = supabase.table('paper_authors')\
-                .select('id')\
-                .eq('paper_id', paper_id)\
-                .eq('author_id', user_id)\
-                .execute()
-                
-            is_author = len(author_check.data) > 0
         
         # Build the query based on user's role
-        if is_author:
+        if permissions.current().is_author(user_id, paper_id):
             # Authors can see all feedback
             response = supabase.table('paper_feedback')\
                 .select('*, profiles(id, full_name)')\
                 .eq('paper_id', paper_id)\
-                .order('created_at', {'ascending': False})\
+                .order('created_at', desc=True)\
                 .execute()
         else:
             # Non-authors can only see public feedback
@@ -864,7 +1075,7 @@ def get_paper_feedback(paper_id):
                 .select('*, profiles(id, full_name)')\
                 .eq('paper_id', paper_id)\
                 .eq('is_private', False)\
-                .order('created_at', {'ascending': False})\
+                .order('created_at', desc=True)\
                 .execute()
                 
         return jsonify(response.data)
@@ -896,6 +1107,9 @@ def add_paper_feedback(paper_id):
             
         if not response.data or len(response.data) == 0:
             return jsonify({"error": "Failed to create feedback"}), 500
+        
+        counters.record(paper_id, 'feedback')
+        response_cache.invalidate(f"feedback:{paper_id}")
             
         # Get the newly created feedback with user info
         new_feedback_query = (
@@ -907,43 +1121,15 @@ def add_paper_feedback(paper_id):
         
         new_feedback = new_feedback_query.execute()
         
-        # Create notifications for paper authors
-        paper_query = (
-            supabase.table('papers')
-            .select('title')
-            .eq('id', paper_id)
-            .single()
-        )
-        
-        paper = paper_query.execute()
-        
-        authors_query = (
-            supabase.table('paper_authors')
-            .select('author_id')
-            .eq('paper_id', paper_id)
-        )
-        
-        authors = authors_query.execute()
-        
-        if paper.data and new_feedback.data:
-            paper_title = paper.data['title']
-            feedback_provider_name = new_feedback.data['profiles']['full_name']
-            feedback_provider_id = data['user_id']
-            
-            for author in authors.data:
-                author_id = author['author_id']
-                
-                # Don't notify yourself
-                if author_id != feedback_provider_id:
-                    notification = {
-                        "user_id": author_id,
-                        "related_id": paper_id,
-                        "type": "feedback",
-                        "message": f"{feedback_provider_name} provided feedback on your paper '{paper_title}'",
-                        "read": False
-                    }
-                    
-                    supabase.table('notifications').insert(notification).execute()
+        # Notify the paper authors (except the feedback provider)
+        if new_feedback.data:
+            notifier.notify_paper_authors(
+                paper_id,
+                "feedback",
+                "{actor_name} provided feedback on your paper '{paper_title}'",
+                actor_id=data['user_id'],
+                actor_name=new_feedback.data['profiles']['full_name']
+            )
             
         return jsonify(new_feedback.data)
     except Exception as e:
@@ -957,40 +1143,16 @@ def log_paper_view(paper_id):
         data = request.json
         user_id = data.get('user_id')  # This can be null for anonymous views
         
-        # Optional: Check for recent views from same user/IP to prevent duplicate counting
-        if user_id:
-            # Check if user already viewed this paper in the last hour
-            recent_view = supabase.table('paper_views')\
-                .select('id')\
-                .eq('paper_id', paper_id)\
-                .eq('user_id', user_id)\
-                .gte('viewed_at', (datetime.now() - timedelta(hours=1)).isoformat())\
-                .execute()
-                
-            if recent_view.data and len(recent_view.data) > 0:
-                # Already counted a recent view, don't count again
-                return jsonify({"success": True, "counted": False})
-        
-        # Log the view
-        view_data = {
-            "paper_id": paper_id,
-            "user_id": user_id,
-            "viewed_at": datetime.now().isoformat()
-        }
-        
-        # Add IP address if you want to track it (consider privacy implications)
-        if request.remote_addr:
-            view_data["ip_address"] = request.remote_addr
-            
-        # Add user agent if you want to track it
-        if request.headers.get('User-Agent'):
-            view_data["user_agent"] = request.headers.get('User-Agent')
-        
-        response = supabase.table('paper_views')\
-            .insert(view_data)\
-            .execute()
+        # Duplicate views (same user or IP within the dedup window) are dropped in memory;
+        # accepted views are buffered and bulk-inserted in the background
+        counted = view_log.log(
+            paper_id,
+            user_id=user_id,
+            ip_address=request.remote_addr,
+            user_agent=request.headers.get('User-Agent')
+        )
             
-        return jsonify({"success": True, "counted": True})
+        return jsonify({"success": True, "counted": counted})
     except Exception as e:
         print(f"Error logging paper view: {str(e)}")
         return jsonify({"error": str(e)}), 500
@@ -1028,48 +1190,9 @@ def get_paper_stats(paper_id):
     try:
         # Set time period for stats (default 30 days)
         time_period = int(request.args.get('time_period', 30))
-        cutoff_date = (datetime.now() - timedelta(days=time_period)).isoformat()
+        stats = counters.stats(paper_id, time_period)
         
-        # Get view count
-        view_response = supabase.table('paper_views')\
-            .select('id', 'count')\
-            .eq('paper_id', paper_id)\
-            .gte('viewed_at', cutoff_date)\
-            .execute()
-            
-        view_count = view_response.count
-        
-        # Get like count
-        like_response = supabase.table('paper_likes')\
-            .select('id', 'count')\
-            .eq('paper_id', paper_id)\
-            .execute()
-            
-        like_count = like_response.count
-        
-        # Get comment count
-        comment_response = supabase.table('paper_comments')\
-            .select('id', 'count')\
-            .eq('paper_id', paper_id)\
-            .execute()
-            
-        comment_count = comment_response.count
-        
-        # Get feedback count
-        feedback_response = supabase.table('paper_feedback')\
-            .select('id', 'count')\
-            .eq('paper_id', paper_id)\
-            .execute()
-            
-        feedback_count = feedback_response.count
-        
-        return jsonify({
-            "view_count": view_count,
-            "like_count": like_count,
-            "comment_count": comment_count,
-            "feedback_count": feedback_count,
-            "time_period_days": time_period
-        })
+        return jsonify(dict(stats, time_period_days=time_period))
     except Exception as e:
         print(f"Error fetching paper stats: {str(e)}")
         return jsonify({"error": str(e)}), 500
@@ -1086,28 +1209,14 @@ def get_paper_shared_links(paper_id):
             return jsonify({"error": "User ID is required"}), 400
             
         # Check if user is an author or staff
-        is_author = supabase.table('paper_authors')\
-            .select('id')\
-            .eq('paper_id', paper_id)\
-            .eq('author_id', user_id)\
-            .execute()
-            
-        user_profile = supabase.table('profiles')\
-            .select('user_type')\
-            .eq('id', user_id)\
-            .single()\
-            .execute()
-            
-        is_staff = user_profile.data and user_profile.data.get('user_type') == 'staff'
-        
-        if not (is_author.data or is_staff):
+        if not permissions.current().can_manage(user_id, paper_id):
             return jsonify({"error": "Unauthorized access"}), 403
             
         # Get all shared links for the paper
         response = supabase.table('paper_shared_links')\
             .select('*')\
             .eq('paper_id', paper_id)\
-            .order('created_at', {'ascending': False})\
+            .order('created_at', desc=True)\
             .execute()
             
         return jsonify(response.data)
@@ -1139,21 +1248,7 @@ def create_paper_shared_link(paper_id):
             return jsonify({"error": "Only published papers can be shared"}), 400
             
         # Check if user is an author or staff
-        is_author = supabase.table('paper_authors')\
-            .select('id')\
-            .eq('paper_id', paper_id)\
-            .eq('author_id', user_id)\
-            .execute()
-            
-        user_profile = supabase.table('profiles')\
-            .select('user_type')\
-            .eq('id', user_id)\
-            .single()\
-            .execute()
-            
-        is_staff = user_profile.data and user_profile.data.get('user_type') == 'staff'
-        
-        if not (is_author.data or is_staff):
+        if not permissions.current().can_manage(user_id, paper_id):
             return jsonify({"error": "Only authors or staff can create shared links"}), 403
         
         # Generate a unique access key using the database function
@@ -1191,72 +1286,93 @@ def create_paper_shared_link(paper_id):
         print(f"Error creating shared link: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
+def is_link_expired(expires_at):
+    """Whether a shared link's expires_at timestamp lies in the past"""
+    if not expires_at:
+        return False
+    expiry = datetime.fromisoformat(expires_at.replace('Z', '+00:00'))
+    now = datetime.now(timezone.utc) if expiry.tzinfo else datetime.now()
+    return expiry < now
+
+# Jobs queued by earlier versions are folded into the accumulator
+job_queue.register('record_shared_link_view', shared_link_views.record)
+
+def resolve_shared_link(access_key):
+    """Load a shared link with its paper and author names and cache the result"""
+    generation = shared_link_cache.generation
+    
+    # Get the shared link
+    query = (
+        supabase.table('paper_shared_links')
+        .select('*')
+        .eq('access_key', access_key)
+        .single()
+    )
+    
+    link_response = query.execute()
+        
+    if not link_response.data:
+        return None, (jsonify({"error": "Shared link not found"}), 404)
+        
+    shared_link = link_response.data
+    
+    # The paper and its authors only depend on the link
+    results = run_concurrently({
+        "paper": lambda: supabase.table('papers')\
+            .select('id, title, abstract, status, created_at, updated_at, category_id, pdf_url')\
+            .eq('id', shared_link['paper_id'])\
+            .single()\
+            .execute(),
+        "authors": lambda: author_profiles(shared_link['paper_id'])
+    })
+        
+    if not results['paper'].data:
+        return None, (jsonify({"error": "Paper not found"}), 404)
+    
+    category_registry.embed([results['paper'].data], fields=('name',))
+        
+    resolved = {
+        "link": shared_link,
+        "paper": results['paper'].data,
+        "authors": [profile['full_name'] for profile in results['authors']]
+    }
+    
+    # Skipped if the link or its paper changed while we were loading
+    shared_link_cache.set(access_key, resolved, generation=generation)
+    
+    return resolved, None
+
+def invalidate_shared_links(link_id=None, paper_id=None):
+    """Drop cached shared links for a link or for every link to a paper"""
+    shared_link_cache.discard_where(
+        lambda access_key, resolved: resolved['link']['id'] == link_id or resolved['link']['paper_id'] == paper_id
+    )
+
 @app.route('/api/shared-links/<access_key>', methods=['GET'])
 def get_shared_link_details(access_key):
     """Get details of a shared link without authentication"""
     try:
-        # Get the shared link
-        query = (
-            supabase.table('paper_shared_links')
-            .select('*')
-            .eq('access_key', access_key)
-            .single()
-        )
+        resolved = shared_link_cache.get(access_key)
         
-        link_response = query.execute()
-            
-        print(f"Shared link response: {link_response}")  # For debugging
-            
-        if not link_response.data:
-            return jsonify({"error": "Shared link not found"}), 404
+        if resolved is None:
+            resolved, error = resolve_shared_link(access_key)
             
-        shared_link = link_response.data
+            if error:
+                return error
         
-        # Check if the link is active
+        shared_link = resolved['link']
+        paper = resolved['paper']
+        authors = resolved['authors']
+        
+        # Checked on every hit, so cached links still expire on time
         if not shared_link['is_active']:
             return jsonify({"error": "This shared link has been deactivated"}), 403
             
-        # Check if the link has expired
-        if shared_link['expires_at'] and datetime.datetime.fromisoformat(shared_link['expires_at'].replace('Z', '+00:00')) < datetime.datetime.now(datetime.timezone.utc):
+        if is_link_expired(shared_link['expires_at']):
             return jsonify({"error": "This shared link has expired"}), 403
-            
-        # Get the paper details
-        paper_query = (
-            supabase.table('papers')
-            .select('id, title, abstract, status, created_at, updated_at, category_id, categories(name)')
-            .eq('id', shared_link['paper_id'])
-            .single()
-        )
-        
-        paper_response = paper_query.execute()
-            
-        if not paper_response.data:
-            return jsonify({"error": "Paper not found"}), 404
-            
-        paper = paper_response.data
-        
-        # Get the authors
-        authors_query = (
-            supabase.table('paper_authors')
-            .select('profiles(full_name)')
-            .eq('paper_id', shared_link['paper_id'])
-        )
-        
-        authors_response = authors_query.execute()
-            
-        authors = [author['profiles']['full_name'] for author in authors_response.data] if authors_response.data else []
-        
-        # Increment view count and update last viewed time
-        update_query = (
-            supabase.table('paper_shared_links')
-            .update({
-                "view_count": shared_link['view_count'] + 1,
-                "last_viewed_at": datetime.datetime.now().isoformat()
-            })
-            .eq('id', shared_link['id'])
-        )
         
-        update_query.execute()
+        # Count the view; summed counts are written by a background flush
+        shared_link_views.record(shared_link['id'], datetime.now().isoformat())
             
         # Return the paper details along with sharing permissions
         return jsonify({
@@ -1286,24 +1402,22 @@ def get_shared_link_details(access_key):
 def get_shared_paper_pdf(access_key):
     """Get the PDF for a shared paper"""
     try:
-        # Get the shared link
-        link_response = supabase.table('paper_shared_links')\
-            .select('*, papers(pdf_url)')\
-            .eq('access_key', access_key)\
-            .single()\
-            .execute()
+        resolved = shared_link_cache.get(access_key)
+        
+        if resolved is None:
+            resolved, error = resolve_shared_link(access_key)
             
-        if not link_response.data:
-            return jsonify({"error": "Shared link not found"}), 404
+            if error:
+                return error
             
-        shared_link = link_response.data
+        shared_link = resolved['link']
         
         # Check if the link is active
         if not shared_link['is_active']:
             return jsonify({"error": "This shared link has been deactivated"}), 403
             
         # Check if the link has expired
-        if shared_link['expires_at'] and datetime.fromisoformat(shared_link['expires_at'].replace('Z', '+00:00')) < datetime.now(timezone.utc):
+        if is_link_expired(shared_link['expires_at']):
             return jsonify({"error": "This shared link has expired"}), 403
             
         # Check if downloads are allowed
@@ -1311,30 +1425,79 @@ def get_shared_paper_pdf(access_key):
             return jsonify({"error": "Downloads are not allowed for this shared link"}), 403
             
         # Get the PDF URL
-        pdf_url = shared_link['papers']['pdf_url']
+        pdf_url = resolved['paper'].get('pdf_url')
         if not pdf_url:
             return jsonify({"error": "PDF not found"}), 404
-            
-        # Extract the filename from the PDF URL
-        filename = pdf_url.split('/').pop()
         
-        # Get a signed URL for the PDF
-        signed_url_response = (
-            supabase.storage
-            .from_('papers')
-            .create_signed_url(filename, 60)  # URL valid for 60 seconds
-        )  
-        if signed_url_response.error:
+        if pdf_cache is not None:
+            response = send_cached_pdf(pdf_url)
+            # Only people holding the access key may see this copy
+            response.cache_control.private = True
+            return response
+        
+        # Reuses a cached signed URL while it still has enough lifetime left
+        try:
+            signed_url = pdf_urls.get(storage_path(pdf_url))
+        except Exception as e:
+            print(f"Error signing PDF URL: {str(e)}")
             return jsonify({"error": "Failed to generate PDF download link"}), 500
             
         # Return the signed URL
         return jsonify({
-            "pdf_url": signed_url_response.data['signedUrl']
+            "pdf_url": signed_url
         })
     except Exception as e:
         print(f"Error getting shared paper PDF: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/papers/<paper_id>/pdf', methods=['GET'])
+def get_paper_pdf(paper_id):
+    """Get the PDF of a published paper"""
+    try:
+        paper_response = supabase.table('papers')\
+            .select('status, pdf_url')\
+            .eq('id', paper_id)\
+            .single()\
+            .execute()
+            
+        if not paper_response.data or paper_response.data['status'] != 'published':
+            return jsonify({"error": "Paper not found"}), 404
+            
+        pdf_url = paper_response.data['pdf_url']
+        if not pdf_url:
+            return jsonify({"error": "PDF not found"}), 404
+            
+        if pdf_cache is not None:
+            return send_cached_pdf(pdf_url, max_age=PUBLISHED_PDF_MAX_AGE)
+            
+        return jsonify({
+            "pdf_url": pdf_urls.get(storage_path(pdf_url))
+        })
+    except Exception as e:
+        print(f"Error getting paper PDF: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+def send_cached_pdf(pdf_url, max_age=None):
+    """Stream a PDF from the disk cache; send_file answers Range and If-None-Match requests"""
+    path = storage_path(pdf_url)
+    filename, etag = pdf_cache.get(path)
+    
+    try:
+        response = send_file(
+            filename,
+            mimetype='application/pdf',
+            download_name=os.path.basename(path),
+            conditional=True,
+            etag=etag,
+            max_age=max_age
+        )
+    except RequestedRangeNotSatisfiable as e:
+        return e.get_response()
+    
+    # Tells PDF viewers they can fetch pages with range requests
+    response.headers['Accept-Ranges'] = 'bytes'
+    return response
+
 @app.route('/api/shared-links/<link_id>', methods=['PUT'])
 def update_shared_link(link_id):
     """Update a shared link's settings"""
@@ -1358,25 +1521,8 @@ def update_shared_link(link_id):
         link = link_response.data
         
         # Check if user is the creator, an author, or staff
-        if link['created_by'] != user_id:
-            # Check if user is an author
-            is_author = supabase.table('paper_authors')\
-                .select('id')\
-                .eq('paper_id', link['paper_id'])\
-                .eq('author_id', user_id)\
-                .execute()
-                
-            # Check if user is staff
-            user_profile = supabase.table('profiles')\
-                .select('user_type')\
-                .eq('id', user_id)\
-                .single()\
-                .execute()
-                
-            is_staff = user_profile.data and user_profile.data.get('user_type') == 'staff'
-            
-            if not (is_author.data or is_staff):
-                return jsonify({"error": "Unauthorized to update this shared link"}), 403
+        if link['created_by'] != user_id and not permissions.current().can_manage(user_id, link['paper_id']):
+            return jsonify({"error": "Unauthorized to update this shared link"}), 403
         
         # Prepare update data
         update_data = {}
@@ -1406,6 +1552,8 @@ def update_shared_link(link_id):
                 
             if not response.data:
                 return jsonify({"error": "Failed to update shared link"}), 500
+            
+            invalidate_shared_links(link_id=link_id)
                 
             return jsonify({
                 "success": True,
@@ -1439,31 +1587,16 @@ def delete_shared_link(link_id):
         link = link_response.data
         
         # Check if user is the creator, an author, or staff
-        if link['created_by'] != user_id:
-            # Check if user is an author
-            is_author = supabase.table('paper_authors')\
-                .select('id')\
-                .eq('paper_id', link['paper_id'])\
-                .eq('author_id', user_id)\
-                .execute()
-                
-            # Check if user is staff
-            user_profile = supabase.table('profiles')\
-                .select('user_type')\
-                .eq('id', user_id)\
-                .single()\
-                .execute()
-                
-            is_staff = user_profile.data and user_profile.data.get('user_type') == 'staff'
-            
-            if not (is_author.data or is_staff):
-                return jsonify({"error": "Unauthorized to delete this shared link"}), 403
+        if link['created_by'] != user_id and not permissions.current().can_manage(user_id, link['paper_id']):
+            return jsonify({"error": "Unauthorized to delete this shared link"}), 403
         
         # Delete the shared link
         response = supabase.table('paper_shared_links')\
             .delete()\
             .eq('id', link_id)\
             .execute()
+        
+        invalidate_shared_links(link_id=link_id)
             
         return jsonify({"success": True})
     except Exception as e:
@@ -1472,97 +1605,189 @@ def delete_shared_link(link_id):
 
 @app.route('/api/papers/by-category/<category_id>', methods=['GET'])
 def get_papers_by_category(category_id):
+    try:
+        listing = PaperListing.from_args(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+        
     try:
         user_id = request.args.get('user_id')
+        include_pdf_urls = request.args.get('include_pdf_urls') == 'true'
         
-        query = (
-            supabase.table('papers')
-            .select('*, categories(id, name)')
-            .eq('category_id', category_id)
-        )
+        columns = listing.columns('id', 'status', 'pdf_url') if include_pdf_urls else listing.columns('id', 'status')
         
-        # Apply visibility filters based on user role
-        if not user_id:
-            # Not logged in - only published papers
-            query = query.eq('status', 'published')
-        else:
-            # Check if user is staff
-            user_profile = supabase.table('profiles').select('user_type').eq('id', user_id).single().execute()
-            is_staff = user_profile.data and user_profile.data.get('user_type') == 'staff'
-            
-            if is_staff:
-                # Staff can see all papers - no additional filtering
-                pass
-            else:
-                # Regular user - published papers + own drafts
-                authored_papers = supabase.table('paper_authors').select('paper_id').eq('author_id', user_id).execute()
-                authored_paper_ids = [paper['paper_id'] for paper in authored_papers.data] if authored_papers.data else []
-                
-                if authored_paper_ids:
-                    # Published papers OR user's own papers
-                    query = query.or_(f"status.eq.published,id.in.({','.join(authored_paper_ids)})")
-                else:
-                    query = query.eq('status', 'published')
+        def category_papers():
+            return supabase.table('papers').select(columns).eq('category_id', category_id)
         
-        response = query.execute()
-        return jsonify(response.data)
+        # Staff see every paper, everyone else published papers plus their own
+        viewer = viewer_contexts.resolve(user_id)
+        papers = viewer.visible_rows(category_papers, listing)
+        
+        if listing.wants('categories'):
+            category_registry.embed(papers)
+        
+        if include_pdf_urls:
+            attach_signed_pdf_urls(papers)
+            
+        return encoder.json(listing.result(papers, extra=('signed_pdf_url',)))
     except Exception as e:
         print(f"Error in get_papers_by_category: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
+def facet_counts(counts):
+    """Search index facet counts as ``{facet: [{"value", "count"}, ...]}``, largest first"""
+    result = {}
+    for facet, values in counts.items():
+        entries = []
+        for value, count in values.items():
+            entry = {"value": value, "count": count}
+            if facet == 'category':
+                category = category_registry.get(value)
+                if category is not None:
+                    entry["value"] = category['id']
+                entry["name"] = category and category.get('name')
+            entries.append(entry)
+        entries.sort(key=lambda entry: (-entry["count"], str(entry["value"])))
+        result[facet] = entries
+    return result
+
+
 @app.route('/api/search-papers', methods=['GET'])
 def search_papers():
+    try:
+        listing = PaperListing.from_args(request.args)
+        
+        sort = request.args.get('sort')
+        if sort is not None and sort not in SORTS:
+            raise ValueError(f"sort must be one of: {', '.join(SORTS)}")
+        year = request.args.get('year')
+        if year:
+            try:
+                year = int(year)
+            except ValueError:
+                raise ValueError("year must be an integer")
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+        
     try:
         # Get search parameters
         query = request.args.get('q', '')
         category_id = request.args.get('category')
+        status = request.args.get('status')
         user_id = request.args.get('user_id')
+        want_facets = request.args.get('facets', '').lower() in ('1', 'true')
         
-        # Build base query
-        base_query = (
-            supabase.table('papers')
-            .select('*, categories(id, name)')
-        )
+        if want_facets:
+            # Faceted results always come in pages
+            listing.paginate = True
+            if paper_search is None or not paper_search.ready:
+                return jsonify({"error": "Faceted search is not available yet"}), 503
         
-        # Apply category filter if provided
-        if category_id:
-            base_query = base_query.eq('category_id', category_id)
+        # Work out what the user may see
+        viewer = viewer_contexts.resolve(user_id)
         
-        # Apply visibility filters based on user role
-        if not user_id:
-            # Not logged in - only published papers
-            base_query = base_query.eq('status', 'published')
-        else:
-            # Check if user is staff
-            user_profile = supabase.table('profiles').select('user_type').eq('id', user_id).single().execute()
-            is_staff = user_profile.data and user_profile.data.get('user_type') == 'staff'
+        def matching_papers():
+            base_query = (
+                supabase.table('papers')
+                .select(listing.columns('id', 'status'))
+            )
             
-            if is_staff:
-                # Staff can see all papers
-                pass
-            else:
-                # Regular user - published papers + own drafts
-                authored_papers = supabase.table('paper_authors').select('paper_id').eq('author_id', user_id).execute()
-                authored_paper_ids = [paper['paper_id'] for paper in authored_papers.data] if authored_papers.data else []
+            # Apply category, status and year filters if provided
+            if category_id:
+                base_query = base_query.eq('category_id', category_id)
+            if status:
+                base_query = base_query.eq('status', status)
+            if year:
+                base_query = base_query.gte('submitted_at', f"{year}-01-01").lt('submitted_at', f"{year + 1}-01-01")
                 
-                if authored_paper_ids:
-                    # Published papers OR user's own papers
-                    base_query = base_query.or_(f"status.eq.published,id.in.({','.join(authored_paper_ids)})")
-                else:
-                    base_query = base_query.eq('status', 'published')
-        
-        # Apply text search if provided
-        if query:
-            base_query = base_query.or_(f"title.ilike.%{query}%,abstract.ilike.%{query}%")
-        
-        # Execute query
-        response = base_query.execute()
-        return jsonify(response.data)
+            return base_query
+        
+        found = None
+        if paper_search is not None and (query or want_facets or sort):
+            options = dict(
+                is_staff=viewer.is_staff,
+                own_paper_ids=viewer.paper_ids,
+                filters={'category': category_id, 'status': status, 'year': year or None},
+                sort=sort or 'relevance',
+                # Status counts would reveal unpublished papers to students
+                facets=(FACETS if viewer.is_staff else tuple(facet for facet in FACETS if facet != 'status')) if want_facets else (),
+            )
+            found = paper_search.find(query, **options)
+            if found is None and want_facets:
+                # Nothing searchable in the query, e.g. only stop words
+                found = paper_search.find(None, **options)
+        
+        if found is not None:
+            # Sorted by the search index; the rows are re-read with the
+            # visibility filters so a stale index entry can't leak a paper
+            hits, counts = found
+            page, next_cursor = listing.page_sorted(hits)
+            page_ids = [paper_id for paper_id, _ in page]
+            def fetch_batch(batch_ids):
+                return lambda: viewer.restrict(matching_papers()).in_('id', batch_ids).execute().data
+            
+            # Unpaginated searches can return thousands of hits; read the batches side by side
+            batches = run_concurrently({
+                start: fetch_batch(page_ids[start:start + SEARCH_FETCH_BATCH])
+                for start in range(0, len(page_ids), SEARCH_FETCH_BATCH)
+            })
+            rows = {
+                str(row['id']): row
+                for batch in batches.values()
+                for row in batch
+                if viewer.can_see(row)
+            }
+            papers = [rows[paper_id] for paper_id in page_ids if paper_id in rows]
+        else:
+            # Index disabled or still building: substring match upstream. The
+            # pinned client has no or_, so title and abstract matches are
+            # read separately and merged.
+            if query:
+                pattern = f"%{query}%"
+                papers = listing.merge(
+                    viewer.visible_rows(lambda: matching_papers().ilike('title', pattern), listing),
+                    viewer.visible_rows(lambda: matching_papers().ilike('abstract', pattern), listing),
+                )
+            else:
+                papers = viewer.visible_rows(matching_papers, listing)
+            next_cursor = None
+        
+        if listing.wants('categories'):
+            category_registry.embed(papers)
+        
+        body = listing.result(papers, next_cursor=next_cursor)
+        if want_facets:
+            body["total"] = len(hits)
+            body["facets"] = facet_counts(counts)
+        return encoder.json(body)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         print(f"Error in search_papers: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
 
+@app.route('/api/search/suggest', methods=['GET'])
+def suggest_search():
+    """Typeahead completions from paper titles, author names and categories"""
+    try:
+        prefix = request.args.get('q', '')
+        user_id = request.args.get('user_id')
+        
+        try:
+            limit = min(int(request.args.get('limit', SUGGEST_LIMIT)), SUGGEST_LIMIT_MAX)
+        except ValueError:
+            return jsonify({"error": "limit must be an integer"}), 400
+        
+        if paper_search is None or not prefix.strip():
+            return jsonify([])
+        
+        viewer = viewer_contexts.resolve(user_id)
+        return jsonify(paper_search.suggest(prefix, limit, viewer_id=user_id, is_staff=viewer.is_staff))
+    except Exception as e:
+        print(f"Error in suggest_search: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
 @app.route('/api/notifications', methods=['GET'])
 def get_user_notifications():
     """Get notifications for the current user"""
@@ -1592,9 +1817,8 @@ def get_user_notifications():
             supabase.table('notifications')
             .select('*')
             .eq('user_id', user_id)
-            .order('created_at', {'ascending': False})
-            .limit(limit)
-            .offset(offset)
+            .order('created_at', desc=True)
+            .range(offset, offset + limit)
         )
         
         response = query.execute()
@@ -1658,6 +1882,21 @@ def mark_all_notifications_read():
         print(f"Error marking all notifications as read: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
+job_queue.start()
+atexit.register(job_queue.shutdown)
+
+try:
+    category_registry.refresh()
+except Exception as e:
+    # Loaded on first use instead
+    print(f"Error loading categories: {str(e)}")
+
+if paper_search is not None:
+    paper_search.schedule_rebuild(0)
+
+if authentication.verifier.signing_keys is not None:
+    job_queue.enqueue('refresh_signing_keys')
+
 if __name__ == '__main__':
     print("Starting Agora backend server at http://0.0.0.0:5000")
     app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
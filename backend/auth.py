@@ -0,0 +1,335 @@
+"""Access token verification without a round trip to the auth server.
+
+``validate_token`` called ``supabase.auth.get_user(token)``, a request to
+the Supabase auth server, for every check, and the other routes simply
+trusted the ``user_id`` they were sent. ``TokenVerifier`` checks Supabase
+access tokens locally: the signature, ``exp`` and ``nbf``, the audience
+(``authenticated``) and the issuer (``<SUPABASE_URL>/auth/v1``).
+
+* HS256 tokens are checked against the project's JWT secret
+  (``AGORA_JWT_SECRET`` or ``SUPABASE_JWT_SECRET``).
+* RS256 and ES256 tokens are checked against the project's JWKS. The keys
+  are fetched on first use and refreshed in the background every
+  ``refresh_interval`` seconds, or right away (rate limited) when a token
+  names a key we don't have. This needs the ``cryptography`` package.
+* Tokens we can't check locally (no secret configured, JWKS unreachable)
+  are still sent to ``auth.get_user``.
+
+Verified tokens are kept in a small LRU until they expire or for
+``AGORA_TOKEN_CACHE_SECONDS``, whichever is sooner.
+
+``Authentication.init_app`` verifies the ``Authorization: Bearer`` token
+of every request that has one and keeps the user for ``current_user()``.
+Handlers still take the ``user_id`` query or body parameter; a request
+that passes one is refused if its token is invalid or names someone else.
+Without a ``user_id`` an invalid token only makes the request anonymous,
+so public lists keep working for clients holding an expired token. With
+``AGORA_REQUIRE_AUTH=1``, invalid tokens are refused everywhere and
+requests that pass a ``user_id`` without a token are refused too. Views
+marked with ``exempt`` (``validate_token``) check tokens themselves.
+"""
+import base64
+import hashlib
+import hmac
+import json
+import os
+import threading
+import time
+
+import httpx
+from flask import g, jsonify, request
+
+from caching import TTLCache
+
+try:
+    from cryptography.exceptions import InvalidSignature
+    from cryptography.hazmat.primitives import hashes
+    from cryptography.hazmat.primitives.asymmetric import ec, padding, rsa
+    from cryptography.hazmat.primitives.asymmetric.utils import encode_dss_signature
+except ImportError:
+    hashes = None
+
+# Allowed clock difference with the auth server
+LEEWAY_SECONDS = 30
+
+
+class InvalidToken(Exception):
+    """The token is malformed, expired, or not issued for this project"""
+
+
+class TokenUser:
+    """The user an access token was issued to"""
+
+    __slots__ = ('id', 'email', 'role', 'claims')
+
+    def __init__(self, user_id, email=None, role=None, claims=None):
+        self.id = user_id
+        self.email = email
+        self.role = role
+        self.claims = claims or {}
+
+
+def _b64decode(segment):
+    return base64.urlsafe_b64decode(segment + '=' * (-len(segment) % 4))
+
+
+def _b64int(segment):
+    return int.from_bytes(_b64decode(segment), 'big')
+
+
+def _public_key(jwk):
+    """Public key of an RSA or P-256 JWK, or None if we can't use it"""
+    if hashes is None:
+        return None
+    if jwk.get('kty') == 'RSA':
+        return rsa.RSAPublicNumbers(_b64int(jwk['e']), _b64int(jwk['n'])).public_key()
+    if jwk.get('kty') == 'EC' and jwk.get('crv') == 'P-256':
+        return ec.EllipticCurvePublicNumbers(_b64int(jwk['x']), _b64int(jwk['y']), ec.SECP256R1()).public_key()
+    return None
+
+
+def _signature_valid(algorithm, key, signing_input, signature):
+    try:
+        if algorithm == 'RS256' and isinstance(key, rsa.RSAPublicKey):
+            key.verify(signature, signing_input, padding.PKCS1v15(), hashes.SHA256())
+            return True
+        if algorithm == 'ES256' and isinstance(key, ec.EllipticCurvePublicKey) and len(signature) == 64:
+            # JWS carries the raw r || s pair
+            r, s = int.from_bytes(signature[:32], 'big'), int.from_bytes(signature[32:], 'big')
+            key.verify(encode_dss_signature(r, s), signing_input, ec.ECDSA(hashes.SHA256()))
+            return True
+    except InvalidSignature:
+        pass
+    return False
+
+
+class SigningKeys:
+    """The auth server's public keys by ``kid``, refreshed periodically"""
+
+    def __init__(self, url, api_key=None, queue=None, refresh_interval=600.0, miss_refresh_interval=30.0):
+        self.url = url
+        self.api_key = api_key
+        self.queue = queue
+        self.refresh_interval = refresh_interval
+        self.miss_refresh_interval = miss_refresh_interval
+        self._lock = threading.Lock()
+        self._keys = None
+        self._loaded_at = 0.0
+        self._attempted_at = 0.0
+        self._refresh_scheduled = False
+        if queue is not None:
+            queue.register('refresh_signing_keys', self.refresh)
+
+    def refresh(self):
+        """Fetch the JWKS now; keeps the current keys if that fails"""
+        with self._lock:
+            self._attempted_at = time.time()
+            self._refresh_scheduled = False
+        try:
+            response = httpx.get(self.url, headers={'apikey': self.api_key} if self.api_key else None, timeout=5.0)
+            response.raise_for_status()
+            self.load(response.json())
+        except Exception as e:
+            print(f"Error fetching signing keys: {str(e)}")
+        return len(self._keys or ())
+
+    def load(self, jwks):
+        """Replace the keys with those of a JWKS document"""
+        keys = {}
+        for jwk in jwks.get('keys', []):
+            key = _public_key(jwk)
+            if key is not None:
+                keys[jwk.get('kid')] = key
+        with self._lock:
+            self._keys = keys
+            self._loaded_at = time.time()
+
+    def get(self, kid):
+        """``(known, key)``: ``known`` is False while no JWKS could be loaded"""
+        with self._lock:
+            now = time.time()
+            loaded = self._keys is not None
+            stale = loaded and now - self._loaded_at > self.refresh_interval
+            schedule = stale and self.queue is not None and not self._refresh_scheduled
+            if schedule:
+                self._refresh_scheduled = True
+            key = self._keys.get(kid) if loaded else None
+            retry = key is None and now - self._attempted_at > self.miss_refresh_interval
+        if retry or (stale and self.queue is None):
+            # First use, or probably a key rotated in since the last load
+            self.refresh()
+            with self._lock:
+                loaded = self._keys is not None
+                key = self._keys.get(kid) if loaded else None
+        elif schedule:
+            self.queue.enqueue('refresh_signing_keys')
+        return loaded, key
+
+
+class TokenVerifier:
+    """Verifies Supabase access tokens locally, with a cache of recent results"""
+
+    def __init__(self, client, secret=None, signing_keys=None, audience='authenticated', issuer=None,
+                 cache_size=10000, cache_ttl=60.0):
+        self.client = client
+        self.secret = secret.encode('utf-8') if isinstance(secret, str) else secret
+        self.signing_keys = signing_keys
+        self.audience = audience
+        self.issuer = issuer
+        self.cache_ttl = cache_ttl
+        self._cache = TTLCache(maxsize=cache_size, ttl=cache_ttl)
+
+    def verify(self, token):
+        """The token's ``TokenUser``; raises InvalidToken"""
+        cache_key = hashlib.sha256(token.encode('utf-8')).hexdigest()
+        user = self._cache.get(cache_key)
+        if user is not None:
+            return user
+        user, expires_at = self._verify(token)
+        ttl = min(self.cache_ttl, expires_at - time.time())
+        if ttl > 0:
+            self._cache.set(cache_key, user, ttl=ttl)
+        return user
+
+    def _verify(self, token):
+        try:
+            header_segment, payload_segment, signature_segment = token.split('.')
+            header = json.loads(_b64decode(header_segment))
+            claims = json.loads(_b64decode(payload_segment))
+            signature = _b64decode(signature_segment)
+            signing_input = f"{header_segment}.{payload_segment}".encode('ascii')
+        except (ValueError, TypeError):
+            raise InvalidToken("Malformed token")
+        if not isinstance(header, dict) or not isinstance(claims, dict):
+            raise InvalidToken("Malformed token")
+
+        algorithm = header.get('alg')
+        if algorithm == 'HS256' and self.secret:
+            expected = hmac.new(self.secret, signing_input, hashlib.sha256).digest()
+            if not hmac.compare_digest(expected, signature):
+                raise InvalidToken("Invalid token signature")
+        elif algorithm in ('RS256', 'ES256') and self.signing_keys is not None and hashes is not None:
+            known, key = self.signing_keys.get(header.get('kid'))
+            if not known:
+                return self._verify_remote(token, claims)
+            if key is None:
+                raise InvalidToken("Unknown signing key")
+            if not _signature_valid(algorithm, key, signing_input, signature):
+                raise InvalidToken("Invalid token signature")
+        else:
+            return self._verify_remote(token, claims)
+
+        self._check_claims(claims)
+        return TokenUser(str(claims['sub']), claims.get('email'), claims.get('role'), claims), claims['exp']
+
+    def _check_claims(self, claims):
+        now = time.time()
+        expires_at = claims.get('exp')
+        if not isinstance(expires_at, (int, float)) or expires_at + LEEWAY_SECONDS < now:
+            raise InvalidToken("Token expired")
+        not_before = claims.get('nbf')
+        if isinstance(not_before, (int, float)) and not_before - LEEWAY_SECONDS > now:
+            raise InvalidToken("Token not yet valid")
+        audience = claims.get('aud')
+        audiences = audience if isinstance(audience, list) else [audience]
+        if self.audience and self.audience not in audiences:
+            raise InvalidToken("Invalid token audience")
+        if self.issuer and claims.get('iss') != self.issuer:
+            raise InvalidToken("Invalid token issuer")
+        if not claims.get('sub'):
+            raise InvalidToken("Token has no subject")
+
+    def _verify_remote(self, token, claims):
+        """Ask the auth server, for tokens we have no key for"""
+        try:
+            response = self.client.auth.get_user(token)
+        except Exception as e:
+            raise InvalidToken(str(e))
+        if response is None or response.user is None:
+            raise InvalidToken("Invalid token")
+        expires_at = claims.get('exp')
+        if not isinstance(expires_at, (int, float)):
+            expires_at = time.time() + self.cache_ttl
+        user = response.user
+        return TokenUser(str(user.id), user.email, getattr(user, 'role', None), claims), expires_at
+
+
+def bearer_token():
+    """The request's ``Authorization: Bearer`` token, or None"""
+    scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+    token = token.strip()
+    return token if scheme.lower() == 'bearer' and token else None
+
+
+def current_user():
+    """``TokenUser`` of the request's verified access token, or None if it sent none"""
+    return g.get('current_user')
+
+
+def _claimed_user_id():
+    user_id = request.args.get('user_id')
+    if user_id is None and request.method in ('POST', 'PUT', 'PATCH', 'DELETE'):
+        data = request.get_json(silent=True)
+        if isinstance(data, dict):
+            user_id = data.get('user_id')
+    return user_id
+
+
+class Authentication:
+    """Verifies bearer tokens before each request and checks ``user_id`` parameters against them"""
+
+    def __init__(self, verifier, require_token=False):
+        self.verifier = verifier
+        self.require_token = require_token
+        self._exempt = set()
+
+    def exempt(self, view):
+        """Decorator for views that verify tokens themselves"""
+        self._exempt.add(view.__name__)
+        return view
+
+    def authenticate(self):
+        g.current_user = None
+        if request.endpoint in self._exempt:
+            return None
+        token = bearer_token()
+        claimed = _claimed_user_id()
+        if token is None:
+            if self.require_token and claimed:
+                return jsonify({"error": "Authentication required"}), 401
+            return None
+        try:
+            g.current_user = self.verifier.verify(token)
+        except InvalidToken as e:
+            if claimed or self.require_token:
+                return jsonify({"error": str(e)}), 401
+            return None
+        if claimed and str(claimed) != g.current_user.id:
+            return jsonify({"error": "user_id does not match the access token"}), 403
+        return None
+
+    def init_app(self, app):
+        app.before_request(self.authenticate)
+
+
+def create_authentication(client, queue=None, supabase_url=None, api_key=None):
+    """Token checks configured from ``AGORA_JWT_*`` / ``AGORA_TOKEN_*`` environment variables"""
+    signing_keys = None
+    jwks_url = os.environ.get("AGORA_JWKS_URL") or (supabase_url and f"{supabase_url.rstrip('/')}/auth/v1/.well-known/jwks.json")
+    if jwks_url and os.environ.get("AGORA_JWKS", "1") != "0":
+        signing_keys = SigningKeys(
+            jwks_url,
+            api_key=api_key,
+            queue=queue,
+            refresh_interval=float(os.environ.get("AGORA_JWKS_REFRESH_SECONDS", 600)),
+        )
+    verifier = TokenVerifier(
+        client,
+        secret=os.environ.get("AGORA_JWT_SECRET") or os.environ.get("SUPABASE_JWT_SECRET"),
+        signing_keys=signing_keys,
+        audience=os.environ.get("AGORA_JWT_AUDIENCE", "authenticated"),
+        issuer=os.environ.get("AGORA_JWT_ISSUER") or (supabase_url and f"{supabase_url.rstrip('/')}/auth/v1"),
+        cache_size=int(os.environ.get("AGORA_TOKEN_CACHE_SIZE", 10000)),
+        cache_ttl=float(os.environ.get("AGORA_TOKEN_CACHE_SECONDS", 60)),
+    )
+    return Authentication(verifier, require_token=os.environ.get("AGORA_REQUIRE_AUTH") == "1")
@@ -0,0 +1,242 @@
+"""Synthetic Agora dataset for load tests against the local data backend.
+
+Paper popularity follows a Zipf-like curve, so a small head of papers
+collects most views, likes and comments the way trending papers do at
+term-end peaks.
+"""
+import itertools
+import random
+import uuid
+from datetime import datetime, timedelta
+
+# Row counts per preset; ``term-end`` needs several GB of RAM
+SCALES = {
+    'smoke': {
+        'profiles': 300, 'categories': 12, 'papers': 1000, 'views': 20000,
+        'likes': 5000, 'comments': 3000, 'feedback': 1000, 'notifications': 10000,
+        'shared_links': 200,
+    },
+    'dev': {
+        'profiles': 3000, 'categories': 24, 'papers': 10000, 'views': 300000,
+        'likes': 80000, 'comments': 40000, 'feedback': 10000, 'notifications': 150000,
+        'shared_links': 2000,
+    },
+    'term-end': {
+        'profiles': 8000, 'categories': 40, 'papers': 30000, 'views': 2000000,
+        'likes': 1000000, 'comments': 300000, 'feedback': 60000, 'notifications': 1000000,
+        'shared_links': 10000,
+    },
+}
+
+# Share of papers in each status
+STATUS_MIX = (
+    ('published', 0.70),
+    ('under_review', 0.10),
+    ('submitted', 0.08),
+    ('draft', 0.08),
+    ('rejected', 0.04),
+)
+
+WORDS = (
+    'learning network model quantum policy climate urban economic neural graph '
+    'analysis system data market language cognition health energy education '
+    'distributed optimization inference evolution ethics migration water '
+    'protein signal robust adaptive civic labor memory theory design'
+).split()
+
+
+class Dataset:
+    """Identifiers of the generated rows, used to build realistic requests"""
+
+    def __init__(self):
+        self.user_ids = []
+        self.staff_ids = []
+        self.category_ids = []
+        self.paper_ids = []
+        self.published_ids = []
+        self.published_set = set()
+        self.papers_by_status = {}
+        self.authors_by_paper = {}
+        self.access_keys = []
+        self.link_ids = []
+        self.comment_ids = []
+        self.popularity = []
+
+    def popular_paper(self, rng):
+        return rng.choices(self.paper_ids, cum_weights=self.popularity)[0]
+
+    def popular_published(self, rng):
+        paper_id = self.popular_paper(rng)
+        if paper_id in self.published_set:
+            return paper_id
+        return rng.choice(self.published_ids)
+
+    def author_of(self, rng, paper_id):
+        return rng.choice(self.authors_by_paper[paper_id])
+
+
+def _timestamp(rng, now, max_days=180):
+    return (now - timedelta(seconds=rng.randint(0, max_days * 86400))).isoformat()
+
+
+def _text(rng, words):
+    return ' '.join(rng.choice(WORDS) for _ in range(words))
+
+
+def build_dataset(client, scale='dev', seed=42, **overrides):
+    """Populate ``client`` (a LocalSupabaseClient) and return a Dataset"""
+    sizes = dict(SCALES[scale], **overrides)
+    rng = random.Random(seed)
+    now = datetime.now()
+    db = client.db
+    dataset = Dataset()
+    row_ids = itertools.count(1)
+
+    db.seed('categories', [
+        {'id': index + 1, 'name': f"{rng.choice(WORDS).title()} Studies {index + 1}"}
+        for index in range(sizes['categories'])
+    ])
+    dataset.category_ids = list(range(1, sizes['categories'] + 1))
+
+    profiles = []
+    for index in range(sizes['profiles']):
+        user_id = str(uuid.UUID(int=rng.getrandbits(128)))
+        user_type = 'staff' if index % 25 == 0 else 'student'
+        profiles.append({
+            'id': user_id,
+            'full_name': f"{rng.choice(WORDS).title()} {rng.choice(WORDS).title()}son",
+            'email': f"user{index}@uni.minerva.edu",
+            'user_type': user_type,
+        })
+        dataset.user_ids.append(user_id)
+        if user_type == 'staff':
+            dataset.staff_ids.append(user_id)
+    db.seed('profiles', profiles)
+
+    statuses = [status for status, _ in STATUS_MIX]
+    status_weights = [weight for _, weight in STATUS_MIX]
+    papers, authors = [], []
+    for _ in range(sizes['papers']):
+        paper_id = str(uuid.UUID(int=rng.getrandbits(128)))
+        status = rng.choices(statuses, status_weights)[0]
+        submitted_at = _timestamp(rng, now, 365)
+        papers.append({
+            'id': paper_id,
+            'title': _text(rng, rng.randint(4, 10)).title(),
+            'abstract': _text(rng, rng.randint(120, 250)),
+            'category_id': rng.choice(dataset.category_ids),
+            'status': status,
+            'pdf_url': f"papers/{paper_id}.pdf",
+            'submitted_at': submitted_at,
+            'updated_at': submitted_at,
+        })
+        paper_authors = rng.sample(dataset.user_ids, rng.choices((1, 2, 3, 4, 8), (35, 30, 20, 10, 5))[0])
+        for order, author_id in enumerate(paper_authors, start=1):
+            authors.append({
+                'id': next(row_ids),
+                'paper_id': paper_id,
+                'author_id': author_id,
+                'is_corresponding': order == 1,
+                'author_order': order,
+            })
+        dataset.paper_ids.append(paper_id)
+        dataset.papers_by_status.setdefault(status, []).append(paper_id)
+        dataset.authors_by_paper[paper_id] = paper_authors
+    db.seed('papers', papers)
+    db.seed('paper_authors', authors)
+    dataset.published_ids = dataset.papers_by_status.get('published', [])
+    dataset.published_set = set(dataset.published_ids)
+
+    # Zipf-like popularity over a shuffled paper order
+    ranked = list(dataset.paper_ids)
+    rng.shuffle(ranked)
+    dataset.paper_ids = ranked
+    dataset.popularity = list(itertools.accumulate(1.0 / (rank + 1) ** 1.1 for rank in range(len(ranked))))
+
+    def popular(count):
+        return rng.choices(ranked, cum_weights=dataset.popularity, k=count)
+
+    db.seed('paper_views', (
+        {
+            'id': next(row_ids),
+            'paper_id': paper_id,
+            'user_id': rng.choice(dataset.user_ids) if rng.random() < 0.6 else None,
+            'viewed_at': _timestamp(rng, now, 90),
+            'ip_address': f"10.{rng.randint(0, 255)}.{rng.randint(0, 255)}.{rng.randint(1, 254)}",
+        }
+        for paper_id in popular(sizes['views'])
+    ))
+
+    likes, seen = [], set()
+    for paper_id in popular(sizes['likes']):
+        user_id = rng.choice(dataset.user_ids)
+        if (paper_id, user_id) in seen:
+            continue
+        seen.add((paper_id, user_id))
+        likes.append({'id': next(row_ids), 'paper_id': paper_id, 'user_id': user_id, 'created_at': _timestamp(rng, now, 90)})
+    db.seed('paper_likes', likes)
+    del seen
+
+    comments, thread_heads = [], {}
+    for paper_id in popular(sizes['comments']):
+        comment_id = str(uuid.UUID(int=rng.getrandbits(128)))
+        heads = thread_heads.setdefault(paper_id, [])
+        parent_id = rng.choice(heads) if heads and rng.random() < 0.4 else None
+        comments.append({
+            'id': comment_id,
+            'paper_id': paper_id,
+            'user_id': rng.choice(dataset.user_ids),
+            'content': _text(rng, rng.randint(8, 60)),
+            'parent_id': parent_id,
+            'created_at': _timestamp(rng, now, 90),
+        })
+        heads.append(comment_id)
+    db.seed('paper_comments', comments)
+    dataset.comment_ids = [comment['id'] for comment in comments]
+
+    db.seed('paper_feedback', (
+        {
+            'id': next(row_ids),
+            'paper_id': paper_id,
+            'user_id': rng.choice(dataset.user_ids),
+            'content': _text(rng, rng.randint(20, 80)),
+            'is_private': rng.random() < 0.3,
+            'created_at': _timestamp(rng, now, 90),
+        }
+        for paper_id in popular(sizes['feedback'])
+    ))
+
+    kinds = (('like', 'liked'), ('comment', 'commented on'), ('feedback', 'provided feedback on'))
+    db.seed('notifications', (
+        {
+            'id': next(row_ids),
+            'user_id': rng.choice(dataset.authors_by_paper[paper_id]),
+            'related_id': paper_id,
+            'type': kind,
+            'message': f"Someone {verb} your paper",
+            'read': rng.random() < 0.7,
+            'created_at': _timestamp(rng, now, 90),
+        }
+        for paper_id in popular(sizes['notifications'])
+        for kind, verb in (rng.choice(kinds),)
+    ))
+
+    links = []
+    for paper_id in rng.sample(dataset.published_ids, min(sizes['shared_links'], len(dataset.published_ids))):
+        link_id = str(uuid.UUID(int=rng.getrandbits(128)))
+        access_key = f"k{rng.getrandbits(64):016x}"
+        links.append({
+            'id': link_id,
+            'paper_id': paper_id,
+            'created_by': dataset.authors_by_paper[paper_id][0],
+            'access_key': access_key,
+            'view_count': rng.randint(0, 500),
+        })
+        dataset.access_keys.append(access_key)
+        dataset.link_ids.append(link_id)
+    db.seed('paper_shared_links', links)
+
+    for paper_id in dataset.published_ids:
+        client.storage.from_('papers').objects[f"{paper_id}.pdf"] = b'%PDF-1.4\n' + rng.randbytes(256)
+
+    return dataset
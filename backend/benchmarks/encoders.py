@@ -0,0 +1,99 @@
+"""Compare JSON encoders and compression settings on real response payloads.
+
+Builds the synthetic dataset, fetches the payloads of the large list
+endpoints through the app, then times each encoder (``jsonify``, the
+standard library, orjson when installed) and each compression setting on
+the same data. Reports the median time and the output size.
+
+Usage (from backend/):
+    python -m benchmarks.encoders --scale dev --repeat 20
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+os.environ.setdefault("AGORA_DATA_BACKEND", "local")
+os.environ.setdefault("AGORA_RESPONSE_CACHE", "0")
+
+
+def median_ms(function, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def load_payloads(agora, ds):
+    """Decoded responses of the endpoints the encoder is used for"""
+    client = agora.app.test_client()
+    staff_id = ds.staff_ids[0]
+    requests = {
+        'GET /api/papers': ('/api/papers', {}),
+        'GET /api/search-papers (staff)': ('/api/search-papers', {'user_id': staff_id}),
+        'GET /api/search-papers?q=': ('/api/search-papers', {'q': 'learning'}),
+        'GET /api/papers/by-category': (f"/api/papers/by-category/{ds.category_ids[0]}", {}),
+    }
+    payloads = {}
+    for label, (path, query) in requests.items():
+        response = client.get(path, query_string=query)
+        payloads[label] = json.loads(response.get_data())
+    return payloads
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scale', default='dev', help="dataset preset: smoke, dev or term-end")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args(argv)
+
+    import app as agora
+    import encoding
+    from benchmarks.dataset import build_dataset
+    from flask import jsonify
+
+    if not hasattr(agora.supabase, 'db'):
+        print("The encoder benchmark needs AGORA_DATA_BACKEND=local", file=sys.stderr)
+        return 1
+
+    dataset = build_dataset(agora.supabase, scale=args.scale, seed=args.seed)
+    agora.category_registry.refresh()
+    if agora.paper_search is not None:
+        agora.paper_search.rebuild(force=True)
+    payloads = load_payloads(agora, dataset)
+
+    def flask_jsonify(data):
+        with agora.app.app_context():
+            return jsonify(data).get_data()
+
+    encoders = dict({'jsonify': flask_jsonify}, **encoding.ENCODERS)
+    compressions = [('gzip', 1), ('gzip', 4), ('gzip', 6)]
+    if encoding.brotli is not None:
+        compressions += [('br', 4), ('br', 6)]
+    else:
+        print("brotli is not installed; skipping br")
+
+    for label, payload in payloads.items():
+        rows = len(payload) if isinstance(payload, list) else 1
+        print(f"\n{label} ({rows} rows)")
+        print(f"{'encoder':<24} {'ms':>9} {'bytes':>12}")
+        for name, dumps in encoders.items():
+            encoded = dumps(payload)
+            print(f"{name:<24} {median_ms(lambda: dumps(payload), args.repeat):>9.2f} {len(encoded):>12,}")
+        # Compress what the default encoder produces
+        body = encoding.ResponseEncoder().dumps(payload)
+        for coding, level in compressions:
+            options = {'gzip_level': level} if coding == 'gzip' else {'brotli_quality': level}
+            compressed = encoding.compress(body, coding, **options)
+            elapsed = median_ms(lambda: encoding.compress(body, coding, **options), args.repeat)
+            print(f"{f'+ {coding} level {level}':<24} {elapsed:>9.2f} {len(compressed):>12,}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,415 @@
+"""Replay a weighted traffic mix against every route of app.py.
+
+Runs in-process through Flask's test client on top of the local data
+backend, so the numbers measure handler and query CPU cost without network
+noise. Results are written as JSON so runs can be compared across commits.
+
+Usage (from backend/):
+    python -m benchmarks.loadtest --scale dev --requests 20000 --threads 4
+    python -m benchmarks.loadtest --compare results/old.json results/new.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+
+os.environ.setdefault("AGORA_DATA_BACKEND", "local")
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), 'results')
+
+STATUS_TRANSITIONS = {
+    'draft': 'submitted',
+    'submitted': 'under_review',
+    'under_review': 'published',
+    'rejected': 'draft',
+}
+
+
+class Scenario:
+    """One route in the traffic mix and how to build a request for it"""
+
+    def __init__(self, method, rule, weight, build):
+        self.method = method
+        self.rule = rule
+        self.weight = weight
+        self.build = build
+
+    @property
+    def label(self):
+        return f"{self.method} {self.rule}"
+
+
+def _pick_from_index(client, table_name, column, value, rng):
+    ids = client.db.table(table_name).indexes[column].get(str(value))
+    return rng.choice(tuple(ids)) if ids else None
+
+
+def build_scenarios(client, ds):
+    """The traffic mix; weights roughly follow production read/write ratios"""
+    lock = threading.Lock()
+    papers = client.db.table('papers').rows
+
+    def viewer(rng):
+        return rng.choice(ds.user_ids) if rng.random() < 0.8 else None
+
+    def client_ip(rng):
+        return f"10.{rng.randrange(256)}.{rng.randrange(256)}.{rng.randrange(1, 255)}"
+
+    def paper_path(suffix=''):
+        return lambda rng: ('/api/papers/' + ds.popular_paper(rng) + suffix, {})
+
+    def status_change(rng):
+        for _ in range(10):
+            paper_id = rng.choice(ds.paper_ids)
+            target = STATUS_TRANSITIONS.get(papers[paper_id]['status'])
+            if target:
+                return f"/api/papers/{paper_id}/status", {'json': {'status': target}}
+        return f"/api/papers/{paper_id}/status", {'json': {'status': 'draft'}}
+
+    def create_paper(rng):
+        authors = rng.sample(ds.user_ids, 3)
+        return '/api/papers', {'json': {
+            'title': 'Load test paper', 'abstract': 'Synthetic abstract ' * 40,
+            'category_id': rng.choice(ds.category_ids), 'pdf_url': 'papers/load.pdf',
+            'author_id': authors[0],
+            'co_authors': [
+                {'email': client.db.table('profiles').rows[author]['email'], 'order': order}
+                for order, author in enumerate(authors[1:], start=2)
+            ],
+        }}
+
+    def like(rng):
+        paper_id = ds.popular_published(rng)
+        return f"/api/papers/{paper_id}/likes", {'json': {'user_id': rng.choice(ds.user_ids)}}
+
+    def comment(rng):
+        paper_id = ds.popular_published(rng)
+        return f"/api/papers/{paper_id}/comments", {'json': {'user_id': rng.choice(ds.user_ids), 'content': 'Nice work'}}
+
+    def feedback(rng):
+        paper_id = ds.popular_published(rng)
+        return f"/api/papers/{paper_id}/feedback", {'json': {
+            'user_id': rng.choice(ds.user_ids), 'content': 'Consider a larger sample', 'is_private': rng.random() < 0.3,
+        }}
+
+    def pop_comment(rng):
+        with lock:
+            return ds.comment_ids.pop(rng.randrange(len(ds.comment_ids)))
+
+    def pop_link(rng):
+        with lock:
+            index = rng.randrange(len(ds.link_ids))
+            ds.access_keys.pop(index)
+            return ds.link_ids.pop(index)
+
+    def link_owner(link_id):
+        return client.db.table('paper_shared_links').rows[link_id]['created_by']
+
+    def assignment_id(rng):
+        ids = list(client.db.table('review_assignments').rows)
+        return rng.choice(ids) if ids else 'missing'
+
+    def notification_read(rng):
+        user_id = rng.choice(ds.user_ids)
+        notification_id = _pick_from_index(client, 'notifications', 'user_id', user_id, rng)
+        return '/api/notifications/read', {'json': {'notification_id': notification_id or 'missing', 'user_id': user_id}}
+
+    def owned_paper(rng):
+        paper_id = ds.popular_published(rng)
+        return paper_id, ds.author_of(rng, paper_id)
+
+    def shared_links_list(rng):
+        paper_id, author_id = owned_paper(rng)
+        return f"/api/papers/{paper_id}/shared-links", {'query_string': {'user_id': author_id}}
+
+    def shared_link_create(rng):
+        paper_id, author_id = owned_paper(rng)
+        return f"/api/papers/{paper_id}/shared-links", {'json': {'user_id': author_id, 'expires_days': 30}}
+
+    def shared_link_update(rng):
+        link_id = rng.choice(ds.link_ids)
+        return f"/api/shared-links/{link_id}", {'json': {'user_id': link_owner(link_id), 'allow_comments': True}}
+
+    def shared_link_delete(rng):
+        link_id = pop_link(rng)
+        return f"/api/shared-links/{link_id}", {'query_string': {'user_id': link_owner(link_id)}}
+
+    def list_page(rng, args):
+        # Most list views ask for a first page of summary fields
+        if rng.random() < 0.6:
+            args['limit'] = 20
+            args['fields'] = 'id,title,status,submitted_at,categories'
+        return args
+
+    def search(rng):
+        args = {'q': rng.choice(('learning', 'quantum', 'climate', 'network', 'ethics'))}
+        if rng.random() < 0.3:
+            args['category'] = rng.choice(ds.category_ids)
+        if rng.random() < 0.4:
+            # The faceted search page: counts plus a sorted page, query optional
+            args['facets'] = 'true'
+            args['sort'] = rng.choice(('relevance', 'date', 'popularity'))
+            if rng.random() < 0.3:
+                del args['q']
+        user_id = viewer(rng)
+        if user_id:
+            args['user_id'] = user_id
+        return '/api/search-papers', {'query_string': list_page(rng, args)}
+
+    def suggest(rng):
+        # One request per keystroke of the first word
+        word = rng.choice(('learning', 'quantum', 'climate', 'network', 'economic'))
+        args = {'q': word[:rng.randint(1, len(word))]}
+        user_id = viewer(rng)
+        if user_id:
+            args['user_id'] = user_id
+        return '/api/search/suggest', {'query_string': args}
+
+    def by_category(rng):
+        user_id = viewer(rng)
+        args = {'user_id': user_id} if user_id else {}
+        return f"/api/papers/by-category/{rng.choice(ds.category_ids)}", {'query_string': list_page(rng, args)}
+
+    def review(rng):
+        paper_id = rng.choice(ds.papers_by_status.get('under_review') or ds.paper_ids)
+        return '/api/reviews', {'json': {'paper_id': paper_id, 'reviewer_id': rng.choice(ds.staff_ids), 'content': 'Sound methodology', 'rating': 4}}
+
+    def assignment(rng):
+        paper_id = rng.choice(ds.paper_ids)
+        return '/api/review-assignments', {'json': {'paper_id': paper_id, 'reviewer_id': rng.choice(ds.user_ids)}}
+
+    def batch_assignment(rng):
+        paper_id = rng.choice(ds.paper_ids)
+        return '/api/review-assignments/batch', {'json': {'paper_id': paper_id, 'reviewer_ids': rng.sample(ds.user_ids, 3)}}
+
+    def validate_token(rng):
+        return '/api/validate-token', {'json': {'token': client.auth.issue_token(rng.choice(ds.user_ids))}}
+
+    return [
+        Scenario('GET', '/test', 1, lambda rng: ('/test', {})),
+        Scenario('GET', '/metrics', 1, lambda rng: ('/metrics', {})),
+        Scenario('GET', '/hello', 1, lambda rng: ('/hello', {})),
+        Scenario('GET', '/api/hello', 1, lambda rng: ('/api/hello', {})),
+        Scenario('POST', '/api/validate-token', 20, validate_token),
+        Scenario('GET', '/api/categories', 30, lambda rng: ('/api/categories', {})),
+        Scenario('GET', '/api/categories/list', 10, lambda rng: ('/api/categories/list', {})),
+        Scenario('POST', '/api/categories/refresh', 1, lambda rng: ('/api/categories/refresh', {'json': {'user_id': rng.choice(ds.staff_ids)}})),
+        Scenario('GET', '/api/papers', 10, lambda rng: ('/api/papers', {})),
+        Scenario('POST', '/api/papers', 4, create_paper),
+        Scenario('GET', '/api/papers/<paper_id>', 120, paper_path()),
+        Scenario('GET', '/api/papers/<paper_id>/bundle', 40, lambda rng: (f"/api/papers/{ds.popular_paper(rng)}/bundle", {'query_string': {'user_id': rng.choice(ds.user_ids)}})),
+        Scenario('GET', '/api/user/papers', 20, lambda rng: ('/api/user/papers', {'query_string': {'user_id': rng.choice(ds.user_ids)}})),
+        Scenario('POST', '/api/reviews', 2, review),
+        Scenario('GET', '/api/papers/<paper_id>/reviews', 10, paper_path('/reviews')),
+        Scenario('POST', '/api/review-assignments', 2, assignment),
+        Scenario('POST', '/api/review-assignments/batch', 1, batch_assignment),
+        Scenario('DELETE', '/api/review-assignments/<assignment_id>', 1, lambda rng: (f"/api/review-assignments/{assignment_id(rng)}", {})),
+        Scenario('GET', '/api/papers/<paper_id>/review-assignments', 10, paper_path('/review-assignments')),
+        Scenario('GET', '/api/users/reviewers', 3, lambda rng: ('/api/users/reviewers', {'query_string': {'paper_id': rng.choice(ds.paper_ids)}})),
+        Scenario('PUT', '/api/papers/<paper_id>/status', 4, status_change),
+        Scenario('GET', '/api/user/review-assignments', 10, lambda rng: ('/api/user/review-assignments', {'query_string': {'user_id': rng.choice(ds.user_ids)}})),
+        Scenario('GET', '/api/papers/<paper_id>/likes', 80, lambda rng: (f"/api/papers/{ds.popular_paper(rng)}/likes", {'query_string': {'user_id': rng.choice(ds.user_ids)}})),
+        Scenario('POST', '/api/papers/<paper_id>/likes', 25, like),
+        Scenario('GET', '/api/papers/<paper_id>/comments', 80, paper_path('/comments')),
+        Scenario('POST', '/api/papers/<paper_id>/comments', 10, comment),
+        Scenario('PUT', '/api/comments/<comment_id>', 2, lambda rng: (f"/api/comments/{rng.choice(ds.comment_ids)}", {'json': {'content': 'Edited'}})),
+        Scenario('DELETE', '/api/comments/<comment_id>', 1, lambda rng: (f"/api/comments/{pop_comment(rng)}", {})),
+        Scenario('GET', '/api/papers/<paper_id>/feedback', 40, lambda rng: (f"/api/papers/{ds.popular_paper(rng)}/feedback", {'query_string': {'user_id': rng.choice(ds.user_ids)}})),
+        Scenario('POST', '/api/papers/<paper_id>/feedback', 5, feedback),
+        Scenario('POST', '/api/papers/<paper_id>/view', 150, lambda rng: (f"/api/papers/{ds.popular_paper(rng)}/view", {'json': {'user_id': viewer(rng)}, 'environ_base': {'REMOTE_ADDR': client_ip(rng)}})),
+        Scenario('GET', '/api/trending-papers', 15, lambda rng: ('/api/trending-papers', {'query_string': {'time_period': rng.choice((7, 30)), 'limit': 10}})),
+        Scenario('GET', '/api/papers/<paper_id>/stats', 60, paper_path('/stats')),
+        Scenario('GET', '/api/papers/<paper_id>/shared-links', 5, shared_links_list),
+        Scenario('POST', '/api/papers/<paper_id>/shared-links', 2, shared_link_create),
+        Scenario('GET', '/api/shared-links/<access_key>', 60, lambda rng: (f"/api/shared-links/{rng.choice(ds.access_keys)}", {})),
+        Scenario('GET', '/api/shared-links/<access_key>/pdf', 20, lambda rng: (f"/api/shared-links/{rng.choice(ds.access_keys)}/pdf", {})),
+        Scenario('GET', '/api/papers/<paper_id>/pdf', 20, lambda rng: (f"/api/papers/{ds.popular_published(rng)}/pdf", {})),
+        Scenario('PUT', '/api/shared-links/<link_id>', 1, shared_link_update),
+        Scenario('DELETE', '/api/shared-links/<link_id>', 1, shared_link_delete),
+        Scenario('GET', '/api/papers/by-category/<category_id>', 30, by_category),
+        Scenario('GET', '/api/search-papers', 40, search),
+        Scenario('GET', '/api/search/suggest', 80, suggest),
+        Scenario('GET', '/api/notifications', 100, lambda rng: ('/api/notifications', {'query_string': {'user_id': rng.choice(ds.user_ids)}})),
+        Scenario('POST', '/api/notifications/read', 10, notification_read),
+        Scenario('POST', '/api/notifications/read-all', 3, lambda rng: ('/api/notifications/read-all', {'json': {'user_id': rng.choice(ds.user_ids)}})),
+    ]
+
+
+def uncovered_routes(flask_app, scenarios):
+    """Routes registered on the app that the traffic mix never exercises"""
+    covered = {(scenario.method, scenario.rule) for scenario in scenarios}
+    missing = []
+    for rule in flask_app.url_map.iter_rules():
+        if rule.endpoint == 'static':
+            continue
+        for method in sorted(rule.methods - {'HEAD', 'OPTIONS'}):
+            if (method, rule.rule) not in covered:
+                missing.append(f"{method} {rule.rule}")
+    return missing
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def run(flask_app, scenarios, total_requests, threads=1, seed=1):
+    """Fire ``total_requests`` weighted requests and collect per-route samples"""
+    weights = [scenario.weight for scenario in scenarios]
+    samples = {scenario.label: [] for scenario in scenarios}
+    statuses = {scenario.label: {} for scenario in scenarios}
+    per_thread = total_requests // threads
+    record_lock = threading.Lock()
+
+    def worker(worker_seed):
+        rng = random.Random(worker_seed)
+        client = flask_app.test_client()
+        local = []
+        for scenario in rng.choices(scenarios, weights, k=per_thread):
+            path, kwargs = scenario.build(rng)
+            start = time.perf_counter()
+            response = client.open(path, method=scenario.method, **kwargs)
+            elapsed = time.perf_counter() - start
+            local.append((scenario.label, elapsed, response.status_code))
+        with record_lock:
+            for label, elapsed, status in local:
+                samples[label].append(elapsed)
+                statuses[label][status] = statuses[label].get(status, 0) + 1
+
+    workers = [threading.Thread(target=worker, args=(seed + index,)) for index in range(threads)]
+    wall_start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+    wall = time.perf_counter() - wall_start
+    return summarize(samples, statuses, wall)
+
+
+def summarize(samples, statuses, wall):
+    endpoints = {}
+    for label, values in samples.items():
+        if not values:
+            continue
+        values.sort()
+        errors = sum(count for status, count in statuses[label].items() if status >= 500)
+        endpoints[label] = {
+            'count': len(values),
+            'errors': errors,
+            'statuses': {str(status): count for status, count in sorted(statuses[label].items())},
+            'throughput_rps': len(values) / wall,
+            'mean_ms': 1000 * sum(values) / len(values),
+            'p50_ms': 1000 * percentile(values, 0.50),
+            'p95_ms': 1000 * percentile(values, 0.95),
+            'p99_ms': 1000 * percentile(values, 0.99),
+        }
+    total = sum(endpoint['count'] for endpoint in endpoints.values())
+    return {'wall_seconds': wall, 'total_requests': total, 'throughput_rps': total / wall, 'endpoints': endpoints}
+
+
+def print_report(results):
+    print(f"{'endpoint':<52} {'count':>7} {'err':>5} {'rps':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for label, stats in sorted(results['endpoints'].items(), key=lambda item: -item[1]['p95_ms']):
+        print(
+            f"{label:<52} {stats['count']:>7} {stats['errors']:>5} {stats['throughput_rps']:>8.1f} "
+            f"{stats['p50_ms']:>8.2f} {stats['p95_ms']:>8.2f} {stats['p99_ms']:>8.2f}"
+        )
+    print(f"\n{results['total_requests']} requests in {results['wall_seconds']:.1f}s ({results['throughput_rps']:.1f} req/s)")
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def save_results(results, config, path=None):
+    revision = git_revision()
+    results = dict(results, revision=revision, config=config, recorded_at=datetime.now().isoformat())
+    if path is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        path = os.path.join(RESULTS_DIR, f"{datetime.now():%Y%m%d-%H%M%S}-{revision}.json")
+    with open(path, 'w') as handle:
+        json.dump(results, handle, indent=2, sort_keys=True)
+    return path
+
+
+def compare(base_path, new_path):
+    """Print p50/p95 deltas between two saved runs"""
+    with open(base_path) as handle:
+        base = json.load(handle)
+    with open(new_path) as handle:
+        new = json.load(handle)
+    print(f"{base.get('revision')} -> {new.get('revision')}")
+    print(f"{'endpoint':<52} {'p50 ms':>17} {'p95 ms':>17} {'p95 delta':>10}")
+    for label in sorted(set(base['endpoints']) | set(new['endpoints'])):
+        old_stats, new_stats = base['endpoints'].get(label), new['endpoints'].get(label)
+        if not old_stats or not new_stats:
+            print(f"{label:<52} {'(only in one run)':>17}")
+            continue
+        delta = (new_stats['p95_ms'] - old_stats['p95_ms']) / old_stats['p95_ms'] * 100 if old_stats['p95_ms'] else 0.0
+        print(
+            f"{label:<52} {old_stats['p50_ms']:>7.2f} -> {new_stats['p50_ms']:>6.2f} "
+            f"{old_stats['p95_ms']:>7.2f} -> {new_stats['p95_ms']:>6.2f} {delta:>+9.1f}%"
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scale', default='dev', help="dataset preset: smoke, dev or term-end")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--requests', type=int, default=10000)
+    parser.add_argument('--threads', type=int, default=1)
+    parser.add_argument('--warmup', type=int, default=500)
+    parser.add_argument('--output', help="where to write the JSON results")
+    parser.add_argument('--compare', nargs=2, metavar=('BASE', 'NEW'))
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        compare(*args.compare)
+        return 0
+
+    import app as agora
+    from benchmarks.dataset import build_dataset
+
+    if not hasattr(agora.supabase, 'db'):
+        print("The load test needs AGORA_DATA_BACKEND=local", file=sys.stderr)
+        return 1
+
+    start = time.perf_counter()
+    dataset = build_dataset(agora.supabase, scale=args.scale, seed=args.seed)
+    print(f"Built '{args.scale}' dataset in {time.perf_counter() - start:.1f}s")
+    # The dataset is written straight into the tables, like an admin edit
+    agora.category_registry.refresh()
+    if agora.paper_search is not None:
+        agora.paper_search.rebuild(force=True)
+
+    scenarios = build_scenarios(agora.supabase, dataset)
+    missing = uncovered_routes(agora.app, scenarios)
+    if missing:
+        print(f"Routes not in the traffic mix: {', '.join(missing)}")
+
+    if args.warmup:
+        run(agora.app, scenarios, args.warmup, seed=args.seed + 1000)
+    results = run(agora.app, scenarios, args.requests, threads=args.threads, seed=args.seed)
+    print_report(results)
+    config = {'scale': args.scale, 'seed': args.seed, 'requests': args.requests, 'threads': args.threads}
+    print(f"Saved results to {save_results(results, config, args.output)}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,92 @@
+"""Small in-process caches shared by the backend modules."""
+import threading
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Thread-safe mapping whose entries expire after ``ttl`` seconds.
+
+    Past ``maxsize`` entries the least recently used one is evicted.
+    ``generation`` changes on every invalidation; a caller that loads a
+    value and passes the generation it read beforehand to ``set`` won't
+    store something that was invalidated while it was loading.
+    """
+
+    def __init__(self, maxsize=1024, ttl=60.0, timer=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._timer = timer
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.generation = 0
+
+    def _lookup(self, key, now):
+        entry = self._entries.get(key)
+        if entry is None:
+            return _MISSING
+        value, expires = entry
+        if expires <= now:
+            del self._entries[key]
+            return _MISSING
+        self._entries.move_to_end(key)
+        return value
+
+    def _store(self, key, value, ttl, now):
+        self._entries[key] = (value, now + (self.ttl if ttl is None else ttl))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def get(self, key, default=None):
+        with self._lock:
+            value = self._lookup(key, self._timer())
+        return default if value is _MISSING else value
+
+    def set(self, key, value, ttl=None, generation=None):
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return False
+            self._store(key, value, ttl, self._timer())
+            return True
+
+    def add(self, key, value=True, ttl=None):
+        """Store ``value`` only if ``key`` is absent or expired; True if it was stored"""
+        with self._lock:
+            now = self._timer()
+            if self._lookup(key, now) is not _MISSING:
+                return False
+            self._store(key, value, ttl, now)
+            return True
+
+    def pop(self, key, default=None):
+        with self._lock:
+            self.generation += 1
+            entry = self._entries.pop(key, None)
+        if entry is None or entry[1] <= self._timer():
+            return default
+        return entry[0]
+
+    def discard_where(self, predicate):
+        """Drop every entry for which ``predicate(key, value)`` is true"""
+        with self._lock:
+            self.generation += 1
+            stale = [key for key, (value, _) in self._entries.items() if predicate(key, value)]
+            for key in stale:
+                del self._entries[key]
+        return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+
+    def __contains__(self, key):
+        with self._lock:
+            return self._lookup(key, self._timer()) is not _MISSING
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
@@ -0,0 +1,103 @@
+"""Process-wide registry of paper categories.
+
+Categories almost never change, but ``/api/categories`` and
+``/api/categories/list`` selected the whole table on every call, and
+several paper queries joined ``categories(id, name)`` just to show a name.
+``CategoryRegistry`` loads the table once, keeps the serialized response
+and its ETag, and resolves category names locally. It reloads in the
+background once the data is older than ``refresh_interval`` seconds, or
+right away through ``refresh()``.
+"""
+import os
+import threading
+import time
+
+from http_cache import json_body, strong_etag
+
+
+class CategoryRegistry:
+    """All categories, the serialized list and its ETag, refreshed periodically"""
+
+    def __init__(self, client, queue=None, refresh_interval=300.0, miss_refresh_interval=10.0):
+        self.client = client
+        self.queue = queue
+        self.refresh_interval = refresh_interval
+        self.miss_refresh_interval = miss_refresh_interval
+        self._lock = threading.Lock()
+        self._rows = None
+        self._by_id = {}
+        self._body = None
+        self._etag = None
+        self._loaded_at = 0.0
+        self._refresh_scheduled = False
+        if queue is not None:
+            queue.register('refresh_categories', self.refresh)
+
+    def refresh(self):
+        """Reload the categories table now"""
+        rows = self.client.table('categories').select('*').execute().data
+        body = json_body(rows)
+        with self._lock:
+            self._rows = rows
+            self._by_id = {str(row['id']): row for row in rows}
+            self._body = body
+            self._etag = strong_etag(body)
+            self._loaded_at = time.time()
+            self._refresh_scheduled = False
+        return len(rows)
+
+    def _ensure_loaded(self):
+        with self._lock:
+            loaded = self._rows is not None
+            stale = loaded and time.time() - self._loaded_at > self.refresh_interval
+            schedule = stale and self.queue is not None and not self._refresh_scheduled
+            if schedule:
+                self._refresh_scheduled = True
+        if not loaded or (stale and self.queue is None):
+            self.refresh()
+        elif schedule:
+            # Keep serving the current data while the reload runs
+            self.queue.enqueue('refresh_categories')
+
+    def response(self):
+        """``(body, etag)`` of the serialized category list"""
+        self._ensure_loaded()
+        with self._lock:
+            return self._body, self._etag
+
+    def all(self):
+        """Every category row"""
+        self._ensure_loaded()
+        with self._lock:
+            return list(self._rows)
+
+    def get(self, category_id):
+        if category_id is None:
+            return None
+        self._ensure_loaded()
+        key = str(category_id)
+        with self._lock:
+            row = self._by_id.get(key)
+            retry = row is None and time.time() - self._loaded_at > self.miss_refresh_interval
+        if retry:
+            # Probably a category added since the last load
+            self.refresh()
+            with self._lock:
+                row = self._by_id.get(key)
+        return row
+
+    def embed(self, rows, fields=('id', 'name')):
+        """Set ``row['categories']`` like a ``categories(id, name)`` embed would"""
+        for row in rows:
+            category = self.get(row.get('category_id'))
+            row['categories'] = {field: category.get(field) for field in fields} if category else None
+        return rows
+
+
+def create_category_registry(client, queue=None):
+    """Category registry configured from ``AGORA_CATEGORY_*`` environment variables"""
+    return CategoryRegistry(
+        client,
+        queue,
+        refresh_interval=float(os.environ.get("AGORA_CATEGORY_REFRESH_SECONDS", 300)),
+    )
@@ -0,0 +1,394 @@
+"""Per-paper engagement totals kept in memory.
+
+``get_paper_stats`` and ``get_paper_likes`` used to count ``paper_views``,
+``paper_likes``, ``paper_comments`` and ``paper_feedback`` rows on every
+call. ``EngagementCounters`` keeps those totals, plus daily view buckets
+for the windowed view count, per paper in memory. Handlers call ``record``
+after each write, so reads are dictionary lookups.
+
+A paper's counters are loaded from the ``paper_engagement_counts`` and
+``paper_view_daily`` summary tables the first time they are read, or
+counted from the raw tables (totals and the last two days of views) if
+the paper has no summary row yet. Papers that were not written locally
+are reloaded from the summary tables once they get older than the refresh
+interval.
+
+``record`` also buffers the delta, and every ``flush_interval`` seconds the
+buffered deltas are added to the summary tables with one atomic
+``increment_paper_engagement_counts`` call (see
+sql/increment_paper_engagement_counts.sql), so several processes can
+write without overwriting each other. Only every ``recount_interval``
+seconds are the papers written since the last recount counted from the raw
+tables, which corrects any drift (for example writes made outside the
+backend) and stores the counts back.
+
+Listeners added with ``add_listener`` are called with the stored totals
+after each flush and recount, e.g. to refresh the search index's
+popularity scores.
+"""
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+# Counter name -> (raw table, column in paper_engagement_counts)
+KINDS = {
+    'likes': ('paper_likes', 'like_count'),
+    'comments': ('paper_comments', 'comment_count'),
+    'feedback': ('paper_feedback', 'feedback_count'),
+    'views': ('paper_views', 'view_count'),
+}
+
+# Daily view buckets are kept this many days back; longer windows are counted from paper_views
+ROLLUP_DAYS = 366
+
+
+def _day(timestamp=None):
+    """``YYYY-MM-DD`` bucket for an ISO timestamp (default: now)"""
+    if timestamp is None:
+        return datetime.now().date().isoformat()
+    return str(timestamp)[:10]
+
+
+def _days_ago(days):
+    return (datetime.now() - timedelta(days=days)).date().isoformat()
+
+
+def _recent_days():
+    # Views are only ever added at the current time, so older buckets can't change
+    return [_days_ago(1), _day()]
+
+
+class _PaperCounters:
+    """Totals and daily view buckets for one paper"""
+
+    __slots__ = ('totals', 'daily', 'loaded_at')
+
+    def __init__(self, totals, daily):
+        self.totals = totals
+        self.daily = daily
+        self.loaded_at = time.time()
+
+    def apply(self, kind, delta, day):
+        self.totals[kind] = max(0, self.totals.get(kind, 0) + delta)
+        if day is not None:
+            self.daily[day] = max(0, self.daily.get(day, 0) + delta)
+
+    def views_since(self, first_day):
+        return sum(count for day, count in self.daily.items() if day >= first_day)
+
+
+class EngagementCounters:
+    """In-memory like/comment/feedback/view totals with buffered increments and periodic recounts"""
+
+    def __init__(self, client, queue=None, flush_interval=30.0, recount_interval=3600.0, refresh_interval=300.0,
+                 rollup_days=ROLLUP_DAYS):
+        self.client = client
+        self.queue = queue
+        self.flush_interval = flush_interval
+        self.recount_interval = recount_interval
+        self.refresh_interval = refresh_interval
+        self.rollup_days = rollup_days
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._reconcile_lock = threading.Lock()
+        self._papers = {}
+        # Deltas recorded while a paper had no entry or was being reloaded
+        self._pending = {}
+        self._loading = set()
+        # Deltas not yet added to the summary tables: paper id -> (totals, day buckets)
+        self._deltas = {}
+        self._flushing = set()
+        self._touched = set()
+        self._in_flight = {}
+        self._flush_scheduled = False
+        self._reconcile_scheduled = False
+        self._listeners = []
+        if queue is not None:
+            queue.register('flush_engagement_counters', self.flush)
+            queue.register('reconcile_engagement_counters', self.reconcile)
+
+    def record(self, paper_id, kind, delta=1, at=None):
+        """Apply a write that changed ``kind`` by ``delta``; views also go into their day's bucket"""
+        day = _day(at) if kind == 'views' else None
+        with self._lock:
+            entry = self._papers.get(paper_id)
+            if entry is not None:
+                entry.apply(kind, delta, day)
+            if entry is None or paper_id in self._loading:
+                self._pending.setdefault(paper_id, []).append((kind, delta, day))
+            if paper_id in self._in_flight:
+                self._in_flight[paper_id] = True
+            self._merge_deltas(paper_id, {kind: delta}, {day: delta} if day is not None else {})
+            self._touched.add(paper_id)
+            schedule_flush = not self._flush_scheduled
+            schedule_reconcile = not self._reconcile_scheduled
+            self._flush_scheduled = self._reconcile_scheduled = True
+        if self.queue is None:
+            return self.flush()
+        if schedule_flush:
+            self.queue.enqueue_in(self.flush_interval, 'flush_engagement_counters')
+        if schedule_reconcile:
+            self.queue.enqueue_in(self.recount_interval, 'reconcile_engagement_counters')
+
+    def _merge_deltas(self, paper_id, totals, buckets):
+        pending_totals, pending_buckets = self._deltas.setdefault(paper_id, ({}, {}))
+        for kind, delta in totals.items():
+            pending_totals[kind] = pending_totals.get(kind, 0) + delta
+        for day, delta in buckets.items():
+            pending_buckets[day] = pending_buckets.get(day, 0) + delta
+
+    def add_listener(self, callback):
+        """Call ``callback({paper_id: totals})`` with the totals stored by each flush and recount"""
+        self._listeners.append(callback)
+
+    def totals(self, paper_id):
+        """``{'likes', 'comments', 'feedback', 'views'}`` all-time totals"""
+        entry = self._entry(paper_id)
+        with self._lock:
+            return dict(entry.totals)
+
+    def stats(self, paper_id, time_period_days=30):
+        """Totals plus the number of views in the last ``time_period_days`` days.
+
+        The window is counted in whole days: views from any time on the
+        first day of the window are included.
+        """
+        entry = self._entry(paper_id)
+        first_day = _days_ago(time_period_days)
+        with self._lock:
+            totals = dict(entry.totals)
+            view_count = entry.views_since(first_day) if time_period_days < self.rollup_days else None
+        if view_count is None:
+            view_count = self._count('paper_views', paper_id, since=first_day)
+        return {
+            "view_count": view_count,
+            "like_count": totals['likes'],
+            "comment_count": totals['comments'],
+            "feedback_count": totals['feedback'],
+        }
+
+    def _entry(self, paper_id):
+        with self._lock:
+            entry = self._papers.get(paper_id)
+            fresh = entry is not None and (
+                paper_id in self._deltas
+                or paper_id in self._flushing
+                or paper_id in self._in_flight
+                or time.time() - entry.loaded_at < self.refresh_interval
+            )
+        if fresh:
+            return entry
+        with self._lock:
+            self._loading.add(paper_id)
+        try:
+            loaded = self._load(paper_id)
+        finally:
+            with self._lock:
+                self._loading.discard(paper_id)
+        with self._lock:
+            current = self._papers.get(paper_id)
+            if current is not None and current is not entry:
+                return current
+            # The summary tables don't have writes recorded since the last flush yet
+            for kind, delta, day in self._pending.pop(paper_id, ()):
+                loaded.apply(kind, delta, day)
+            self._papers[paper_id] = loaded
+        return loaded
+
+    def _load(self, paper_id):
+        summary = self.client.table('paper_engagement_counts')\
+            .select('*')\
+            .eq('paper_id', paper_id)\
+            .execute()
+        if not summary.data:
+            return self._bootstrap(paper_id)
+        row = summary.data[0]
+        daily = self.client.table('paper_view_daily')\
+            .select('day, view_count')\
+            .eq('paper_id', paper_id)\
+            .gte('day', _days_ago(self.rollup_days))\
+            .execute()
+        return _PaperCounters(
+            {kind: row.get(column) or 0 for kind, (_, column) in KINDS.items()},
+            {bucket['day']: bucket['view_count'] for bucket in daily.data},
+        )
+
+    def _bootstrap(self, paper_id):
+        """Count a paper that has no summary row yet from the raw tables.
+
+        Only the recent day buckets are counted; older views of papers that
+        existed before the summary tables come from the backfill in
+        sql/paper_engagement_counts.sql.
+        """
+        with self._lock:
+            # The raw tables already have every write recorded so far
+            self._pending.pop(paper_id, None)
+            self._deltas.pop(paper_id, None)
+        totals = {kind: self._count(table, paper_id) for kind, (table, _) in KINDS.items()}
+        daily = {day: count for day, count in self._day_counts(paper_id, _recent_days()).items() if count}
+        entry = _PaperCounters(totals, daily)
+        if any(totals.values()):
+            try:
+                self._store({paper_id: entry}, list(daily))
+            except Exception as e:
+                print(f"Error storing engagement counts for {paper_id}: {str(e)}")
+        return entry
+
+    def _count(self, table, paper_id, since=None, until=None):
+        query = self.client.table(table)\
+            .select('id', count='exact')\
+            .eq('paper_id', paper_id)
+        if since is not None:
+            query = query.gte('viewed_at', since)
+        if until is not None:
+            query = query.lt('viewed_at', until)
+        return query.execute().count or 0
+
+    def flush(self):
+        """Add the buffered deltas to the summary tables in one atomic RPC call"""
+        with self._flush_lock:
+            with self._lock:
+                self._flush_scheduled = False
+                deltas, self._deltas = self._deltas, {}
+                self._flushing = set(deltas)
+            try:
+                counts = [
+                    dict({column: totals.get(kind, 0) for kind, (_, column) in KINDS.items()}, paper_id=paper_id)
+                    for paper_id, (totals, _) in deltas.items()
+                    if any(totals.values())
+                ]
+                days = [
+                    {"paper_id": paper_id, "day": day, "view_count": views}
+                    for paper_id, (_, buckets) in deltas.items()
+                    for day, views in buckets.items()
+                    if views
+                ]
+                if not counts and not days:
+                    return 0
+                try:
+                    stored = self.client.rpc('increment_paper_engagement_counts', {
+                        "deltas": counts,
+                        "day_deltas": days,
+                    }).execute()
+                except Exception:
+                    # Merge the deltas back so the retried job applies them
+                    with self._lock:
+                        for paper_id, (totals, buckets) in deltas.items():
+                            self._merge_deltas(paper_id, totals, buckets)
+                    raise
+            finally:
+                with self._lock:
+                    self._flushing = set()
+            self._notify({
+                str(row['paper_id']): {kind: row.get(column) or 0 for kind, (_, column) in KINDS.items()}
+                for row in stored.data or ()
+            })
+            return len(counts)
+
+    def reconcile(self):
+        """Recount every paper written since the last run and store the summaries"""
+        with self._reconcile_lock:
+            with self._lock:
+                self._reconcile_scheduled = False
+                paper_ids = list(self._touched)
+                self._touched = set()
+                for paper_id in paper_ids:
+                    self._in_flight[paper_id] = False
+            recent_days = _recent_days()
+            reconciled = {}
+            try:
+                # The counts include every write recorded so far; add the buffered
+                # deltas first, or storing the counts and a later flush would count
+                # those writes twice
+                self.flush()
+                for paper_id in paper_ids:
+                    entry = self._recount(paper_id, recent_days)
+                    if entry is not None:
+                        reconciled[paper_id] = entry
+                if reconciled:
+                    self._store(reconciled, recent_days)
+                    self._notify({paper_id: dict(entry.totals) for paper_id, entry in reconciled.items()})
+            except Exception:
+                with self._lock:
+                    self._touched.update(paper_ids)
+                    self._reconcile_scheduled = False
+                raise
+            finally:
+                with self._lock:
+                    for paper_id in paper_ids:
+                        self._in_flight.pop(paper_id, None)
+            with self._lock:
+                # Papers written while they were being counted wait for the next run
+                self._touched.update(set(paper_ids) - set(reconciled))
+                schedule = bool(self._touched) and not self._reconcile_scheduled
+                if schedule:
+                    self._reconcile_scheduled = True
+            if schedule and self.queue is not None:
+                self.queue.enqueue_in(self.recount_interval, 'reconcile_engagement_counters')
+            return len(reconciled)
+
+    def _recount(self, paper_id, recent_days):
+        """Counts of ``paper_id`` from the raw tables, or None if it was written while counting"""
+        entry = self._entry(paper_id)
+        totals = {kind: self._count(table, paper_id) for kind, (table, _) in KINDS.items()}
+        recent = self._day_counts(paper_id, recent_days)
+        first_day = _days_ago(self.rollup_days)
+        with self._lock:
+            entry.daily = {day: count for day, count in entry.daily.items() if day >= first_day}
+            self._papers[paper_id] = entry
+            # A write recorded while we were counting may or may not be in the
+            # counts. The in-memory values and the flushed deltas already include
+            # it, so keep both as they are.
+            if self._in_flight[paper_id]:
+                return None
+            entry.totals = totals
+            entry.daily.update(recent)
+            entry.loaded_at = time.time()
+        return _PaperCounters(totals, dict(entry.daily))
+
+    def _day_counts(self, paper_id, days):
+        counts = {}
+        for day in days:
+            next_day = (datetime.fromisoformat(day) + timedelta(days=1)).date().isoformat()
+            counts[day] = self._count('paper_views', paper_id, since=day, until=next_day)
+        return counts
+
+    def _notify(self, totals):
+        if not totals:
+            return
+        for callback in self._listeners:
+            try:
+                callback(totals)
+            except Exception as e:
+                print(f"Error in engagement counter listener: {str(e)}")
+
+    def _store(self, entries, days):
+        now = datetime.now().isoformat()
+        self.client.table('paper_engagement_counts').upsert([
+            dict(
+                {column: entry.totals[kind] for kind, (_, column) in KINDS.items()},
+                paper_id=paper_id,
+                updated_at=now,
+            )
+            for paper_id, entry in entries.items()
+        ], on_conflict='paper_id').execute()
+        buckets = [
+            {"paper_id": paper_id, "day": day, "view_count": entry.daily[day]}
+            for paper_id, entry in entries.items()
+            for day in days
+            if entry.daily.get(day)
+        ]
+        if buckets:
+            self.client.table('paper_view_daily').upsert(buckets, on_conflict='paper_id,day').execute()
+
+
+def create_counters(client, queue=None):
+    """Engagement counters configured from ``AGORA_COUNTER_*`` environment variables"""
+    return EngagementCounters(
+        client,
+        queue,
+        flush_interval=float(os.environ.get("AGORA_COUNTER_FLUSH_SECONDS", 30)),
+        recount_interval=float(os.environ.get("AGORA_COUNTER_RECOUNT_SECONDS", 3600)),
+        refresh_interval=float(os.environ.get("AGORA_COUNTER_REFRESH_SECONDS", 300)),
+    )
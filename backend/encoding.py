@@ -0,0 +1,172 @@
+"""JSON encoding and response compression for large payloads.
+
+The paper list, search and by-category endpoints return full paper rows,
+abstracts included, and ``jsonify`` serialized them with the standard
+library encoder and sent them uncompressed. ``ResponseEncoder.json`` uses
+orjson when it is installed (``AGORA_JSON_ENCODER`` picks an encoder
+explicitly) and streams results of more than ``stream_rows`` rows as a JSON
+array in batches instead of building one large string. The hook installed
+by ``init_app`` compresses JSON responses of at least ``min_compress_bytes``
+with brotli or gzip, whichever the client's ``Accept-Encoding`` prefers;
+brotli is only offered when the ``brotli`` package is installed.
+
+Compressed responses get a weak ETag, so ``If-None-Match`` still matches
+the ETag of the uncompressed body.
+
+``python -m benchmarks.encoders`` compares the encoders and compression
+settings on the payloads these endpoints return.
+"""
+import gzip
+import json
+import os
+import zlib
+
+from flask import Response, request
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+STREAM_BATCH_ROWS = 500
+
+
+def _stdlib_dumps(data):
+    return json.dumps(data, separators=(',', ':'), default=str).encode('utf-8')
+
+
+def _orjson_dumps(data):
+    return orjson.dumps(data, default=str)
+
+
+ENCODERS = {'json': _stdlib_dumps}
+if orjson is not None:
+    ENCODERS['orjson'] = _orjson_dumps
+
+
+def compress(body, coding, gzip_level=4, brotli_quality=4):
+    """``body`` compressed with ``coding`` (``'gzip'`` or ``'br'``)"""
+    if coding == 'br':
+        return brotli.compress(body, quality=brotli_quality)
+    return gzip.compress(body, compresslevel=gzip_level)
+
+
+class _GzipStream:
+    def __init__(self, level):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, chunk):
+        return self._compressor.compress(chunk)
+
+    def flush(self):
+        return self._compressor.flush()
+
+
+class _BrotliStream:
+    def __init__(self, quality):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, chunk):
+        return self._compressor.process(chunk)
+
+    def flush(self):
+        return self._compressor.finish()
+
+
+def _compressed_chunks(chunks, stream):
+    for chunk in chunks:
+        data = stream.compress(chunk)
+        if data:
+            yield data
+    yield stream.flush()
+
+
+class ResponseEncoder:
+    """Serializes JSON responses and compresses them for clients that accept it"""
+
+    def __init__(self, dumps=None, min_compress_bytes=1024, gzip_level=4, brotli_quality=4, stream_rows=2000):
+        self.dumps = dumps or ENCODERS.get('orjson', _stdlib_dumps)
+        self.min_compress_bytes = min_compress_bytes
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.stream_rows = stream_rows
+        self.codings = ('br', 'gzip') if brotli is not None else ('gzip',)
+
+    def json(self, data, status=200):
+        """JSON response for ``data``; long lists are streamed in batches"""
+        if isinstance(data, list) and self.stream_rows and len(data) > self.stream_rows:
+            return Response(self._stream_array(data), status=status, mimetype='application/json')
+        return Response(self.dumps(data), status=status, mimetype='application/json')
+
+    def _stream_array(self, rows):
+        yield b'['
+        for start in range(0, len(rows), STREAM_BATCH_ROWS):
+            if start:
+                yield b','
+            # Encode a batch as an array and drop its brackets
+            yield self.dumps(rows[start:start + STREAM_BATCH_ROWS])[1:-1]
+        yield b']'
+
+    def negotiate(self):
+        """The client's preferred coding among the ones we offer, or None"""
+        best, best_quality = None, 0
+        for coding in self.codings:
+            quality = request.accept_encodings[coding]
+            if quality > best_quality:
+                best, best_quality = coding, quality
+        return best
+
+    def compress_response(self, response):
+        if (
+            response.mimetype != 'application/json'
+            or response.status_code != 200
+            or response.direct_passthrough
+            or 'Content-Encoding' in response.headers
+        ):
+            return response
+        response.vary.add('Accept-Encoding')
+
+        if response.is_streamed:
+            coding = self.negotiate()
+            if coding is None:
+                return response
+            stream = _BrotliStream(self.brotli_quality) if coding == 'br' else _GzipStream(self.gzip_level)
+            response.response = _compressed_chunks(response.response, stream)
+            response.headers.pop('Content-Length', None)
+        else:
+            body = response.get_data()
+            if len(body) < self.min_compress_bytes:
+                return response
+            coding = self.negotiate()
+            if coding is None:
+                return response
+            response.set_data(compress(body, coding, self.gzip_level, self.brotli_quality))
+
+        response.headers['Content-Encoding'] = coding
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
+
+    def init_app(self, app):
+        """Compress JSON responses after every request"""
+        app.after_request(self.compress_response)
+
+
+def create_response_encoder():
+    """Response encoder configured from ``AGORA_JSON_*`` / ``AGORA_COMPRESS_*`` environment variables"""
+    name = os.environ.get("AGORA_JSON_ENCODER")
+    if name and name not in ENCODERS:
+        print(f"Unknown or unavailable JSON encoder '{name}', using the default")
+    return ResponseEncoder(
+        dumps=ENCODERS.get(name),
+        min_compress_bytes=int(os.environ.get("AGORA_COMPRESS_MIN_BYTES", 1024)),
+        gzip_level=int(os.environ.get("AGORA_COMPRESS_GZIP_LEVEL", 4)),
+        brotli_quality=int(os.environ.get("AGORA_COMPRESS_BROTLI_QUALITY", 4)),
+        stream_rows=int(os.environ.get("AGORA_JSON_STREAM_ROWS", 2000)),
+    )
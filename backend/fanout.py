@@ -0,0 +1,61 @@
+"""Run independent upstream reads concurrently.
+
+Handlers that need several unrelated queries (a paper, its authors, its
+figures, ...) hand them to ``run_concurrently`` as zero-argument callables
+and get the results back by name, so the request waits roughly as long as
+the slowest query instead of the sum of all of them. Each call runs in a
+copy of the caller's context, so upstream calls are still attributed to
+the request trace that issued them.
+"""
+import contextvars
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=int(os.environ.get("AGORA_FANOUT_WORKERS", 16)),
+                    thread_name_prefix="fanout",
+                )
+    return _executor
+
+
+def run_concurrently(calls):
+    """Run ``{name: callable}`` on the shared pool and return ``{name: result}``
+
+    The first exception raised by any call is re-raised once every call has
+    finished, so a failing query still surfaces as the handler's error.
+    """
+    if len(calls) <= 1:
+        return {name: call() for name, call in calls.items()}
+    executor = _get_executor()
+    futures = {
+        name: executor.submit(contextvars.copy_context().run, call)
+        for name, call in calls.items()
+    }
+    results = {}
+    error = None
+    for name, future in futures.items():
+        try:
+            results[name] = future.result()
+        except Exception as e:
+            error = error or e
+    if error is not None:
+        raise error
+    return results
+
+
+def shutdown():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=True)
+            _executor = None
@@ -0,0 +1,30 @@
+"""HTTP caching helpers: stable JSON bodies, strong ETags and conditional responses."""
+import hashlib
+import json
+
+from flask import Response, request
+
+
+def json_body(data):
+    """Serialize ``data`` the way ``jsonify`` does outside debug mode, as bytes"""
+    return (json.dumps(data, sort_keys=True, separators=(',', ':'), default=str) + '\n').encode('utf-8')
+
+
+def strong_etag(body):
+    return hashlib.sha256(body).hexdigest()[:32]
+
+
+def conditional_json(body, etag, max_age=0, private=False, last_modified=None):
+    """JSON response carrying ``etag``; a matching ``If-None-Match`` gets a 304 instead"""
+    response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    if private:
+        response.cache_control.private = True
+    else:
+        response.cache_control.public = True
+    response.cache_control.max_age = max_age
+    if max_age == 0:
+        response.cache_control.no_cache = True
+    return response.make_conditional(request)
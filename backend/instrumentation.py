@@ -0,0 +1,344 @@
+"""Upstream round-trip accounting and Prometheus metrics.
+
+``InstrumentedClient`` wraps the Supabase client so that every query
+``execute()``, ``rpc()``, storage and auth call is timed and attributed to
+the Flask endpoint that issued it. ``init_app`` installs the request hooks
+that open a trace per request, feed the per-route histograms and print a
+slow-request log listing every upstream call the request made.
+"""
+import os
+import threading
+import time
+from contextvars import ContextVar
+
+from flask import request
+
+SLOW_REQUEST_SECONDS = float(os.environ.get("AGORA_SLOW_REQUEST_MS", 500)) / 1000
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CALL_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55)
+
+_current_trace = ContextVar('agora_request_trace', default=None)
+
+
+def _labelled(name, label_text):
+    return f"{name}{{{label_text}}}" if label_text else name
+
+
+class Histogram:
+    """Cumulative-bucket histogram keyed by a tuple of label values"""
+
+    def __init__(self, name, documentation, label_names, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series = {}
+
+    def observe(self, labels, value):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series.setdefault(labels, [[0] * len(self.buckets), 0.0, 0])
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[0][index] += 1
+        series[1] += value
+        series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for labels, (bucket_counts, total, count) in sorted(self._series.items()):
+            label_text = ','.join(f'{name}="{value}"' for name, value in zip(self.label_names, labels))
+            prefix = f"{label_text}," if label_text else ''
+            for bound, bucket_count in zip(self.buckets, bucket_counts):
+                lines.append(f'{self.name}_bucket{{{prefix}le="{bound}"}} {bucket_count}')
+            lines.append(f'{self.name}_bucket{{{prefix}le="+Inf"}} {count}')
+            lines.append(f"{_labelled(self.name + '_sum', label_text)} {total}")
+            lines.append(f"{_labelled(self.name + '_count', label_text)} {count}")
+        return lines
+
+
+class Counter:
+    """Monotonic counter keyed by a tuple of label values"""
+
+    def __init__(self, name, documentation, label_names):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self._series = {}
+
+    def inc(self, labels, amount=1):
+        self._series[labels] = self._series.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for labels, value in sorted(self._series.items()):
+            label_text = ','.join(f'{name}="{value}"' for name, value in zip(self.label_names, labels))
+            lines.append(f"{_labelled(self.name, label_text)} {value}")
+        return lines
+
+
+class Gauge:
+    """Point-in-time value, either set directly or read from a callback"""
+
+    def __init__(self, name, documentation, label_names=(), callback=None):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self.callback = callback
+        self._series = {}
+
+    def set(self, labels, value):
+        self._series[labels] = value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge"]
+        series = dict(self._series)
+        if self.callback is not None:
+            series.update(self.callback())
+        for labels, value in sorted(series.items()):
+            label_text = ','.join(f'{name}="{value}"' for name, value in zip(self.label_names, labels))
+            lines.append(f"{_labelled(self.name, label_text)} {value}")
+        return lines
+
+
+class MetricsRegistry:
+    """Holds metrics and renders them in the Prometheus text format"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.metrics = []
+
+    def register(self, metric):
+        with self.lock:
+            self.metrics.append(metric)
+        return metric
+
+    def observe(self, histogram, labels, value):
+        with self.lock:
+            histogram.observe(labels, value)
+
+    def inc(self, counter, labels, amount=1):
+        with self.lock:
+            counter.inc(labels, amount)
+
+    def set(self, gauge, labels, value):
+        with self.lock:
+            gauge.set(labels, value)
+
+    def render(self):
+        with self.lock:
+            lines = []
+            for metric in self.metrics:
+                lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+request_duration = registry.register(Histogram(
+    'agora_request_duration_seconds', 'Time spent in the Flask handler', ('endpoint', 'method'),
+))
+request_upstream_calls = registry.register(Histogram(
+    'agora_request_upstream_calls', 'Upstream Supabase calls issued per request', ('endpoint', 'method'),
+    buckets=CALL_COUNT_BUCKETS,
+))
+request_upstream_duration = registry.register(Histogram(
+    'agora_request_upstream_duration_seconds', 'Time spent waiting on Supabase per request', ('endpoint', 'method'),
+))
+upstream_calls_total = registry.register(Counter(
+    'agora_upstream_calls_total', 'Upstream Supabase calls by issuing endpoint and kind', ('endpoint', 'kind'),
+))
+
+
+class RequestTrace:
+    """Upstream calls made while serving one request (or one background job)"""
+
+    def __init__(self, endpoint, method=''):
+        self.endpoint = endpoint
+        self.method = method
+        self.started = time.perf_counter()
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def record(self, kind, description, elapsed):
+        with self.lock:
+            self.calls.append((kind, description, elapsed))
+
+    @property
+    def upstream_seconds(self):
+        return sum(call[2] for call in self.calls)
+
+
+def current_trace():
+    return _current_trace.get()
+
+
+def start_trace(endpoint, method=''):
+    """Open a trace for work outside a Flask request; returns a reset token"""
+    return _current_trace.set(RequestTrace(endpoint, method))
+
+
+def end_trace(token):
+    _current_trace.reset(token)
+
+
+def _record_call(kind, description, elapsed):
+    trace = _current_trace.get()
+    endpoint = trace.endpoint if trace is not None else 'none'
+    registry.inc(upstream_calls_total, (endpoint, kind))
+    if trace is not None:
+        trace.record(kind, description, elapsed)
+
+
+def _describe_argument(value):
+    text = repr(value)
+    return text if len(text) <= 60 else text[:57] + '...'
+
+
+class _TimedCall:
+    """Proxy that records a chain of builder calls and times ``execute()``"""
+
+    def __init__(self, target, kind, description):
+        self._target = target
+        self._kind = kind
+        self._description = description
+
+    def __getattr__(self, name):
+        attribute = getattr(self._target, name)
+        if name == 'execute':
+            return self._timed_execute
+        if hasattr(attribute, 'execute'):
+            return _TimedCall(attribute, self._kind, f"{self._description}.{name}")
+        if not callable(attribute):
+            return attribute
+
+        def chained(*args, **kwargs):
+            result = attribute(*args, **kwargs)
+            if hasattr(result, 'execute'):
+                arguments = ', '.join(
+                    [_describe_argument(arg) for arg in args]
+                    + [f"{key}={_describe_argument(value)}" for key, value in kwargs.items()]
+                )
+                return _TimedCall(result, self._kind, f"{self._description}.{name}({arguments})")
+            return result
+        return chained
+
+    def __call__(self, *args, **kwargs):
+        # Callable builder attributes such as ``not_(column, operator, value)``
+        result = self._target(*args, **kwargs)
+        if hasattr(result, 'execute'):
+            return _TimedCall(result, self._kind, self._description)
+        return result
+
+    def _timed_execute(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return self._target.execute(*args, **kwargs)
+        finally:
+            _record_call(self._kind, self._description, time.perf_counter() - start)
+
+
+class _TimedService:
+    """Proxy that times every method call on a storage bucket or auth API"""
+
+    def __init__(self, target, kind, description):
+        self._target = target
+        self._kind = kind
+        self._description = description
+
+    def __getattr__(self, name):
+        attribute = getattr(self._target, name)
+        if not callable(attribute):
+            return attribute
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return attribute(*args, **kwargs)
+            finally:
+                arguments = ', '.join(_describe_argument(arg) for arg in args)
+                _record_call(self._kind, f"{self._description}.{name}({arguments})", time.perf_counter() - start)
+        return timed
+
+
+class _TimedStorage:
+    def __init__(self, storage):
+        self._storage = storage
+
+    def from_(self, bucket_id):
+        return _TimedService(self._storage.from_(bucket_id), 'storage', f"storage.{bucket_id}")
+
+    def __getattr__(self, name):
+        return getattr(self._storage, name)
+
+
+class InstrumentedClient:
+    """Wraps a Supabase client so every upstream round trip is accounted for"""
+
+    def __init__(self, client):
+        self._client = client
+        self.storage = _TimedStorage(client.storage)
+        self.auth = _TimedService(client.auth, 'auth', 'auth')
+
+    def table(self, table_name):
+        return _TimedCall(self._client.table(table_name), 'query', table_name)
+
+    def from_(self, table_name):
+        return self.table(table_name)
+
+    def rpc(self, fn, params=None):
+        call = self._client.rpc(fn, params) if params is not None else self._client.rpc(fn)
+        return _TimedCall(call, 'rpc', f"rpc.{fn}")
+
+    @property
+    def wrapped(self):
+        return self._client
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+
+def _log_slow_request(trace, elapsed, status_code):
+    print(
+        f"Slow request: {trace.method} {request.path} ({trace.endpoint}) -> {status_code} "
+        f"in {elapsed * 1000:.1f} ms, {len(trace.calls)} upstream calls, "
+        f"{trace.upstream_seconds * 1000:.1f} ms upstream"
+    )
+    for kind, description, call_elapsed in trace.calls:
+        print(f"    {call_elapsed * 1000:8.1f} ms  {kind:<7} {description}")
+
+
+def init_app(app):
+    """Install the per-request trace hooks on ``app``"""
+
+    @app.before_request
+    def _open_trace():
+        request.environ['agora.trace_token'] = _current_trace.set(
+            RequestTrace(request.endpoint or 'unmatched', request.method)
+        )
+
+    @app.after_request
+    def _close_trace(response):
+        trace = _current_trace.get()
+        if trace is None:
+            return response
+        elapsed = time.perf_counter() - trace.started
+        labels = (trace.endpoint, trace.method)
+        registry.observe(request_duration, labels, elapsed)
+        registry.observe(request_upstream_calls, labels, len(trace.calls))
+        registry.observe(request_upstream_duration, labels, trace.upstream_seconds)
+        if elapsed >= SLOW_REQUEST_SECONDS:
+            _log_slow_request(trace, elapsed, response.status_code)
+        return response
+
+    @app.teardown_request
+    def _reset_trace(exc):
+        token = request.environ.pop('agora.trace_token', None)
+        if token is not None:
+            try:
+                _current_trace.reset(token)
+            except ValueError:
+                _current_trace.set(None)
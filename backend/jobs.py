@@ -0,0 +1,252 @@
+"""In-process background job queue for side effects off the request path.
+
+Handlers enqueue named jobs (``queue.enqueue('notify_paper_authors', ...)``)
+and return immediately; a bounded pool of worker threads runs them, retrying
+failures with exponential backoff. With a ``persist_path`` the pending jobs
+are mirrored into SQLite, so jobs that were queued when the process died are
+picked up again on the next start. ``shutdown`` drains the queue before exit.
+
+Queue depth, job latency and job outcomes are exported through the
+instrumentation registry so the pool can be sized from ``/metrics``.
+"""
+import heapq
+import itertools
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+import instrumentation
+
+JOB_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+job_latency = instrumentation.registry.register(instrumentation.Histogram(
+    'agora_job_latency_seconds', 'Time from enqueue to completion of a background job', ('job',),
+    buckets=JOB_BUCKETS,
+))
+job_run_duration = instrumentation.registry.register(instrumentation.Histogram(
+    'agora_job_run_seconds', 'Time spent running a background job attempt', ('job',),
+    buckets=JOB_BUCKETS,
+))
+job_outcomes = instrumentation.registry.register(instrumentation.Counter(
+    'agora_jobs_total', 'Background job attempts by outcome', ('job', 'outcome'),
+))
+
+
+class Job:
+    def __init__(self, name, args, kwargs, job_id=None, attempts=0, enqueued_at=None):
+        self.id = job_id or str(uuid.uuid4())
+        self.name = name
+        self.args = list(args)
+        self.kwargs = dict(kwargs)
+        self.attempts = attempts
+        self.enqueued_at = enqueued_at or time.time()
+
+
+class _SQLiteJobStore:
+    """Mirror of the pending jobs so they survive a restart"""
+
+    def __init__(self, path):
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute(
+            'CREATE TABLE IF NOT EXISTS jobs ('
+            'id TEXT PRIMARY KEY, name TEXT NOT NULL, payload TEXT NOT NULL, '
+            'attempts INTEGER NOT NULL, enqueued_at REAL NOT NULL, run_at REAL NOT NULL)'
+        )
+        self._connection.commit()
+
+    def save(self, job, run_at):
+        payload = json.dumps({'args': job.args, 'kwargs': job.kwargs})
+        with self._lock:
+            self._connection.execute(
+                'INSERT OR REPLACE INTO jobs VALUES (?, ?, ?, ?, ?, ?)',
+                (job.id, job.name, payload, job.attempts, job.enqueued_at, run_at),
+            )
+            self._connection.commit()
+
+    def remove(self, job):
+        with self._lock:
+            self._connection.execute('DELETE FROM jobs WHERE id = ?', (job.id,))
+            self._connection.commit()
+
+    def pending(self):
+        with self._lock:
+            rows = self._connection.execute(
+                'SELECT id, name, payload, attempts, enqueued_at, run_at FROM jobs ORDER BY run_at'
+            ).fetchall()
+        for job_id, name, payload, attempts, enqueued_at, run_at in rows:
+            payload = json.loads(payload)
+            yield Job(name, payload['args'], payload['kwargs'], job_id, attempts, enqueued_at), run_at
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+
+class JobQueue:
+    """Bounded worker pool running registered jobs with retry and backoff"""
+
+    def __init__(self, workers=4, max_retries=3, backoff=0.5, max_backoff=30.0, persist_path=None):
+        self.workers = workers
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._handlers = {}
+        self._heap = []
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._running = 0
+        self._threads = []
+        self._stopping = False
+        self._draining = False
+        self._store = _SQLiteJobStore(persist_path) if persist_path else None
+        instrumentation.registry.register(instrumentation.Gauge(
+            'agora_job_queue_depth', 'Background jobs waiting or running', ('state',),
+            callback=self._depth_series,
+        ))
+
+    def register(self, name, function):
+        """Make ``function`` runnable as the job ``name``"""
+        self._handlers[name] = function
+        return function
+
+    @property
+    def stopping(self):
+        """True once ``shutdown`` has been called; periodic jobs stop rescheduling"""
+        return self._stopping
+
+    def task(self, name):
+        def decorator(function):
+            return self.register(name, function)
+        return decorator
+
+    def start(self):
+        """Start the workers, first re-queueing jobs persisted by a previous run"""
+        if self._threads:
+            return self
+        if self._store is not None:
+            with self._condition:
+                for job, run_at in self._store.pending():
+                    heapq.heappush(self._heap, (run_at, next(self._sequence), job))
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"job-worker-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def enqueue(self, name, *args, **kwargs):
+        return self.enqueue_in(0, name, *args, **kwargs)
+
+    def enqueue_in(self, delay, name, *args, **kwargs):
+        """Queue a job to run no earlier than ``delay`` seconds from now"""
+        if name not in self._handlers:
+            raise KeyError(f"Unknown job: {name}")
+        job = Job(name, args, kwargs)
+        self._schedule(job, time.time() + delay)
+        return job.id
+
+    def _schedule(self, job, run_at):
+        if self._store is not None:
+            self._store.save(job, run_at)
+        with self._condition:
+            heapq.heappush(self._heap, (run_at, next(self._sequence), job))
+            self._condition.notify()
+
+    def _next_job(self):
+        with self._condition:
+            while True:
+                if self._stopping and (not self._draining or not self._heap):
+                    return None
+                if self._heap:
+                    run_at = self._heap[0][0]
+                    delay = 0 if self._draining else run_at - time.time()
+                    if delay <= 0:
+                        self._running += 1
+                        return heapq.heappop(self._heap)[2]
+                    self._condition.wait(delay)
+                else:
+                    self._condition.wait()
+
+    def _work(self):
+        while True:
+            job = self._next_job()
+            if job is None:
+                return
+            try:
+                self._run(job)
+            finally:
+                with self._condition:
+                    self._running -= 1
+                    self._condition.notify_all()
+
+    def _run(self, job):
+        job.attempts += 1
+        token = instrumentation.start_trace(f"job:{job.name}")
+        start = time.perf_counter()
+        try:
+            self._handlers[job.name](*job.args, **job.kwargs)
+        except Exception as e:
+            instrumentation.registry.observe(job_run_duration, (job.name,), time.perf_counter() - start)
+            if job.attempts <= self.max_retries:
+                instrumentation.registry.inc(job_outcomes, (job.name, 'retried'))
+                delay = min(self.max_backoff, self.backoff * 2 ** (job.attempts - 1))
+                print(f"Job {job.name} failed (attempt {job.attempts}), retrying in {delay:.1f}s: {str(e)}")
+                self._schedule(job, time.time() + delay)
+            else:
+                instrumentation.registry.inc(job_outcomes, (job.name, 'failed'))
+                print(f"Job {job.name} failed after {job.attempts} attempts: {str(e)}")
+                if self._store is not None:
+                    self._store.remove(job)
+            return
+        finally:
+            instrumentation.end_trace(token)
+        instrumentation.registry.observe(job_run_duration, (job.name,), time.perf_counter() - start)
+        instrumentation.registry.observe(job_latency, (job.name,), time.time() - job.enqueued_at)
+        instrumentation.registry.inc(job_outcomes, (job.name, 'succeeded'))
+        if self._store is not None:
+            self._store.remove(job)
+
+    def depth(self):
+        with self._condition:
+            return len(self._heap) + self._running
+
+    def _depth_series(self):
+        with self._condition:
+            return {('queued',): len(self._heap), ('running',): self._running}
+
+    def join(self, timeout=None):
+        """Block until every queued job (including retries) has finished"""
+        deadline = None if timeout is None else time.time() + timeout
+        with self._condition:
+            while self._heap or self._running:
+                remaining = None if deadline is None else deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+        return True
+
+    def shutdown(self, drain=True, timeout=30.0):
+        """Stop the workers, by default after running everything still queued"""
+        with self._condition:
+            self._stopping = True
+            self._draining = drain
+            self._condition.notify_all()
+        deadline = time.time() + timeout
+        for thread in self._threads:
+            thread.join(max(0.0, deadline - time.time()))
+        self._threads = []
+        if self._store is not None:
+            self._store.close()
+
+
+def create_job_queue():
+    """Job queue configured from ``AGORA_JOB_*`` environment variables"""
+    return JobQueue(
+        workers=int(os.environ.get("AGORA_JOB_WORKERS", 4)),
+        max_retries=int(os.environ.get("AGORA_JOB_MAX_RETRIES", 3)),
+        backoff=float(os.environ.get("AGORA_JOB_BACKOFF_SECONDS", 0.5)),
+        persist_path=os.environ.get("AGORA_JOB_DB") or None,
+    )
@@ -0,0 +1,137 @@
+"""Batched, cached lookups of profiles and paper author lists.
+
+Names, emails and user types were fetched one profile at a time: the
+notification fan-out behind likes and status changes read the actor's
+profile and the paper's ``paper_authors`` rows for every event, and
+``get_shared_link_details`` embedded ``profiles`` in a ``paper_authors``
+query per link.
+
+A ``BatchLoader`` works like a DataLoader. ``defer(key)`` queues a key, and
+the next ``load``/``load_many`` fetches every queued key that isn't cached
+together with its own, in one ``in`` query per ``batch_size`` keys. Results,
+including misses, are kept in a bounded LRU for ``ttl`` seconds and can be
+dropped with ``invalidate``.
+
+``create_profile_loader`` loads ``profiles`` rows by user id and
+``create_author_loader`` loads the ``paper_authors`` rows of a paper, in
+author order.
+"""
+import os
+import threading
+
+from caching import TTLCache
+
+_MISSING = object()
+
+
+class Deferred:
+    """A queued key; ``get()`` loads it together with everything else queued"""
+
+    __slots__ = ('loader', 'key')
+
+    def __init__(self, loader, key):
+        self.loader = loader
+        self.key = key
+
+    def get(self):
+        return self.loader.load(self.key)
+
+
+class BatchLoader:
+    """Loads values by key with ``fetch(keys) -> {key: value}``, batching and caching them"""
+
+    def __init__(self, fetch, maxsize=10000, ttl=300.0, batch_size=100):
+        self.fetch = fetch
+        self.batch_size = batch_size
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+        self._pending = set()
+
+    def defer(self, key):
+        key = str(key)
+        if key not in self._cache:
+            with self._lock:
+                self._pending.add(key)
+        return Deferred(self, key)
+
+    def load(self, key):
+        if not key:
+            return None
+        return self.load_many([key]).get(str(key))
+
+    def load_many(self, keys):
+        """``{key: value}`` for ``keys`` (as strings); missing keys map to None"""
+        values, missing = {}, set()
+        for key in keys:
+            if not key:
+                continue
+            key = str(key)
+            value = self._cache.get(key, _MISSING)
+            if value is _MISSING:
+                missing.add(key)
+            else:
+                values[key] = value
+        if not missing:
+            return values
+
+        with self._lock:
+            batch = (missing | self._pending) - set(values)
+            self._pending = set()
+        generation = self._cache.generation
+        batch = sorted(batch)
+        loaded = {}
+        try:
+            for start in range(0, len(batch), self.batch_size):
+                loaded.update(self.fetch(batch[start:start + self.batch_size]))
+        except Exception:
+            with self._lock:
+                # Let the next load retry the other requests' keys
+                self._pending.update(set(batch) - missing)
+            raise
+        for key in batch:
+            value = loaded.get(key)
+            self._cache.set(key, value, generation=generation)
+            if key in missing:
+                values[key] = value
+        return values
+
+    def prime(self, key, value):
+        self._cache.set(str(key), value)
+
+    def invalidate(self, *keys):
+        for key in keys:
+            self._cache.pop(str(key))
+
+
+def create_profile_loader(client):
+    """``profiles`` rows (id, full_name, email, user_type) by user id"""
+    def fetch(user_ids):
+        rows = client.table('profiles').select('id, full_name, email, user_type').in_('id', user_ids).execute()
+        return {str(row['id']): row for row in rows.data}
+
+    return BatchLoader(
+        fetch,
+        maxsize=int(os.environ.get("AGORA_PROFILE_CACHE_SIZE", 10000)),
+        ttl=float(os.environ.get("AGORA_PROFILE_CACHE_SECONDS", 300)),
+    )
+
+
+def create_author_loader(client):
+    """``paper_authors`` rows (author_id, author_order, is_corresponding) by paper id, in author order"""
+    def fetch(paper_ids):
+        rows = client.table('paper_authors')\
+            .select('paper_id, author_id, author_order, is_corresponding')\
+            .in_('paper_id', paper_ids)\
+            .execute()
+        authors = {paper_id: [] for paper_id in paper_ids}
+        for row in rows.data:
+            authors.setdefault(str(row['paper_id']), []).append(row)
+        for rows in authors.values():
+            rows.sort(key=lambda row: row.get('author_order') or 0)
+        return authors
+
+    return BatchLoader(
+        fetch,
+        maxsize=int(os.environ.get("AGORA_AUTHOR_CACHE_SIZE", 10000)),
+        ttl=float(os.environ.get("AGORA_AUTHOR_CACHE_SECONDS", 300)),
+    )
@@ -0,0 +1,762 @@
+"""In-memory stand-in for the Supabase client used by app.py.
+
+Covers the subset of the supabase-py surface the Flask handlers rely on:
+``table()/from_()`` query builders with filters, ordering, pagination,
+``single()``, ``('id', 'count')`` counts and embedded selects such as
+``profiles(id, full_name)``, a handful of ``rpc()`` functions, ``storage``
+signed URLs and ``auth.get_user``. Rows live in Python dicts with hash
+indexes on the columns the handlers filter by, so the whole app can be run,
+profiled and load-tested without a live project.
+
+The query builder only has the methods of the pinned postgrest 0.10.7
+(supabase 1.0.3): there is no ``or_`` or ``offset``, so a call the real
+client would reject fails here as well.
+
+Enable it with ``AGORA_DATA_BACKEND=local``.
+"""
+import base64
+import json
+import re
+import secrets
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+
+def _now():
+    return datetime.now().isoformat()
+
+
+# Columns each table gets a hash index on (``id`` is always indexed)
+INDEXED_COLUMNS = {
+    'papers': ('status', 'category_id'),
+    'paper_authors': ('paper_id', 'author_id'),
+    'profiles': ('email',),
+    'paper_likes': ('paper_id', 'user_id'),
+    'paper_comments': ('paper_id', 'user_id'),
+    'paper_feedback': ('paper_id',),
+    'paper_views': ('paper_id',),
+    'notifications': ('user_id',),
+    'paper_shared_links': ('access_key', 'paper_id'),
+    'reviews': ('paper_id', 'reviewer_id'),
+    'review_assignments': ('paper_id', 'reviewer_id'),
+    'figures': ('paper_id',),
+    'paper_engagement_counts': ('paper_id',),
+    'paper_view_daily': ('paper_id',),
+}
+
+# Column defaults applied on insert, mirroring the database schema
+TABLE_DEFAULTS = {
+    'papers': {'status': 'draft', 'pdf_url': None, 'submitted_at': _now, 'updated_at': _now},
+    'profiles': {'user_type': 'student'},
+    'paper_comments': {'parent_id': None},
+    'paper_feedback': {'is_private': False},
+    'paper_views': {'viewed_at': _now, 'user_id': None},
+    'notifications': {'read': False},
+    'paper_shared_links': {
+        'is_active': True,
+        'view_count': 0,
+        'last_viewed_at': None,
+        'expires_at': None,
+        'allow_comments': False,
+        'allow_download': True,
+    },
+    'review_assignments': {'status': 'assigned', 'assigned_at': _now},
+    'reviews': {'status': 'submitted', 'rating': None},
+}
+
+# (table, embedded name) -> (local column, target table, target column, returns many)
+RELATIONSHIPS = {
+    ('papers', 'categories'): ('category_id', 'categories', 'id', False),
+    ('papers', 'paper_authors'): ('id', 'paper_authors', 'paper_id', True),
+    ('papers', 'figures'): ('id', 'figures', 'paper_id', True),
+    ('paper_authors', 'profiles'): ('author_id', 'profiles', 'id', False),
+    ('paper_authors', 'papers'): ('paper_id', 'papers', 'id', False),
+    ('paper_comments', 'profiles'): ('user_id', 'profiles', 'id', False),
+    ('paper_feedback', 'profiles'): ('user_id', 'profiles', 'id', False),
+    ('paper_likes', 'profiles'): ('user_id', 'profiles', 'id', False),
+    ('paper_shared_links', 'papers'): ('paper_id', 'papers', 'id', False),
+    ('reviews', 'profiles'): ('reviewer_id', 'profiles', 'id', False),
+    ('reviews', 'papers'): ('paper_id', 'papers', 'id', False),
+    ('review_assignments', 'profiles'): ('reviewer_id', 'profiles', 'id', False),
+    ('review_assignments', 'papers'): ('paper_id', 'papers', 'id', False),
+}
+
+
+class LocalAPIError(Exception):
+    """Raised where PostgREST would answer with an error response"""
+
+
+class LocalAPIResponse:
+    """Result of an executed query, shaped like postgrest's APIResponse"""
+
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+    def __repr__(self):
+        return f"LocalAPIResponse(data={self.data!r}, count={self.count!r})"
+
+
+def _key(value):
+    """Normalize a value to the string form PostgREST filters compare against"""
+    if value is None:
+        return 'null'
+    if value is True:
+        return 'true'
+    if value is False:
+        return 'false'
+    return str(value)
+
+
+def _split_top_level(text, sep=','):
+    """Split on ``sep`` while ignoring separators nested in parentheses"""
+    parts, depth, current = [], 0, []
+    for char in text:
+        if char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+        if char == sep and depth == 0:
+            parts.append(''.join(current).strip())
+            current = []
+        else:
+            current.append(char)
+    tail = ''.join(current).strip()
+    if tail:
+        parts.append(tail)
+    return [part for part in parts if part]
+
+
+@lru_cache(maxsize=1024)
+def _like_regex(pattern, ignore_case):
+    body = ''.join(
+        '.*' if char in '%*' else '.' if char == '_' else re.escape(char)
+        for char in pattern
+    )
+    return re.compile(body, re.IGNORECASE | re.DOTALL if ignore_case else re.DOTALL)
+
+
+def _compare(left, right):
+    """Order two filter operands, numerically when both sides allow it"""
+    try:
+        left_num, right_num = float(left), float(right)
+        return (left_num > right_num) - (left_num < right_num)
+    except (TypeError, ValueError):
+        left_str, right_str = _key(left), _key(right)
+        return (left_str > right_str) - (left_str < right_str)
+
+
+def _parse_in_list(value):
+    if isinstance(value, (list, tuple, set)):
+        return {_key(item) for item in value}
+    text = str(value).strip()
+    if text.startswith('(') and text.endswith(')'):
+        text = text[1:-1]
+    return {item.strip().strip('"') for item in text.split(',') if item.strip()}
+
+
+def _matches(row, column, operator, value):
+    actual = row.get(column)
+    if operator == 'eq':
+        return _key(actual) == _key(value)
+    if operator == 'neq':
+        return _key(actual) != _key(value)
+    if operator == 'is':
+        return _key(actual) == _key(value).lower()
+    if operator == 'in':
+        return _key(actual) in _parse_in_list(value)
+    if operator in ('like', 'ilike'):
+        if actual is None:
+            return False
+        return _like_regex(str(value), operator == 'ilike').fullmatch(str(actual)) is not None
+    if actual is None:
+        return False
+    result = _compare(actual, value)
+    if operator == 'gt':
+        return result > 0
+    if operator == 'gte':
+        return result >= 0
+    if operator == 'lt':
+        return result < 0
+    if operator == 'lte':
+        return result <= 0
+    raise LocalAPIError(f"Unsupported filter operator: {operator}")
+
+
+def _parse_select(columns):
+    """Turn a select string into (plain columns, embeds)"""
+    fields, embeds = [], []
+    for item in _split_top_level(columns):
+        item = ' '.join(item.split())
+        if '(' in item:
+            name, inner = item.split('(', 1)
+            alias = name = name.strip()
+            if ':' in name:
+                alias, name = (part.strip() for part in name.split(':', 1))
+            name = name.split('!', 1)[0]
+            embeds.append((alias, name, inner.rsplit(')', 1)[0]))
+        else:
+            fields.append(item)
+    return fields, embeds
+
+
+class LocalTable:
+    """Rows of one table plus hash indexes on frequently filtered columns"""
+
+    def __init__(self, name):
+        self.name = name
+        self.rows = {}
+        self.indexes = {column: {} for column in ('id',) + INDEXED_COLUMNS.get(name, ())}
+
+    def _index_add(self, row):
+        for column, index in self.indexes.items():
+            index.setdefault(_key(row.get(column)), set()).add(row['id'])
+
+    def _index_remove(self, row):
+        for column, index in self.indexes.items():
+            bucket = index.get(_key(row.get(column)))
+            if bucket is not None:
+                bucket.discard(row['id'])
+                if not bucket:
+                    del index[_key(row.get(column))]
+
+    def insert(self, record):
+        row = {}
+        for column, default in TABLE_DEFAULTS.get(self.name, {}).items():
+            row[column] = default() if callable(default) else default
+        row['created_at'] = _now()
+        row.update(record)
+        if row.get('id') is None:
+            row['id'] = str(uuid.uuid4())
+        if _key(row['id']) in self.indexes['id']:
+            raise LocalAPIError(f"duplicate key value violates unique constraint \"{self.name}_pkey\"")
+        self.rows[row['id']] = row
+        self._index_add(row)
+        return row
+
+    def update(self, row, values):
+        self._index_remove(row)
+        row.update(values)
+        self._index_add(row)
+        return row
+
+    def delete(self, row):
+        self._index_remove(row)
+        del self.rows[row['id']]
+        return row
+
+    def candidates(self, filters):
+        """Narrow the scan using the most selective indexed ``eq``/``in`` filter"""
+        best = None
+        for column, operator, value, negate in filters:
+            index = self.indexes.get(column)
+            if index is None or negate or operator not in ('eq', 'in'):
+                continue
+            if operator == 'eq':
+                ids = index.get(_key(value), ())
+            else:
+                ids = set()
+                for item in _parse_in_list(value):
+                    ids.update(index.get(item, ()))
+            if best is None or len(ids) < len(best):
+                best = ids
+        if best is None:
+            return list(self.rows.values())
+        return [self.rows[row_id] for row_id in best if row_id in self.rows]
+
+
+class LocalDatabase:
+    """A set of lazily created tables guarded by a single lock"""
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.tables = {}
+
+    def table(self, name):
+        table = self.tables.get(name)
+        if table is None:
+            table = self.tables.setdefault(name, LocalTable(name))
+        return table
+
+    def seed(self, name, rows):
+        """Bulk-load rows into a table, bypassing the query builder"""
+        with self.lock:
+            table = self.table(name)
+            return [table.insert(dict(row)) for row in rows]
+
+    def project(self, table_name, row, columns):
+        fields, embeds = _parse_select(columns)
+        if not fields or '*' in fields:
+            result = dict(row)
+        else:
+            result = {}
+        for field in fields:
+            if field == '*':
+                continue
+            alias = name = field
+            if ':' in field:
+                alias, name = (part.strip() for part in field.split(':', 1))
+            result[alias] = row.get(name)
+        for alias, name, inner in embeds:
+            relationship = RELATIONSHIPS.get((table_name, name))
+            if relationship is None:
+                raise LocalAPIError(
+                    f"Could not find a relationship between '{table_name}' and '{name}'"
+                )
+            local_column, target_name, target_column, many = relationship
+            target = self.table(target_name)
+            related = target.candidates([(target_column, 'eq', row.get(local_column), False)])
+            related = [
+                self.project(target_name, item, inner)
+                for item in related
+                if _key(item.get(target_column)) == _key(row.get(local_column))
+            ]
+            result[alias] = related if many else (related[0] if related else None)
+        return result
+
+
+class _Negator:
+    """Supports both ``.not_('id', 'in', '(..)')`` and ``.not_.eq(...)``"""
+
+    def __init__(self, builder):
+        self._builder = builder
+
+    def __call__(self, column, operator, value):
+        return self._builder._add_filter(column, operator, value, negate=True)
+
+    def __getattr__(self, name):
+        self._builder._negate_next = True
+        return getattr(self._builder, name)
+
+
+class LocalQueryBuilder:
+    """Chainable query builder mirroring postgrest's request builders"""
+
+    def __init__(self, database, table_name):
+        self._db = database
+        self._table = table_name
+        self._action = 'select'
+        self._columns = '*'
+        self._payload = None
+        self._upsert_on = None
+        self._count = None
+        self._filters = []
+        self._order = []
+        self._limit = None
+        self._offset = 0
+        self._single = False
+        self._maybe_single = False
+        self._negate_next = False
+
+    # Actions
+
+    def select(self, *columns, count=None):
+        columns = [column for column in columns if column]
+        if 'count' in columns:
+            columns.remove('count')
+            count = count or 'exact'
+        self._action = 'select'
+        self._columns = ','.join(columns) or '*'
+        self._count = count
+        return self
+
+    def insert(self, json, count=None, returning='representation', upsert=False):
+        self._action = 'upsert' if upsert else 'insert'
+        self._payload = json
+        self._upsert_on = 'id'
+        return self
+
+    def upsert(self, json, count=None, returning='representation', ignore_duplicates=False, on_conflict=''):
+        self._action = 'upsert'
+        self._payload = json
+        self._upsert_on = on_conflict or 'id'
+        return self
+
+    def update(self, json, count=None, returning='representation'):
+        self._action = 'update'
+        self._payload = json
+        return self
+
+    def delete(self, count=None, returning='representation'):
+        self._action = 'delete'
+        return self
+
+    # Filters
+
+    def _add_filter(self, column, operator, value, negate=False):
+        if self._negate_next:
+            negate, self._negate_next = True, False
+        self._filters.append((column, operator, value, negate))
+        return self
+
+    @property
+    def not_(self):
+        return _Negator(self)
+
+    def filter(self, column, operator, criteria):
+        if operator.startswith('not.'):
+            return self._add_filter(column, operator[4:], criteria, negate=True)
+        return self._add_filter(column, operator, criteria)
+
+    def eq(self, column, value):
+        return self._add_filter(column, 'eq', value)
+
+    def neq(self, column, value):
+        return self._add_filter(column, 'neq', value)
+
+    def gt(self, column, value):
+        return self._add_filter(column, 'gt', value)
+
+    def gte(self, column, value):
+        return self._add_filter(column, 'gte', value)
+
+    def lt(self, column, value):
+        return self._add_filter(column, 'lt', value)
+
+    def lte(self, column, value):
+        return self._add_filter(column, 'lte', value)
+
+    def is_(self, column, value):
+        return self._add_filter(column, 'is', value)
+
+    def like(self, column, pattern):
+        return self._add_filter(column, 'like', pattern)
+
+    def ilike(self, column, pattern):
+        return self._add_filter(column, 'ilike', pattern)
+
+    def in_(self, column, values):
+        return self._add_filter(column, 'in', list(values))
+
+    def match(self, query):
+        for column, value in query.items():
+            self.eq(column, value)
+        return self
+
+    # Modifiers
+
+    def order(self, column, *, desc=False, nullsfirst=False, foreign_table=None):
+        # Without nullsfirst PostgreSQL puts nulls first only in descending order
+        self._order.append((column, desc, nullsfirst or desc))
+        return self
+
+    def limit(self, size, *, foreign_table=None):
+        self._limit = int(size)
+        return self
+
+    def range(self, start, end):
+        # postgrest 0.10.7 (pinned by supabase 1.0.3) sends "Range: start-(end - 1)"
+        self._offset = int(start)
+        self._limit = int(end) - int(start)
+        return self
+
+    def single(self):
+        self._single = True
+        return self
+
+    def maybe_single(self):
+        self._maybe_single = True
+        return self
+
+    # Execution
+
+    def _match_rows(self, table):
+        rows = table.candidates(self._filters)
+        matched = []
+        for row in rows:
+            if not all(_matches(row, *condition[:3]) != condition[3] for condition in self._filters):
+                continue
+            matched.append(row)
+        return matched
+
+    def _sort(self, rows):
+        for column, desc, nullsfirst in reversed(self._order):
+            present = [row for row in rows if row.get(column) is not None]
+            missing = [row for row in rows if row.get(column) is None]
+            # Seeded ids are integers and inserted ones uuids; keep them comparable
+            present.sort(key=lambda row: (isinstance(row[column], str), row[column]), reverse=desc)
+            rows = missing + present if nullsfirst else present + missing
+        return rows
+
+    def execute(self):
+        with self._db.lock:
+            table = self._db.table(self._table)
+            if self._action in ('insert', 'upsert'):
+                records = self._payload if isinstance(self._payload, list) else [self._payload]
+                rows = [self._write(table, record) for record in records]
+            elif self._action == 'update':
+                rows = [table.update(row, dict(self._payload)) for row in self._match_rows(table)]
+            elif self._action == 'delete':
+                rows = [table.delete(row) for row in self._match_rows(table)]
+            else:
+                rows = self._sort(self._match_rows(table))
+            count = len(rows) if self._count else None
+            if self._action == 'select':
+                end = None if self._limit is None else self._offset + self._limit
+                rows = rows[self._offset:end]
+                data = [self._db.project(self._table, row, self._columns) for row in rows]
+            else:
+                data = [dict(row) for row in rows]
+        if self._single or self._maybe_single:
+            if len(data) > 1:
+                raise LocalAPIError("JSON object requested, multiple (or no) rows returned")
+            return LocalAPIResponse(data[0] if data else None, count)
+        return LocalAPIResponse(data, count)
+
+    def _write(self, table, record):
+        if self._action == 'upsert':
+            conflict = [column.strip() for column in self._upsert_on.split(',')]
+            existing = table.candidates([(column, 'eq', record.get(column), False) for column in conflict])
+            for row in existing:
+                if all(_key(row.get(column)) == _key(record.get(column)) for column in conflict):
+                    return table.update(row, dict(record))
+        return table.insert(dict(record))
+
+
+class LocalRpcCall:
+    """Deferred call to a registered local function"""
+
+    def __init__(self, client, function, params):
+        self._client = client
+        self._function = function
+        self._params = params
+
+    def execute(self):
+        with self._client.db.lock:
+            return LocalAPIResponse(self._function(self._client, **self._params))
+
+
+def _rpc_generate_access_key(client):
+    return secrets.token_urlsafe(12)
+
+
+def _rpc_create_paper_with_authors(client, paper, authors):
+    """Insert a paper and its author rows together, undoing both on failure"""
+    papers = client.db.table('papers')
+    paper_authors = client.db.table('paper_authors')
+    paper_row = papers.insert(dict(paper))
+    inserted = []
+    try:
+        for author in authors:
+            inserted.append(paper_authors.insert(dict(author, paper_id=paper_row['id'])))
+    except Exception:
+        for row in inserted:
+            paper_authors.delete(row)
+        papers.delete(paper_row)
+        raise
+    return paper_row['id']
+
+
+def _rpc_increment_shared_link_views(client, deltas):
+    """Add summed view counts to shared links and advance ``last_viewed_at``"""
+    links = client.db.table('paper_shared_links')
+    for delta in deltas:
+        link = links.rows.get(delta['link_id'])
+        if link is None:
+            continue
+        last_viewed_at = link.get('last_viewed_at')
+        links.update(link, {
+            'view_count': (link.get('view_count') or 0) + delta['views'],
+            'last_viewed_at': max(last_viewed_at, delta['last_viewed_at']) if last_viewed_at else delta['last_viewed_at'],
+        })
+    return None
+
+
+def _rpc_increment_paper_engagement_counts(client, deltas, day_deltas):
+    """Add buffered deltas to the engagement summaries and return the updated count rows"""
+    daily = client.db.table('paper_view_daily')
+    for delta in day_deltas:
+        bucket = next((
+            row for row in daily.candidates([('paper_id', 'eq', delta['paper_id'], False)])
+            if row.get('day') == delta['day']
+        ), None)
+        if bucket is None:
+            daily.insert(dict(delta))
+        else:
+            daily.update(bucket, {'view_count': max(0, bucket['view_count'] + delta['view_count'])})
+    counts = client.db.table('paper_engagement_counts')
+    columns = ('like_count', 'comment_count', 'feedback_count', 'view_count')
+    stored = []
+    for delta in deltas:
+        row = next(iter(counts.candidates([('paper_id', 'eq', delta['paper_id'], False)])), None)
+        if row is None:
+            row = counts.insert(dict(delta, updated_at=_now()))
+        else:
+            counts.update(row, dict(
+                {column: max(0, (row.get(column) or 0) + delta[column]) for column in columns},
+                updated_at=_now(),
+            ))
+        stored.append(dict(row))
+    return stored
+
+
+def _rpc_get_trending_papers(client, time_period_days=30, category_filter=None, limit_count=10):
+    """Rank published papers by weighted views, likes and comments in the period"""
+    cutoff = (datetime.now() - timedelta(days=int(time_period_days))).isoformat()
+    papers = client.db.table('papers')
+    candidates = [
+        paper for paper in papers.candidates([('status', 'eq', 'published', False)])
+        if not category_filter or _key(paper.get('category_id')) == _key(category_filter)
+    ]
+    engagement = {}
+    for table_name, column, weight in (
+        ('paper_views', 'viewed_at', 1),
+        ('paper_likes', 'created_at', 3),
+        ('paper_comments', 'created_at', 5),
+    ):
+        table = client.db.table(table_name)
+        index = table.indexes['paper_id']
+        for paper in candidates:
+            count = 0
+            for row_id in index.get(_key(paper['id']), ()):
+                if (table.rows[row_id].get(column) or '') >= cutoff:
+                    count += 1
+            totals = engagement.setdefault(paper['id'], {'score': 0})
+            totals[table_name] = count
+            totals['score'] += weight * count
+    categories = client.db.table('categories').rows
+    ranked = sorted(candidates, key=lambda paper: engagement[paper['id']]['score'], reverse=True)
+    result = []
+    for paper in ranked[:int(limit_count)]:
+        totals = engagement[paper['id']]
+        category = categories.get(paper.get('category_id')) or {}
+        result.append({
+            'id': paper['id'],
+            'title': paper.get('title'),
+            'abstract': paper.get('abstract'),
+            'category_id': paper.get('category_id'),
+            'category_name': category.get('name'),
+            'submitted_at': paper.get('submitted_at'),
+            'view_count': totals['paper_views'],
+            'like_count': totals['paper_likes'],
+            'comment_count': totals['paper_comments'],
+            'trending_score': totals['score'],
+        })
+    return result
+
+
+class LocalBucket:
+    """A storage bucket holding objects in memory"""
+
+    def __init__(self, storage, bucket_id):
+        self._storage = storage
+        self.id = bucket_id
+        self.objects = {}
+
+    def upload(self, path, file, file_options=None):
+        if hasattr(file, 'read'):
+            file = file.read()
+        elif isinstance(file, str):
+            with open(file, 'rb') as handle:
+                file = handle.read()
+        self.objects[path] = file
+        return {'Key': f"{self.id}/{path}"}
+
+    def download(self, path):
+        if path not in self.objects:
+            raise LocalAPIError(f"Object not found: {self.id}/{path}")
+        return self.objects[path]
+
+    def _sign(self, path, expires_in):
+        token = secrets.token_urlsafe(16)
+        url = f"{self._storage.base_url}/object/sign/{self.id}/{path}?token={token}&expires_in={expires_in}"
+        return {'path': path, 'signedURL': url, 'signedUrl': url}
+
+    def create_signed_url(self, path, expires_in, options=None):
+        return self._sign(path, expires_in)
+
+    def create_signed_urls(self, paths, expires_in, options=None):
+        return [self._sign(path, expires_in) for path in paths]
+
+    def get_public_url(self, path, options=None):
+        return f"{self._storage.base_url}/object/public/{self.id}/{path}"
+
+
+class LocalStorage:
+    """Storage API with buckets created on first use"""
+
+    def __init__(self, base_url='http://localhost/storage/v1'):
+        self.base_url = base_url
+        self.buckets = {}
+
+    def from_(self, bucket_id):
+        if bucket_id not in self.buckets:
+            self.buckets[bucket_id] = LocalBucket(self, bucket_id)
+        return self.buckets[bucket_id]
+
+    def get_bucket(self, bucket_id):
+        return self.from_(bucket_id)
+
+
+class _LocalUser:
+    def __init__(self, profile):
+        self.id = profile['id']
+        self.email = profile.get('email')
+
+
+class _LocalUserResponse:
+    def __init__(self, user):
+        self.user = user
+
+
+class LocalAuth:
+    """Minimal auth API resolving tokens issued through ``issue_token``"""
+
+    def __init__(self, client):
+        self._client = client
+        self._tokens = {}
+
+    def issue_token(self, user_id, ttl=3600):
+        """A JWT-shaped token for ``user_id``; its signature is random, so it is only accepted by ``get_user``"""
+        def segment(data):
+            return base64.urlsafe_b64encode(json.dumps(data).encode('utf-8')).decode('ascii').rstrip('=')
+        claims = {'sub': str(user_id), 'aud': 'authenticated', 'exp': int(time.time()) + ttl}
+        token = '.'.join((segment({'alg': 'HS256', 'typ': 'JWT'}), segment(claims), secrets.token_urlsafe(32)))
+        self._tokens[token] = user_id
+        return token
+
+    def get_user(self, jwt=None):
+        user_id = self._tokens.get(jwt)
+        profile = self._client.db.table('profiles').rows.get(user_id) if user_id else None
+        if profile is None:
+            raise LocalAPIError("Invalid JWT")
+        return _LocalUserResponse(_LocalUser(profile))
+
+
+class LocalSupabaseClient:
+    """Drop-in replacement for ``supabase.Client`` backed by in-memory tables"""
+
+    def __init__(self, database=None):
+        self.db = database or LocalDatabase()
+        self.storage = LocalStorage()
+        self.auth = LocalAuth(self)
+        self.functions = {
+            'create_paper_with_authors': _rpc_create_paper_with_authors,
+            'generate_access_key': _rpc_generate_access_key,
+            'get_trending_papers': _rpc_get_trending_papers,
+            'increment_shared_link_views': _rpc_increment_shared_link_views,
+            'increment_paper_engagement_counts': _rpc_increment_paper_engagement_counts,
+        }
+
+    def table(self, table_name):
+        return LocalQueryBuilder(self.db, table_name)
+
+    def from_(self, table_name):
+        return self.table(table_name)
+
+    def rpc(self, fn, params=None):
+        function = self.functions.get(fn)
+        if function is None:
+            raise LocalAPIError(f"Could not find the function public.{fn}")
+        return LocalRpcCall(self, function, params or {})
+
+    def register_function(self, name, function):
+        """Expose ``function(client, **params)`` through ``rpc(name, params)``"""
+        self.functions[name] = function
+
+
+def create_local_client():
+    return LocalSupabaseClient()
@@ -0,0 +1,312 @@
+"""Notification fan-out to paper authors.
+
+Handlers used to look up ``paper_authors`` and insert one ``notifications``
+row per author inside the request. ``NotificationDispatcher`` resolves the
+recipients and any message details on the background job queue and writes
+all rows for an event in a single bulk insert. Actor profiles and author
+lists come from the batching loaders (loaders.py): the keys are queued
+when an event is dispatched, so a burst of events is resolved with one
+query per table, and repeat lookups are served from their cache.
+
+Likes, comments and feedback additionally go through a
+``NotificationCoalescer``. Events of the same type on the same paper within
+a window are merged into one notification per author that is updated in
+place ("Ana and 41 others liked your paper ..."), and pending changes are
+written in batches. In digest mode these events are instead summarised
+into one periodic notification per user.
+"""
+import os
+import threading
+import time
+from datetime import datetime
+
+from loaders import create_author_loader, create_profile_loader
+
+# Event types that are merged instead of producing one row per event
+COALESCED_TYPES = ('like', 'comment', 'feedback')
+
+DIGEST_LABELS = {
+    'like': ('like', 'likes'),
+    'comment': ('comment', 'comments'),
+    'feedback': ('piece of feedback', 'pieces of feedback'),
+}
+
+
+def describe_actors(actor_names, count):
+    """``Ana``, ``Ana and Bo`` or ``Ana and 41 others`` (newest actor first)"""
+    if count <= 1:
+        return actor_names[0]
+    if count == 2 and len(actor_names) > 1:
+        return f"{actor_names[0]} and {actor_names[1]}"
+    return f"{actor_names[0]} and {count - 1} others"
+
+
+class _Group:
+    """Merged events of one type on one paper for one recipient"""
+
+    __slots__ = ('notification_id', 'started', 'actor_ids', 'actor_names', 'template', 'paper_title', 'created_at')
+
+    def __init__(self, started, template, paper_title):
+        self.notification_id = None
+        self.started = started
+        self.actor_ids = set()
+        self.actor_names = []
+        self.template = template
+        self.paper_title = paper_title
+        self.created_at = None
+
+    def add(self, actor_id, actor_name, created_at):
+        if actor_id not in self.actor_ids:
+            self.actor_ids.add(actor_id)
+        elif actor_name in self.actor_names:
+            self.actor_names.remove(actor_name)
+        self.actor_names.insert(0, actor_name)
+        del self.actor_names[2:]
+        self.created_at = created_at
+
+    def message(self):
+        actors = describe_actors(self.actor_names, len(self.actor_ids))
+        return self.template.format(actor_name=actors, paper_title=self.paper_title)
+
+
+class NotificationCoalescer:
+    """Merges like/comment/feedback notifications and writes them in batches"""
+
+    def __init__(self, client, queue=None, window=3600, flush_interval=2.0, digest_interval=0):
+        self.client = client
+        self.queue = queue
+        self.window = window
+        self.flush_interval = flush_interval
+        self.digest_interval = digest_interval
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._groups = {}
+        self._dirty = set()
+        self._digests = {}
+        self._flush_scheduled = False
+        self._digest_scheduled = False
+        if queue is not None:
+            queue.register('flush_notifications', self.flush)
+            queue.register('send_notification_digests', self.send_digests)
+
+    @property
+    def digest_mode(self):
+        return self.digest_interval > 0
+
+    def add(self, recipient_ids, notification_type, related_id, actor_id, actor_name, template, paper_title, created_at):
+        """Record one event for every recipient (except the actor)"""
+        now = time.time()
+        with self._lock:
+            for recipient_id in recipient_ids:
+                if recipient_id == actor_id:
+                    continue
+                if self.digest_mode:
+                    entry = self._digests.setdefault(recipient_id, {}).setdefault(
+                        (notification_type, related_id), {'count': 0, 'paper_title': paper_title}
+                    )
+                    entry['count'] += 1
+                    continue
+                key = (recipient_id, notification_type, related_id)
+                group = self._groups.get(key)
+                if group is None or now - group.started > self.window:
+                    group = self._groups[key] = _Group(now, template, paper_title)
+                group.add(actor_id, actor_name, created_at)
+                self._dirty.add(key)
+            schedule_flush = bool(self._dirty) and not self._flush_scheduled
+            schedule_digest = bool(self._digests) and not self._digest_scheduled
+            self._flush_scheduled = self._flush_scheduled or schedule_flush
+            self._digest_scheduled = self._digest_scheduled or schedule_digest
+        if self.queue is None:
+            return self.send_digests() if self.digest_mode else self.flush()
+        if schedule_flush:
+            self.queue.enqueue_in(self.flush_interval, 'flush_notifications')
+        if schedule_digest:
+            self.queue.enqueue_in(self.digest_interval, 'send_notification_digests')
+
+    def flush(self):
+        """Insert new groups and update existing ones, one bulk call each"""
+        with self._flush_lock:
+            return self._flush()
+
+    def _flush(self):
+        with self._lock:
+            self._flush_scheduled = False
+            dirty = [(key, self._groups[key]) for key in self._dirty if key in self._groups]
+            self._dirty = set()
+            self._prune(time.time())
+        new_groups = [(key, group) for key, group in dirty if group.notification_id is None]
+        updated = [(key, group) for key, group in dirty if group.notification_id is not None]
+        try:
+            if new_groups:
+                response = self.client.table('notifications').insert(
+                    [self._row(key, group) for key, group in new_groups]
+                ).execute()
+                for (key, group), row in zip(new_groups, response.data):
+                    group.notification_id = row['id']
+            if updated:
+                self.client.table('notifications').upsert([
+                    dict(self._row(key, group), id=group.notification_id) for key, group in updated
+                ]).execute()
+        except Exception:
+            # Put the groups back so a retry of this job writes them again
+            with self._lock:
+                self._dirty.update(key for key, _ in dirty)
+            raise
+        return len(dirty)
+
+    def _prune(self, now):
+        expired = [
+            key for key, group in self._groups.items()
+            if now - group.started > self.window and key not in self._dirty
+        ]
+        for key in expired:
+            del self._groups[key]
+
+    @staticmethod
+    def _row(key, group):
+        recipient_id, notification_type, related_id = key
+        return {
+            "user_id": recipient_id,
+            "related_id": related_id,
+            "type": notification_type,
+            "message": group.message(),
+            "read": False,
+            "created_at": group.created_at,
+        }
+
+    def send_digests(self):
+        """Write one summary notification per user for the events since the last digest"""
+        with self._lock:
+            self._digest_scheduled = False
+            digests, self._digests = self._digests, {}
+        created_at = datetime.now().isoformat()
+        rows = [
+            {
+                "user_id": user_id,
+                "related_id": next(iter(events))[1] if len(events) == 1 else None,
+                "type": "digest",
+                "message": self.digest_message(events),
+                "read": False,
+                "created_at": created_at,
+            }
+            for user_id, events in digests.items()
+        ]
+        try:
+            if rows:
+                self.client.table('notifications').insert(rows).execute()
+        except Exception:
+            with self._lock:
+                for user_id, events in digests.items():
+                    pending = self._digests.setdefault(user_id, {})
+                    for event_key, entry in events.items():
+                        merged = pending.setdefault(event_key, {'count': 0, 'paper_title': entry['paper_title']})
+                        merged['count'] += entry['count']
+            raise
+        return len(rows)
+
+    @staticmethod
+    def digest_message(events):
+        totals = {}
+        for (notification_type, _), entry in events.items():
+            totals[notification_type] = totals.get(notification_type, 0) + entry['count']
+        parts = []
+        for notification_type in COALESCED_TYPES:
+            count = totals.get(notification_type)
+            if count:
+                singular, plural = DIGEST_LABELS[notification_type]
+                parts.append(f"{count} {singular if count == 1 else plural}")
+        summary = parts[0] if len(parts) == 1 else f"{', '.join(parts[:-1])} and {parts[-1]}"
+        papers = {related_id: entry['paper_title'] for (_, related_id), entry in events.items()}
+        if len(papers) == 1:
+            return f"New activity on your paper '{next(iter(papers.values()))}': {summary}."
+        return f"New activity on {len(papers)} of your papers: {summary}."
+
+
+class NotificationDispatcher:
+    """Builds recipient rows for an event and writes them in one round trip"""
+
+    def __init__(self, client, queue=None, coalescer=None, profiles=None, authors=None):
+        self.client = client
+        self.queue = queue
+        self.coalescer = coalescer
+        self.profiles = profiles or create_profile_loader(client)
+        self.authors = authors or create_author_loader(client)
+        if queue is not None:
+            queue.register('notify_paper_authors', self._notify_paper_authors)
+
+    @staticmethod
+    def build_rows(recipient_ids, notification_type, message, related_id, actor_id=None, created_at=None):
+        """One unread notification per recipient, skipping the actor themself"""
+        created_at = created_at or datetime.now().isoformat()
+        return [
+            {
+                "user_id": recipient_id,
+                "related_id": related_id,
+                "type": notification_type,
+                "message": message,
+                "read": False,
+                "created_at": created_at,
+            }
+            for recipient_id in recipient_ids
+            if recipient_id != actor_id
+        ]
+
+    def insert_rows(self, rows):
+        if rows:
+            self.client.table('notifications').insert(rows).execute()
+        return rows
+
+    def notify_paper_authors(self, paper_id, notification_type, message, actor_id=None, paper_title=None, actor_name=None):
+        """Notify every author of ``paper_id`` except ``actor_id``.
+
+        ``message`` may reference ``{paper_title}`` and ``{actor_name}``; any
+        value not passed in is looked up when the fan-out runs. As before, no
+        notifications are sent if the paper or the actor's profile is missing.
+        """
+        args = (paper_id, notification_type, message, actor_id, paper_title, actor_name, datetime.now().isoformat())
+        # Looked up together with the other events queued before the job runs
+        self.authors.defer(paper_id)
+        if actor_name is None and actor_id and '{actor_name}' in message:
+            self.profiles.defer(actor_id)
+        if self.queue is None:
+            return self._notify_paper_authors(*args)
+        return self.queue.enqueue('notify_paper_authors', *args)
+
+    def _notify_paper_authors(self, paper_id, notification_type, message, actor_id, paper_title, actor_name, created_at):
+        if paper_title is None and '{paper_title}' in message:
+            paper = self.client.table('papers').select('title').eq('id', paper_id).single().execute()
+            if not paper.data:
+                return []
+            paper_title = paper.data['title']
+
+        if actor_name is None and '{actor_name}' in message:
+            profile = self.profiles.load(actor_id)
+            if not profile:
+                return []
+            actor_name = profile['full_name']
+
+        author_ids = [author['author_id'] for author in self.authors.load(paper_id) or ()]
+
+        if self.coalescer is not None and notification_type in COALESCED_TYPES:
+            return self.coalescer.add(
+                author_ids, notification_type, paper_id, actor_id, actor_name, message, paper_title, created_at
+            )
+
+        text = message.format(paper_title=paper_title, actor_name=actor_name)
+        rows = self.build_rows(author_ids, notification_type, text, paper_id, actor_id, created_at)
+        return self.insert_rows(rows)
+
+
+def create_coalescer(client, queue=None):
+    """Coalescer configured from ``AGORA_NOTIFICATION_*``; None when disabled"""
+    window = float(os.environ.get("AGORA_NOTIFICATION_COALESCE_SECONDS", 3600))
+    digest_interval = float(os.environ.get("AGORA_NOTIFICATION_DIGEST_SECONDS", 0))
+    if window <= 0 and digest_interval <= 0:
+        return None
+    return NotificationCoalescer(
+        client,
+        queue,
+        window=window,
+        flush_interval=float(os.environ.get("AGORA_NOTIFICATION_FLUSH_SECONDS", 2)),
+        digest_interval=digest_interval,
+    )
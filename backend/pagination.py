@@ -0,0 +1,160 @@
+"""Keyset pagination and field projection for the paper list endpoints.
+
+``get_papers``, ``search_papers`` and ``get_papers_by_category`` returned
+every column of every matching paper. A ``PaperListing`` built from the
+request arguments adds two opt-in controls:
+
+* ``fields=id,title,status`` selects only those columns (plus
+  ``categories``, resolved from the category registry), so list views can
+  skip abstracts and PDF paths.
+* ``limit`` and/or ``cursor`` switch the response to pages of at most
+  ``MAX_LIMIT`` papers, newest first, ordered on ``(submitted_at, id)``.
+  The page is returned as ``{"papers": [...], "next_cursor": ...}``; pass
+  ``next_cursor`` back as ``cursor`` for the next page. Cursors are opaque
+  and keep working while papers are added, unlike offsets. Search results
+  sorted by the search index are paged on ``(sort key, id)`` instead.
+
+Without either argument the endpoints return the full list as before.
+Visibility filters are applied by the handlers and are unaffected.
+"""
+import base64
+import json
+import os
+
+SORT_COLUMNS = ('submitted_at', 'id')
+
+PAPER_FIELDS = frozenset((
+    'id', 'title', 'abstract', 'status', 'category_id', 'pdf_url',
+    'submitted_at', 'updated_at', 'created_at', 'categories',
+))
+
+DEFAULT_LIMIT = int(os.environ.get("AGORA_PAGE_SIZE", 50))
+MAX_LIMIT = int(os.environ.get("AGORA_PAGE_SIZE_MAX", 200))
+
+
+def encode_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values, default=str).encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except ValueError:
+        raise ValueError("Invalid cursor")
+    if not isinstance(values, list) or len(values) != len(SORT_COLUMNS):
+        raise ValueError("Invalid cursor")
+    return values
+
+
+class PaperListing:
+    """Projection and page requested for a paper list"""
+
+    def __init__(self, fields=None, limit=None, cursor=None, paginate=False):
+        self.fields = fields
+        self.limit = limit
+        self.cursor = cursor
+        self.paginate = paginate
+
+    @classmethod
+    def from_args(cls, args):
+        """Read ``fields``, ``limit`` and ``cursor``; raises ValueError on bad values"""
+        fields = None
+        if args.get('fields'):
+            fields = [field.strip() for field in args['fields'].split(',') if field.strip()]
+            unknown = sorted(set(fields) - PAPER_FIELDS)
+            if unknown:
+                raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+
+        paginate = 'limit' in args or 'cursor' in args
+        limit = DEFAULT_LIMIT
+        if args.get('limit'):
+            try:
+                limit = int(args['limit'])
+            except ValueError:
+                raise ValueError("limit must be an integer")
+            if limit < 1:
+                raise ValueError("limit must be positive")
+        cursor = decode_cursor(args['cursor']) if args.get('cursor') else None
+        return cls(fields, min(limit, MAX_LIMIT), cursor, paginate)
+
+    def wants(self, field):
+        return self.fields is None or field in self.fields
+
+    def columns(self, *needed):
+        """Select string for the requested fields plus the columns in ``needed``"""
+        if self.fields is None:
+            return '*'
+        columns = set(self.fields) | set(needed)
+        if self.paginate:
+            columns.update(SORT_COLUMNS)
+        if 'categories' in columns:
+            # Filled in from the category registry, not joined
+            columns.discard('categories')
+            columns.add('category_id')
+        return ', '.join(sorted(columns))
+
+    def fetch(self, build_query):
+        """Rows of ``build_query()`` for the requested page.
+
+        Pages carry one extra row, which tells ``result`` there is a next
+        page. postgrest 0.10.7 has no ``or`` filter, so the rows after a
+        cursor are read as those sharing its ``submitted_at`` with a smaller
+        id, then the older ones.
+        """
+        if not self.paginate:
+            return build_query().execute().data
+        first, second = SORT_COLUMNS
+        if self.cursor is None:
+            return self._ordered(build_query(), self.limit + 1).execute().data
+        after_first, after_second = self.cursor
+        rows = self._ordered(build_query().eq(first, after_first).lt(second, after_second), self.limit + 1).execute().data
+        if len(rows) <= self.limit:
+            older = build_query().lt(first, after_first)
+            rows += self._ordered(older, self.limit + 1 - len(rows)).execute().data
+        return rows
+
+    def _ordered(self, query, size):
+        first, second = SORT_COLUMNS
+        return query.order(first, desc=True).order(second, desc=True).limit(size)
+
+    def merge(self, *batches):
+        """One result from several ``fetch`` results, without duplicate ids; pages are re-sorted and cut"""
+        rows, seen = [], set()
+        for batch in batches:
+            for row in batch:
+                if str(row['id']) not in seen:
+                    seen.add(str(row['id']))
+                    rows.append(row)
+        if self.paginate:
+            first, second = SORT_COLUMNS
+            rows.sort(key=lambda row: (row.get(first) or '', str(row[second])), reverse=True)
+            rows = rows[:self.limit + 1]
+        return rows
+
+    def page_sorted(self, hits):
+        """This page of ``[(paper_id, key), ...]`` hits, sorted on ``(key, id)`` descending, and the cursor after it"""
+        if self.cursor is not None:
+            after_key, after_id = self.cursor
+            if not isinstance(after_key, (int, float, str)) or isinstance(after_key, bool):
+                raise ValueError("Invalid cursor")
+            try:
+                hits = [hit for hit in hits if (hit[1], hit[0]) < (after_key, str(after_id))]
+            except TypeError:
+                # A cursor from a different sort order
+                raise ValueError("Invalid cursor")
+        if not self.paginate or len(hits) <= self.limit:
+            return hits, None
+        hits = hits[:self.limit]
+        return hits, encode_cursor([hits[-1][1], hits[-1][0]])
+
+    def result(self, rows, extra=(), next_cursor=None):
+        """Response body for the fetched ``rows``; ``extra`` keys are kept besides the fields"""
+        if self.paginate and len(rows) > self.limit:
+            rows = rows[:self.limit]
+            next_cursor = encode_cursor([rows[-1][column] for column in SORT_COLUMNS])
+        if self.fields is not None:
+            keep = set(self.fields) | set(extra)
+            rows = [{key: value for key, value in row.items() if key in keep} for row in rows]
+        if self.paginate:
+            return {"papers": rows, "next_cursor": next_cursor}
+        return rows
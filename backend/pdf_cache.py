@@ -0,0 +1,190 @@
+"""Bounded on-disk cache of stored PDFs for the streaming proxy mode.
+
+With ``AGORA_PDF_PROXY=1`` the backend serves PDFs itself instead of
+handing out signed storage URLs, so the many range requests a browser's
+PDF viewer makes are answered from local disk. ``PdfDiskCache`` keeps
+whole objects under ``directory`` and evicts the least recently used ones
+once they take up more than ``max_bytes``. A miss streams the object from
+storage into a temporary file in chunks, and only one request fills a
+given object at a time. The file is then served with ``send_file``, which
+handles ``Range``, ``ETag`` and ``If-None-Match`` and uses the server's
+zero-copy file wrapper (``sendfile``) where there is one.
+
+File names carry the object key hash and the content hash used as the
+ETag, so the index can be rebuilt from the directory after a restart.
+"""
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+import httpx
+
+import instrumentation
+
+CHUNK_SIZE = 256 * 1024
+
+pdf_cache_lookups = instrumentation.registry.register(instrumentation.Counter(
+    'agora_pdf_cache_lookups_total', 'PDF disk cache lookups by result', ('result',),
+))
+
+
+def signed_url_source(signer, chunk_size=CHUNK_SIZE, timeout=30.0):
+    """Stream an object over HTTP from a signed URL (``signer.get(path)``)"""
+    def chunks(path):
+        with httpx.stream('GET', signer.get(path), timeout=timeout) as response:
+            response.raise_for_status()
+            yield from response.iter_bytes(chunk_size)
+    return chunks
+
+
+def download_source(storage, bucket, chunk_size=CHUNK_SIZE):
+    """Read an object with the storage client's ``download``; used by the local backend"""
+    def chunks(path):
+        data = storage.from_(bucket).download(path)
+        for start in range(0, len(data), chunk_size):
+            yield data[start:start + chunk_size]
+    return chunks
+
+
+class _Entry:
+    __slots__ = ('filename', 'size', 'etag', 'stored_at')
+
+    def __init__(self, filename, size, etag, stored_at):
+        self.filename = filename
+        self.size = size
+        self.etag = etag
+        self.stored_at = stored_at
+
+
+class PdfDiskCache:
+    """Whole-object LRU cache on local disk, bounded by total size"""
+
+    def __init__(self, source, directory, max_bytes=2 * 1024 ** 3, max_age=86400):
+        self.source = source
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._fill_locks = {}
+        self._entries = OrderedDict()
+        self._bytes = 0
+        os.makedirs(directory, exist_ok=True)
+        self._load_index()
+        instrumentation.registry.register(instrumentation.Gauge(
+            'agora_pdf_cache_bytes', 'Bytes held in the PDF disk cache', (),
+            callback=lambda: {(): self._bytes},
+        ))
+
+    @staticmethod
+    def _key(path):
+        return hashlib.sha256(path.encode('utf-8')).hexdigest()[:32]
+
+    def _load_index(self):
+        """Rebuild the index from ``<key>.<etag>.pdf`` files, oldest access first"""
+        files = []
+        for name in os.listdir(self.directory):
+            parts = name.split('.')
+            full = os.path.join(self.directory, name)
+            if len(parts) != 3 or parts[2] != 'pdf':
+                if name.startswith('.fill-'):
+                    os.unlink(full)
+                continue
+            stat = os.stat(full)
+            files.append((stat.st_atime, parts[0], _Entry(full, stat.st_size, parts[1], stat.st_mtime)))
+        for _, key, entry in sorted(files, key=lambda item: item[0]):
+            self._entries[key] = entry
+            self._bytes += entry.size
+
+    def get(self, path):
+        """``(filename, etag)`` of the cached object, filling it from storage on a miss"""
+        key = self._key(path)
+        entry = self._lookup(key)
+        if entry is not None:
+            instrumentation.registry.inc(pdf_cache_lookups, ('hit',))
+            return entry.filename, entry.etag
+        with self._lock:
+            fill_lock = self._fill_locks.setdefault(key, threading.Lock())
+        with fill_lock:
+            # Another request may have filled it while we waited
+            entry = self._lookup(key)
+            if entry is None:
+                instrumentation.registry.inc(pdf_cache_lookups, ('miss',))
+                entry = self._fill(key, path)
+            else:
+                instrumentation.registry.inc(pdf_cache_lookups, ('hit',))
+        with self._lock:
+            self._fill_locks.pop(key, None)
+        return entry.filename, entry.etag
+
+    def _lookup(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if time.time() - entry.stored_at > self.max_age or not os.path.exists(entry.filename):
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def _fill(self, key, path):
+        digest = hashlib.sha256()
+        size = 0
+        descriptor, temporary = tempfile.mkstemp(prefix='.fill-', dir=self.directory)
+        try:
+            with os.fdopen(descriptor, 'wb') as handle:
+                for chunk in self.source(path):
+                    handle.write(chunk)
+                    digest.update(chunk)
+                    size += len(chunk)
+            etag = digest.hexdigest()[:32]
+            filename = os.path.join(self.directory, f"{key}.{etag}.pdf")
+            os.replace(temporary, filename)
+        except Exception:
+            if os.path.exists(temporary):
+                os.unlink(temporary)
+            raise
+        entry = _Entry(filename, size, etag, time.time())
+        with self._lock:
+            if key in self._entries:
+                self._remove(key, keep=filename)
+            self._entries[key] = entry
+            self._bytes += size
+            self._evict(keep=key)
+        return entry
+
+    def _remove(self, key, keep=None):
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+        if entry.filename != keep:
+            try:
+                # Requests already streaming the file keep their open handle
+                os.unlink(entry.filename)
+            except FileNotFoundError:
+                pass
+
+    def _evict(self, keep):
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            oldest = next(iter(self._entries))
+            if oldest == keep:
+                break
+            self._remove(oldest)
+
+    def invalidate(self, path):
+        with self._lock:
+            key = self._key(path)
+            if key in self._entries:
+                self._remove(key)
+
+
+def create_pdf_cache(source):
+    """Disk cache configured from ``AGORA_PDF_CACHE_*`` environment variables"""
+    return PdfDiskCache(
+        source,
+        os.environ.get("AGORA_PDF_CACHE_DIR") or os.path.join(tempfile.gettempdir(), 'agora-pdf-cache'),
+        max_bytes=int(float(os.environ.get("AGORA_PDF_CACHE_MB", 2048)) * 1024 * 1024),
+        max_age=float(os.environ.get("AGORA_PDF_CACHE_MAX_AGE_SECONDS", 86400)),
+    )
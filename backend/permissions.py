@@ -0,0 +1,108 @@
+"""Authorship and staff checks, looked up once per request.
+
+The shared-link handlers, ``get_paper_feedback`` and ``refresh_categories``
+each queried ``paper_authors`` and ``profiles.user_type`` themselves to
+decide access, always both even when the first answer settled it, and a
+check for N papers meant N queries.
+
+``PermissionResolver.current()`` returns the request's ``Permissions``,
+which remembers every answer until the request ends. Questions about
+several papers or users are answered with one ``in`` query for whatever
+isn't known yet. Staff status is also kept in a process-wide cache for
+``AGORA_STAFF_CACHE_SECONDS`` (default 30), which ``ViewerContexts`` shares.
+"""
+import os
+
+from flask import g
+
+from caching import TTLCache
+
+
+class Permissions:
+    """Memoized authorship and staff answers for one request"""
+
+    def __init__(self, resolver):
+        self._resolver = resolver
+        self._staff = {}
+        self._authors = {}
+
+    def staff(self, user_ids):
+        """``{user_id: is_staff}`` for ``user_ids``"""
+        user_ids = [str(user_id) for user_id in user_ids if user_id]
+        missing = [user_id for user_id in user_ids if user_id not in self._staff]
+        if missing:
+            self._staff.update(self._resolver.staff_status(missing))
+        return {user_id: self._staff[user_id] for user_id in user_ids}
+
+    def is_staff(self, user_id):
+        return bool(user_id) and self.staff([user_id])[str(user_id)]
+
+    def authored(self, user_id, paper_ids):
+        """The ids among ``paper_ids`` that ``user_id`` is an author of"""
+        if not user_id:
+            return set()
+        user_id = str(user_id)
+        paper_ids = {str(paper_id) for paper_id in paper_ids}
+        missing = [paper_id for paper_id in paper_ids if (user_id, paper_id) not in self._authors]
+        if missing:
+            rows = self._resolver.client.table('paper_authors')\
+                .select('paper_id')\
+                .eq('author_id', user_id)\
+                .in_('paper_id', missing)\
+                .execute()
+            found = {str(row['paper_id']) for row in rows.data}
+            for paper_id in missing:
+                self._authors[(user_id, paper_id)] = paper_id in found
+        return {paper_id for paper_id in paper_ids if self._authors[(user_id, paper_id)]}
+
+    def is_author(self, user_id, paper_id):
+        return bool(self.authored(user_id, [paper_id]))
+
+    def can_manage(self, user_id, paper_id):
+        """Authors and staff may manage a paper's shared links and private feedback"""
+        return self.is_author(user_id, paper_id) or self.is_staff(user_id)
+
+
+class PermissionResolver:
+    """Creates the per-request ``Permissions`` and caches staff status across requests"""
+
+    def __init__(self, client, staff_ttl=30.0, maxsize=10000):
+        self.client = client
+        self._staff = TTLCache(maxsize=maxsize, ttl=staff_ttl)
+
+    def current(self):
+        """The ``Permissions`` of the current request"""
+        permissions = g.get('permissions')
+        if permissions is None:
+            permissions = g.permissions = Permissions(self)
+        return permissions
+
+    def staff_status(self, user_ids):
+        """``{user_id: is_staff}``, with one query for the users not cached"""
+        status, missing = {}, []
+        for user_id in user_ids:
+            cached = self._staff.get(str(user_id))
+            if cached is None:
+                missing.append(str(user_id))
+            else:
+                status[str(user_id)] = cached
+        if missing:
+            generation = self._staff.generation
+            rows = self.client.table('profiles').select('id, user_type').in_('id', missing).execute()
+            staff = {str(row['id']) for row in rows.data if row.get('user_type') == 'staff'}
+            for user_id in missing:
+                status[user_id] = user_id in staff
+                self._staff.set(user_id, status[user_id], generation=generation)
+        return status
+
+    def is_staff(self, user_id):
+        return self.staff_status([user_id])[str(user_id)]
+
+
+def create_permission_resolver(client):
+    """Permission resolver configured from ``AGORA_STAFF_CACHE_*`` environment variables"""
+    return PermissionResolver(
+        client,
+        staff_ttl=float(os.environ.get("AGORA_STAFF_CACHE_SECONDS", 30)),
+        maxsize=int(os.environ.get("AGORA_STAFF_CACHE_SIZE", 10000)),
+    )
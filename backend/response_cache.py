@@ -0,0 +1,130 @@
+"""Response cache and conditional GETs for read endpoints.
+
+GET handlers used to re-run their queries and re-serialize the result on
+every poll, and sent no validators, so a client could never get a 304.
+``ResponseCache.cached`` wraps a handler: a successful JSON response is kept
+as serialized bytes together with a strong ETag, keyed on the route, its
+URL arguments, the query string and (unless the route is ``public``) the
+viewer. Hits are served from those bytes, and a matching ``If-None-Match``
+gets a 304 without touching the body. Entries expire after the route's
+``ttl`` and are dropped early by ``invalidate(tag)``, which write handlers
+call with the tags of the data they changed.
+
+The cache is per process, so with several workers another process can
+serve a response up to ``ttl`` seconds old after a write.
+"""
+import functools
+import hashlib
+import os
+from datetime import datetime, timezone
+
+from flask import current_app, request
+
+import instrumentation
+from caching import TTLCache
+from http_cache import conditional_json, strong_etag
+
+response_cache_lookups = instrumentation.registry.register(instrumentation.Counter(
+    'agora_response_cache_lookups_total', 'Cached GET responses by route and result', ('route', 'result'),
+))
+
+
+class _CachedResponse:
+    __slots__ = ('body', 'etag', 'tags', 'stored_at')
+
+    def __init__(self, body, etag, tags, stored_at):
+        self.body = body
+        self.etag = etag
+        self.tags = tags
+        self.stored_at = stored_at
+
+
+def viewer_key():
+    """Who is asking: the ``user_id`` argument or a hash of the bearer token"""
+    authorization = request.headers.get('Authorization')
+    token = hashlib.sha256(authorization.encode('utf-8')).hexdigest()[:16] if authorization else None
+    return request.args.get('user_id'), token
+
+
+class ResponseCache:
+    """Serialized GET responses with ETags, invalidated by tag"""
+
+    def __init__(self, maxsize=5000, default_ttl=30.0, enabled=True):
+        self.default_ttl = default_ttl
+        self.enabled = enabled
+        self._entries = TTLCache(maxsize=maxsize, ttl=default_ttl)
+
+    def cached(self, ttl=None, tags=(), public=False):
+        """Decorator for a GET handler.
+
+        ``tags`` are format strings filled from the URL arguments, e.g.
+        ``'paper:{paper_id}'``. ``public`` routes return the same data to
+        every viewer and share one entry per URL.
+        """
+        def decorator(function):
+            if not self.enabled:
+                return function
+
+            @functools.wraps(function)
+            def wrapper(**view_args):
+                route = request.url_rule.rule
+                key = (
+                    request.endpoint,
+                    tuple(sorted(view_args.items())),
+                    tuple(sorted(request.args.items(multi=True))),
+                    None if public else viewer_key(),
+                )
+                entry = self._entries.get(key)
+                if entry is not None:
+                    instrumentation.registry.inc(response_cache_lookups, (route, 'hit'))
+                    return self._respond(entry, public)
+                instrumentation.registry.inc(response_cache_lookups, (route, 'miss'))
+
+                generation = self._entries.generation
+                response = current_app.make_response(function(**view_args))
+                if response.status_code != 200 or response.mimetype != 'application/json':
+                    return response
+
+                entry_tags = frozenset(tag.format(**view_args) for tag in tags)
+                if response.is_streamed:
+                    # Stream this one through and keep the body once it has been sent
+                    response.response = self._store_streamed(response.response, key, entry_tags, ttl, generation)
+                    return response
+                entry = self._store(key, response.get_data(), entry_tags, ttl, generation)
+                return self._respond(entry, public)
+            return wrapper
+        return decorator
+
+    def _store(self, key, body, tags, ttl, generation):
+        entry = _CachedResponse(body, strong_etag(body), tags, datetime.now(timezone.utc).replace(microsecond=0))
+        # Not stored if a write invalidated entries while the handler ran
+        self._entries.set(key, entry, ttl=ttl, generation=generation)
+        return entry
+
+    def _store_streamed(self, chunks, key, tags, ttl, generation):
+        parts = []
+        for chunk in chunks:
+            parts.append(chunk)
+            yield chunk
+        self._store(key, b''.join(parts), tags, ttl, generation)
+
+    @staticmethod
+    def _respond(entry, public):
+        return conditional_json(entry.body, entry.etag, private=not public, last_modified=entry.stored_at)
+
+    def invalidate(self, *tags):
+        """Drop every cached response carrying any of ``tags``"""
+        tags = frozenset(tags)
+        return self._entries.discard_where(lambda key, entry: not tags.isdisjoint(entry.tags))
+
+    def clear(self):
+        self._entries.clear()
+
+
+def create_response_cache():
+    """Response cache configured from ``AGORA_RESPONSE_CACHE*`` environment variables"""
+    return ResponseCache(
+        maxsize=int(os.environ.get("AGORA_RESPONSE_CACHE_SIZE", 5000)),
+        default_ttl=float(os.environ.get("AGORA_RESPONSE_CACHE_SECONDS", 30)),
+        enabled=os.environ.get("AGORA_RESPONSE_CACHE", "1") != "0",
+    )
@@ -0,0 +1,696 @@
+"""In-process full-text search over papers, ranked with BM25.
+
+``search_papers`` matched ``title.ilike.%q%`` or ``abstract.ilike.%q%``
+upstream: a sequential scan, results in no particular order, and the raw
+query pasted into the filter string. ``SearchIndex`` is an inverted index
+over each paper's title, abstract, category name and author names.
+
+* Text is lower-cased, split into words, stripped of stop words and reduced
+  with a light suffix-stripping stemmer, so "networks" finds "network".
+* Each term keeps a postings list of flat arrays: document numbers (always
+  increasing, since a changed paper is re-added under a new number), the
+  field-weighted term frequency, and the word positions used for phrases.
+  Removed documents are skipped and compacted away once they pile up.
+* Queries are a list of required clauses: words, ``"quoted phrases"`` and
+  ``prefix*`` words. Matches are ranked with BM25 (title and author
+  matches weigh more than abstract matches).
+* Each category, status and publication year keeps the set of documents
+  that have it, with a bitmap (a Python int, one bit per document number)
+  built from it on first use. ``find`` intersects the query matches, the
+  viewer's visibility and the requested filters as bitmaps and counts each
+  facet value with ``&`` and a popcount, so facet counts cost no upstream
+  queries and stay cheap as the catalog grows. Hits sort by BM25 score,
+  ``submitted_at`` or a popularity score computed from engagement totals.
+
+``PaperSearch`` loads the index, and the typeahead ``SuggestIndex``, from
+Supabase in the background and rebuilds them every ``rebuild_interval``
+seconds, which also picks up papers written by other processes. Handlers
+update both as papers are created or change status, and pick up new
+engagement totals from ``EngagementCounters`` after each reconcile. Until
+the first build finishes, ``find`` returns None and callers fall back to
+the database. Callers still re-read the hits they return with their
+visibility filters, so a stale index entry can't leak a paper.
+"""
+import math
+import os
+import re
+import threading
+import time
+from array import array
+from bisect import bisect_left, insort
+from operator import attrgetter
+
+from suggest_index import SuggestIndex
+
+PAGE_SIZE = 1000
+
+PAPER_COLUMNS = 'id, title, abstract, status, category_id, submitted_at'
+
+# (field, weight); the field number is stored in the top bits of each position
+FIELDS = (('title', 3.0), ('authors', 2.0), ('category', 1.5), ('abstract', 1.0))
+POSITION_BITS = 20
+POSITION_MASK = (1 << POSITION_BITS) - 1
+
+K1 = 1.2
+B = 0.75
+MAX_PREFIX_TERMS = 50
+
+FACETS = ('category', 'status', 'year')
+SORTS = ('relevance', 'date', 'popularity')
+
+# Engagement total -> weight in the popularity score; feedback is private to authors
+POPULARITY_WEIGHTS = {'likes': 5, 'comments': 3, 'views': 1}
+
+STOP_WORDS = frozenset((
+    'a an and are as at be but by for from has have in into is it its of on or '
+    'that the their there these this to was were which with'
+).split())
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+_QUERY = re.compile(r'"([^"]*)"|(\S+)')
+
+# Longest suffix first; (suffix, replacement)
+_SUFFIXES = (
+    ('ational', 'ate'), ('ization', 'ize'), ('fulness', 'ful'), ('iveness', 'ive'),
+    ('ousness', 'ous'), ('ations', 'ate'), ('ation', 'ate'), ('ities', 'ity'),
+    ('ments', ''), ('ment', ''), ('ness', ''), ('ings', ''), ('ing', ''),
+    ('ies', 'y'), ('ied', 'y'), ('sses', 'ss'), ('edly', ''), ('ed', ''),
+    ('ly', ''), ('es', 'e'), ('s', ''),
+)
+
+
+def stem(word):
+    """Strip common English inflections; conservative on short words"""
+    if len(word) <= 3 or word.isdigit():
+        return word
+    for suffix, replacement in _SUFFIXES:
+        if word.endswith(suffix):
+            base = word[:-len(suffix)] + replacement
+            if len(base) < 3 or (suffix == 's' and word.endswith(('ss', 'us', 'is'))):
+                continue
+            word = base
+            break
+    # "running" -> "runn" -> "run", "computed"/"compute" -> "comput"
+    if len(word) >= 4 and word[-1] == word[-2] and word[-1] not in 'lsz':
+        word = word[:-1]
+    if len(word) > 4 and word.endswith('e'):
+        word = word[:-1]
+    return word
+
+
+def tokenize(text):
+    """``(position, term)`` for each indexed word; stop words keep their position"""
+    tokens = []
+    for position, match in enumerate(_WORD.finditer((text or '').lower())):
+        word = match.group()
+        if word not in STOP_WORDS:
+            tokens.append((position, stem(word)))
+    return tokens
+
+
+def parse_query(query):
+    """Clauses of a query: ``('term', t)``, ``('prefix', p)`` or ``('phrase', [(offset, t), ...])``"""
+    clauses = []
+    for phrase, word in _QUERY.findall(query or ''):
+        if phrase:
+            tokens = tokenize(phrase)
+            if len(tokens) > 1:
+                start = tokens[0][0]
+                clauses.append(('phrase', [(position - start, term) for position, term in tokens]))
+            elif tokens:
+                clauses.append(('term', tokens[0][1]))
+        elif word.endswith('*') and len(word.rstrip('*')) >= 2:
+            prefix = ''.join(_WORD.findall(word.lower()))
+            if prefix:
+                clauses.append(('prefix', prefix))
+        else:
+            clauses.extend(('term', term) for _, term in tokenize(word))
+    return clauses
+
+
+def popularity(totals):
+    """Popularity score of a paper's ``{'likes', 'comments', 'views'}`` totals"""
+    return sum(weight * (totals.get(kind) or 0) for kind, weight in POPULARITY_WEIGHTS.items())
+
+
+def to_bitmap(docnos):
+    """Bitmap with the bits of ``docnos`` set"""
+    if not docnos:
+        return 0
+    bits = bytearray((max(docnos) >> 3) + 1)
+    for docno in docnos:
+        bits[docno >> 3] |= 1 << (docno & 7)
+    return int.from_bytes(bits, 'little')
+
+
+# Bits set in each byte value
+_BYTE_BITS = tuple(tuple(bit for bit in range(8) if byte >> bit & 1) for byte in range(256))
+
+
+def from_bitmap(bitmap):
+    """Document numbers set in ``bitmap``, in increasing order"""
+    docnos = []
+    for index, byte in enumerate(bitmap.to_bytes((bitmap.bit_length() + 7) >> 3, 'little')):
+        if byte:
+            base = index << 3
+            docnos.extend(base + bit for bit in _BYTE_BITS[byte])
+    return docnos
+
+
+def popcount(bitmap):
+    return bin(bitmap).count('1')
+
+
+class _Postings:
+    __slots__ = ('docs', 'weights', 'starts', 'positions')
+
+    def __init__(self):
+        self.docs = array('I')
+        self.weights = array('f')
+        self.starts = array('I')
+        self.positions = array('I')
+
+    def add(self, docno, weight, positions):
+        self.docs.append(docno)
+        self.weights.append(weight)
+        self.starts.append(len(self.positions))
+        self.positions.extend(positions)
+
+    def find(self, docno):
+        index = bisect_left(self.docs, docno)
+        return index if index < len(self.docs) and self.docs[index] == docno else -1
+
+    def positions_at(self, index):
+        end = self.starts[index + 1] if index + 1 < len(self.starts) else len(self.positions)
+        return self.positions[self.starts[index]:end]
+
+    def without(self, removed):
+        """Copy without the postings of ``removed`` document numbers"""
+        kept = _Postings()
+        for index, docno in enumerate(self.docs):
+            if docno not in removed:
+                kept.add(docno, self.weights[index], self.positions_at(index))
+        return kept
+
+
+class IndexedPaper:
+    """What the index keeps about a paper besides its terms"""
+    __slots__ = ('paper_id', 'status', 'category_id', 'submitted_at', 'popularity', 'length')
+
+    def __init__(self, paper_id, status, category_id, submitted_at, popularity, length):
+        self.paper_id = paper_id
+        self.status = status
+        self.category_id = category_id
+        self.submitted_at = submitted_at
+        self.popularity = popularity
+        self.length = length
+
+    @property
+    def year(self):
+        return int(self.submitted_at[:4]) if self.submitted_at[:4].isdigit() else None
+
+    def facet_values(self):
+        """``(facet, value)`` pairs the paper is counted under"""
+        values = (
+            ('category', None if self.category_id is None else str(self.category_id)),
+            ('status', self.status),
+            ('year', self.year),
+        )
+        return [(facet, value) for facet, value in values if value is not None]
+
+
+class SearchIndex:
+    """Inverted index with BM25 ranking; safe to share between threads"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._postings = {}
+        self._vocabulary = []
+        self._papers = {}
+        self._docnos = {}
+        self._removed = set()
+        self._next_docno = 0
+        self._total_length = 0.0
+        self._facet_docs = {facet: {} for facet in FACETS}
+        self._bitmaps = {}
+
+    def __len__(self):
+        return len(self._papers)
+
+    def add(self, paper, author_names=(), category_name=None, popularity=None):
+        """Index ``paper`` (a papers row), replacing any earlier version of it.
+
+        ``popularity`` defaults to the earlier version's score, or 0.
+        """
+        texts = {
+            'title': paper.get('title'),
+            'abstract': paper.get('abstract'),
+            'category': category_name,
+            'authors': ' '.join(name for name in author_names if name),
+        }
+        weights, positions = {}, {}
+        length = 0.0
+        for field_number, (field, field_weight) in enumerate(FIELDS):
+            tokens = tokenize(texts[field])
+            length += field_weight * len(tokens)
+            for position, term in tokens:
+                weights[term] = weights.get(term, 0.0) + field_weight
+                positions.setdefault(term, []).append((field_number << POSITION_BITS) | min(position, POSITION_MASK))
+
+        with self._lock:
+            if popularity is None:
+                old = self.get(paper['id'])
+                popularity = old.popularity if old is not None else 0
+            self._remove(str(paper['id']))
+            docno = self._next_docno
+            self._next_docno += 1
+            for term, weight in weights.items():
+                postings = self._postings.get(term)
+                if postings is None:
+                    postings = self._postings[term] = _Postings()
+                    insort(self._vocabulary, term)
+                postings.add(docno, weight, positions[term])
+            indexed = IndexedPaper(
+                str(paper['id']),
+                paper.get('status'),
+                paper.get('category_id'),
+                str(paper.get('submitted_at') or ''),
+                popularity,
+                length,
+            )
+            self._papers[docno] = indexed
+            self._docnos[str(paper['id'])] = docno
+            self._tag(docno, indexed)
+            self._total_length += length
+
+    def remove(self, paper_id):
+        with self._lock:
+            self._remove(str(paper_id))
+
+    def _remove(self, paper_id):
+        docno = self._docnos.pop(paper_id, None)
+        if docno is None:
+            return
+        paper = self._papers.pop(docno)
+        self._untag(docno, paper)
+        self._total_length -= paper.length
+        self._removed.add(docno)
+        if len(self._removed) > max(1000, len(self._papers) // 5):
+            self._compact()
+
+    def _compact(self):
+        removed = self._removed
+        for term in list(self._postings):
+            postings = self._postings[term].without(removed)
+            if postings.docs:
+                self._postings[term] = postings
+            else:
+                del self._postings[term]
+        self._vocabulary = sorted(self._postings)
+        self._removed = set()
+
+    def get(self, paper_id):
+        with self._lock:
+            docno = self._docnos.get(str(paper_id))
+            return None if docno is None else self._papers[docno]
+
+    def _tag(self, docno, paper):
+        for facet, value in paper.facet_values():
+            self._facet_docs[facet].setdefault(value, set()).add(docno)
+            self._bitmaps.pop((facet, value), None)
+        self._bitmaps.pop((None, None), None)
+
+    def _untag(self, docno, paper):
+        for facet, value in paper.facet_values():
+            docs = self._facet_docs[facet].get(value)
+            docs.discard(docno)
+            if not docs:
+                del self._facet_docs[facet][value]
+            self._bitmaps.pop((facet, value), None)
+        self._bitmaps.pop((None, None), None)
+
+    def _bitmap(self, facet, value):
+        """Bitmap of the papers with ``value`` for ``facet``; ``(None, None)`` is every paper"""
+        bitmap = self._bitmaps.get((facet, value))
+        if bitmap is None:
+            docs = self._papers if facet is None else self._facet_docs[facet].get(value, ())
+            bitmap = self._bitmaps[(facet, value)] = to_bitmap(docs)
+        return bitmap
+
+    def set_status(self, paper_id, status):
+        with self._lock:
+            docno = self._docnos.get(str(paper_id))
+            if docno is not None:
+                paper = self._papers[docno]
+                self._untag(docno, paper)
+                paper.status = status
+                self._tag(docno, paper)
+
+    def set_popularity(self, paper_id, score):
+        with self._lock:
+            paper = self.get(paper_id)
+            if paper is not None:
+                paper.popularity = score
+
+    def _live_docs(self, term):
+        postings = self._postings.get(term)
+        if postings is None:
+            return set()
+        return {docno for docno in postings.docs if docno in self._papers}
+
+    def _prefix_terms(self, prefix):
+        start = bisect_left(self._vocabulary, prefix)
+        terms = []
+        for term in self._vocabulary[start:]:
+            if not term.startswith(prefix):
+                break
+            terms.append(term)
+        stemmed = stem(prefix)
+        if stemmed != prefix and stemmed in self._postings:
+            terms.append(stemmed)
+        # Keep the most common expansions
+        terms.sort(key=lambda term: len(self._postings[term].docs), reverse=True)
+        return terms[:MAX_PREFIX_TERMS]
+
+    def _phrase_docs(self, terms, candidates):
+        """Candidates in which the phrase terms appear at consecutive positions"""
+        matched = set()
+        first_offset, first_term = terms[0]
+        first = self._postings[first_term]
+        for docno in candidates:
+            starts = {position - first_offset for position in first.positions_at(first.find(docno))}
+            for offset, term in terms[1:]:
+                postings = self._postings[term]
+                positions = set(postings.positions_at(postings.find(docno)))
+                starts = {start for start in starts if start + offset in positions}
+                if not starts:
+                    break
+            if starts:
+                matched.add(docno)
+        return matched
+
+    def _match(self, clauses):
+        """Live documents matching every clause, and the terms to score them on"""
+        scored_terms = []
+        candidates = None
+        phrases = []
+        for kind, value in clauses:
+            if kind == 'term':
+                terms = [value]
+                docs = self._live_docs(value)
+            elif kind == 'prefix':
+                terms = self._prefix_terms(value)
+                docs = set().union(*(self._live_docs(term) for term in terms)) if terms else set()
+            else:
+                terms = [term for _, term in value]
+                docs = set.intersection(*(self._live_docs(term) for term in terms))
+                phrases.append(value)
+            candidates = docs if candidates is None else candidates & docs
+            if not candidates:
+                return set(), []
+            scored_terms.extend(terms)
+        for phrase in phrases:
+            candidates = self._phrase_docs(phrase, candidates)
+        return candidates, list(dict.fromkeys(scored_terms))
+
+    def find(self, query=None, is_staff=False, own_paper_ids=(), filters=None, sort='relevance', facets=()):
+        """Papers the viewer may see that match ``query`` and ``filters``, with facet counts.
+
+        Returns ``(hits, counts)``, or None if ``query`` is given but has no
+        searchable words. Without a query every visible paper matches.
+        ``hits`` are ``[(paper_id, key), ...]`` sorted on ``(key, paper_id)``
+        descending, where ``key`` is the BM25 score (``'relevance'``, only
+        with a query; otherwise ``'date'`` is used), ``submitted_at``
+        (``'date'``) or the popularity score (``'popularity'``).
+        ``filters`` maps facets to the one value to keep. ``counts`` maps
+        each facet in ``facets`` to ``{value: papers}`` over the hits, with
+        that facet's own filter left out so the other values stay visible.
+        """
+        clauses = parse_query(query) if query else []
+        if query and not clauses:
+            return None
+        filters = {facet: value for facet, value in (filters or {}).items() if value is not None}
+        with self._lock:
+            terms = []
+            if clauses:
+                candidates, terms = self._match(clauses)
+                base = to_bitmap(candidates)
+            else:
+                base = self._bitmap(None, None)
+            if not is_staff:
+                own = [self._docnos[str(paper_id)] for paper_id in own_paper_ids if str(paper_id) in self._docnos]
+                base &= self._bitmap('status', 'published') | to_bitmap(own)
+
+            masks = {facet: self._bitmap(facet, value) for facet, value in filters.items()}
+            matched = base
+            for mask in masks.values():
+                matched &= mask
+
+            counts = {}
+            for facet in facets:
+                scope = base
+                for other, mask in masks.items():
+                    if other != facet:
+                        scope &= mask
+                counts[facet] = {}
+                for value in self._facet_docs[facet]:
+                    count = popcount(scope & self._bitmap(facet, value))
+                    if count:
+                        counts[facet][value] = count
+
+            docnos = from_bitmap(matched)
+            if sort == 'relevance' and terms:
+                return self._rank(docnos, terms), counts
+            key = attrgetter('popularity' if sort == 'popularity' else 'submitted_at')
+            hits = [(paper.paper_id, key(paper)) for paper in map(self._papers.__getitem__, docnos)]
+        hits.sort(key=lambda hit: (hit[1], hit[0]), reverse=True)
+        return hits, counts
+
+    def _rank(self, candidates, terms):
+        count = len(self._papers)
+        average_length = self._total_length / count if count else 1.0
+        scores = dict.fromkeys(candidates, 0.0)
+        for term in terms:
+            postings = self._postings.get(term)
+            if postings is None:
+                continue
+            frequency = sum(1 for docno in postings.docs if docno in self._papers)
+            idf = math.log(1 + (count - frequency + 0.5) / (frequency + 0.5))
+            for docno in candidates:
+                index = postings.find(docno)
+                if index < 0:
+                    continue
+                weight = postings.weights[index]
+                norm = K1 * (1 - B + B * self._papers[docno].length / (average_length or 1.0))
+                scores[docno] += idf * weight * (K1 + 1) / (weight + norm)
+        ranked = [(self._papers[docno].paper_id, round(score, 6)) for docno, score in scores.items()]
+        ranked.sort(key=lambda hit: (hit[1], hit[0]), reverse=True)
+        return ranked
+
+
+class _Indexes:
+    __slots__ = ('search', 'suggest')
+
+    def __init__(self):
+        self.search = SearchIndex()
+        self.suggest = SuggestIndex()
+
+
+class PaperSearch:
+    """Keeps a ``SearchIndex`` and a ``SuggestIndex`` of all papers in sync with the database"""
+
+    def __init__(self, client, categories, queue=None, rebuild_interval=900.0):
+        self.client = client
+        self.categories = categories
+        self.queue = queue
+        self.rebuild_interval = rebuild_interval
+        self._indexes = None
+        self._lock = threading.Lock()
+        self._replay = None
+        self._built_at = None
+        self._next_rebuild = None
+        if queue is not None:
+            queue.register('rebuild_search_index', self.rebuild)
+            queue.register('index_paper', self.index_paper)
+
+    @property
+    def ready(self):
+        return self._indexes is not None
+
+    def find(self, query=None, **options):
+        """``SearchIndex.find`` results, or None while the index is being built for the first time"""
+        indexes = self._indexes
+        if indexes is None:
+            return None
+        return indexes.search.find(query, **options)
+
+    def suggest(self, prefix, limit=8, viewer_id=None, is_staff=False):
+        """Typeahead completions; empty while the index is being built"""
+        indexes = self._indexes
+        if indexes is None:
+            return []
+        return indexes.suggest.suggest(prefix, limit, viewer_id, is_staff)
+
+    def get(self, paper_id):
+        indexes = self._indexes
+        return None if indexes is None else indexes.search.get(paper_id)
+
+    def _fetch_all(self, table, columns, order='id'):
+        # Pages in a stable order; stop at the first empty page, since the
+        # server may cap a page below PAGE_SIZE. The end of range() is
+        # exclusive in postgrest 0.10.7.
+        rows = []
+        while True:
+            page = self.client.table(table)\
+                .select(columns)\
+                .order(order)\
+                .range(len(rows), len(rows) + PAGE_SIZE)\
+                .execute()
+            if not page.data:
+                return rows
+            rows.extend(page.data)
+
+    def _authors(self, rows):
+        """``(author_id, full_name)`` pairs by paper id"""
+        authors = {}
+        for row in rows:
+            name = (row.get('profiles') or {}).get('full_name')
+            authors.setdefault(str(row['paper_id']), []).append((row['author_id'], name))
+        return authors
+
+    def _engagement(self):
+        """Popularity score by paper id from the ``paper_engagement_counts`` summaries"""
+        try:
+            rows = self._fetch_all('paper_engagement_counts', 'paper_id, like_count, comment_count, view_count', order='paper_id')
+        except Exception as e:
+            # e.g. sql/paper_engagement_counts.sql not applied yet; rank without popularity
+            print(f"Error reading engagement counts for the search index: {str(e)}")
+            return {}
+        return {
+            str(row['paper_id']): popularity({
+                'likes': row.get('like_count'),
+                'comments': row.get('comment_count'),
+                'views': row.get('view_count'),
+            })
+            for row in rows
+        }
+
+    def _add(self, indexes, paper, authors, presorted=False, popularity=None):
+        paper_authors = authors.get(str(paper['id']), ())
+        category = self.categories.get(paper.get('category_id'))
+        indexes.search.add(paper, [name for _, name in paper_authors], category and category.get('name'), popularity)
+        indexes.suggest.add_paper(paper, paper_authors, presorted)
+
+    @staticmethod
+    def _remove(indexes, paper_id):
+        indexes.search.remove(paper_id)
+        indexes.suggest.remove_paper(paper_id)
+
+    @staticmethod
+    def _set_status(indexes, paper_id, status):
+        indexes.search.set_status(paper_id, status)
+        indexes.suggest.set_status(paper_id, status)
+
+    @staticmethod
+    def _set_popularity(indexes, paper_id, score):
+        indexes.search.set_popularity(paper_id, score)
+
+    def schedule_rebuild(self, delay):
+        """Queue the next rebuild unless one is already due later"""
+        if self.queue is None or self.queue.stopping:
+            return
+        with self._lock:
+            now = time.time()
+            if self._next_rebuild is not None and self._next_rebuild > now:
+                return
+            self._next_rebuild = now + delay
+        self.queue.enqueue_in(delay, 'rebuild_search_index')
+
+    def rebuild(self, force=False):
+        """Build fresh indexes from the database and swap them in"""
+        if self.queue is not None and self.queue.stopping:
+            return
+        # A rebuild job persisted by an earlier run can land right after ours
+        recent = self._built_at is not None and time.time() - self._built_at < self.rebuild_interval / 2
+        if recent and not force:
+            return self.schedule_rebuild(self.rebuild_interval)
+        start = time.perf_counter()
+        try:
+            with self._lock:
+                self._replay = []
+            papers = self._fetch_all('papers', PAPER_COLUMNS)
+            authors = self._authors(self._fetch_all('paper_authors', 'paper_id, author_id, profiles(full_name)'))
+            engagement = self._engagement()
+            indexes = _Indexes()
+            for category in self.categories.all():
+                indexes.suggest.add_category(category['id'], category.get('name'))
+            for paper in papers:
+                self._add(indexes, paper, authors, True, engagement.get(str(paper['id']), 0))
+            indexes.suggest.finish_bulk_load()
+            with self._lock:
+                # Changes that landed while we were reading
+                for method, args in self._replay:
+                    method(indexes, *args)
+                self._replay = None
+                self._indexes = indexes
+            self._built_at = time.time()
+            print(f"Built search index of {len(indexes.search)} papers in {time.perf_counter() - start:.1f}s")
+        except Exception as e:
+            with self._lock:
+                self._replay = None
+            print(f"Error building search index: {str(e)}")
+        finally:
+            if self.rebuild_interval:
+                self.schedule_rebuild(self.rebuild_interval)
+
+    def _apply(self, method, *args):
+        with self._lock:
+            if self._replay is not None:
+                self._replay.append((method, args))
+            indexes = self._indexes
+        if indexes is not None:
+            method(indexes, *args)
+
+    def index_paper(self, paper_id):
+        """Re-read one paper and its authors into the indexes"""
+        paper = self.client.table('papers')\
+            .select(PAPER_COLUMNS)\
+            .eq('id', paper_id)\
+            .execute()
+        if not paper.data:
+            self._apply(self._remove, str(paper_id))
+            return
+        authors = self._authors(
+            self.client.table('paper_authors')
+            .select('paper_id, author_id, profiles(full_name)')
+            .eq('paper_id', paper_id)
+            .execute()
+            .data
+        )
+        self._apply(lambda indexes, row: self._add(indexes, row, authors), paper.data[0])
+
+    def paper_changed(self, paper_id):
+        """Schedule a re-read of a created or edited paper"""
+        if self.queue is None:
+            return self.index_paper(paper_id)
+        self.queue.enqueue('index_paper', paper_id)
+
+    def set_status(self, paper_id, status):
+        self._apply(self._set_status, str(paper_id), status)
+
+    def engagement_changed(self, totals):
+        """Update popularity from ``{paper_id: totals}``; an ``EngagementCounters`` listener"""
+        for paper_id, paper_totals in totals.items():
+            self._apply(self._set_popularity, str(paper_id), popularity(paper_totals))
+
+
+def create_paper_search(client, categories, queue=None):
+    """Paper search configured from ``AGORA_SEARCH_*`` environment variables, or None when disabled"""
+    if os.environ.get("AGORA_SEARCH_INDEX", "1") == "0":
+        return None
+    return PaperSearch(
+        client,
+        categories,
+        queue,
+        rebuild_interval=float(os.environ.get("AGORA_SEARCH_REBUILD_SECONDS", 900)),
+    )
@@ -0,0 +1,101 @@
+"""Reuse of signed storage URLs.
+
+Every shared PDF download used to ask the storage API for a fresh 60-second
+signed URL. ``SignedUrlCache`` signs URLs with a longer lifetime and hands
+out the cached URL until ``refresh_margin`` seconds before it expires, so
+a client always gets at least that long to use it. ``get_many`` signs all
+uncached paths of a list view with a single ``create_signed_urls`` call.
+storage3 raises for the whole call if any path can't be signed, so then
+each path is signed on its own and the failing ones are left out.
+"""
+import os
+
+import instrumentation
+from caching import TTLCache
+
+signed_url_lookups = instrumentation.registry.register(instrumentation.Counter(
+    'agora_signed_url_lookups_total', 'Signed URL requests by bucket and cache result', ('bucket', 'result'),
+))
+
+
+def storage_path(pdf_url):
+    """Object name inside the bucket for a stored ``pdf_url``"""
+    return pdf_url.split('/').pop() if pdf_url else None
+
+
+def _signed_url(item):
+    # storage3 returns ``signedURL``; some versions and the JS client use ``signedUrl``
+    return item.get('signedURL') or item.get('signedUrl')
+
+
+class SignedUrlCache:
+    """Signed URLs for one bucket, cached per object until shortly before they expire"""
+
+    def __init__(self, storage, bucket='papers', expires_in=3600, refresh_margin=300, maxsize=10000):
+        if refresh_margin >= expires_in:
+            raise ValueError("refresh_margin must be shorter than expires_in")
+        self.storage = storage
+        self.bucket = bucket
+        self.expires_in = expires_in
+        self.refresh_margin = refresh_margin
+        self._urls = TTLCache(maxsize=maxsize, ttl=expires_in - refresh_margin)
+
+    def get(self, path):
+        """Signed URL for ``path``, signing a new one only when needed"""
+        url = self._urls.get(path)
+        if url is not None:
+            instrumentation.registry.inc(signed_url_lookups, (self.bucket, 'hit'))
+            return url
+        instrumentation.registry.inc(signed_url_lookups, (self.bucket, 'miss'))
+        return self._sign(path)
+
+    def _sign(self, path):
+        response = self.storage.from_(self.bucket).create_signed_url(path, self.expires_in)
+        url = _signed_url(response)
+        if not url:
+            raise ValueError(f"Failed to sign {self.bucket}/{path}")
+        self._urls.set(path, url)
+        return url
+
+    def get_many(self, paths):
+        """``{path: signed URL}`` for every path that could be signed, in one storage call if they all can"""
+        urls = {}
+        missing = []
+        for path in dict.fromkeys(path for path in paths if path):
+            url = self._urls.get(path)
+            if url is None:
+                missing.append(path)
+            else:
+                urls[path] = url
+        instrumentation.registry.inc(signed_url_lookups, (self.bucket, 'hit'), len(urls))
+        if missing:
+            instrumentation.registry.inc(signed_url_lookups, (self.bucket, 'miss'), len(missing))
+            try:
+                signed = self.storage.from_(self.bucket).create_signed_urls(missing, self.expires_in)
+            except Exception as e:
+                print(f"Error signing {len(missing)} {self.bucket} paths, signing them one by one: {str(e)}")
+                for path in missing:
+                    try:
+                        urls[path] = self._sign(path)
+                    except Exception as e:
+                        print(f"Error signing {self.bucket}/{path}: {str(e)}")
+                return urls
+            for item in signed:
+                url = _signed_url(item)
+                if url and not item.get('error'):
+                    self._urls.set(item['path'], url)
+                    urls[item['path']] = url
+        return urls
+
+    def invalidate(self, path):
+        self._urls.pop(path)
+
+
+def create_signed_url_cache(storage, bucket='papers'):
+    """Signed URL cache configured from ``AGORA_SIGNED_URL_*`` environment variables"""
+    return SignedUrlCache(
+        storage,
+        bucket,
+        expires_in=int(os.environ.get("AGORA_SIGNED_URL_SECONDS", 3600)),
+        refresh_margin=int(os.environ.get("AGORA_SIGNED_URL_REFRESH_MARGIN_SECONDS", 300)),
+    )
@@ -0,0 +1,26 @@
+-- Create a paper and all of its paper_authors rows in one transaction.
+-- Used by POST /api/papers when AGORA_PAPER_RPC=1.
+--
+--   paper:   {"title", "abstract", "category_id", "status", "pdf_url"}
+--   authors: [{"author_id", "is_corresponding", "author_order"}, ...]
+--
+-- Returns the id of the new paper.
+create or replace function create_paper_with_authors(paper jsonb, authors jsonb)
+returns uuid
+language plpgsql
+as $$
+declare
+    new_paper_id uuid;
+begin
+    insert into papers (title, abstract, category_id, status, pdf_url)
+    select title, abstract, category_id, status, pdf_url
+    from jsonb_populate_record(null::papers, paper)
+    returning id into new_paper_id;
+
+    insert into paper_authors (paper_id, author_id, is_corresponding, author_order)
+    select new_paper_id, author_id, is_corresponding, author_order
+    from jsonb_populate_recordset(null::paper_authors, authors);
+
+    return new_paper_id;
+end;
+$$;
@@ -0,0 +1,31 @@
+-- Apply buffered engagement deltas to the summary tables in one atomic call.
+-- Called by counters.py with
+--
+--   deltas:     [{"paper_id", "like_count", "comment_count", "feedback_count", "view_count"}, ...]
+--   day_deltas: [{"paper_id", "day", "view_count"}, ...]
+--
+-- The increments happen in the upserts, so concurrent flushes from several
+-- backend processes never overwrite each other. Returns the updated rows.
+create or replace function increment_paper_engagement_counts(deltas jsonb, day_deltas jsonb)
+returns setof paper_engagement_counts
+language sql
+as $$
+    insert into paper_view_daily as v (paper_id, day, view_count)
+    select d.paper_id, d.day, d.view_count
+    from jsonb_to_recordset(day_deltas) as d(paper_id uuid, day date, view_count integer)
+    on conflict (paper_id, day) do update
+    set view_count = greatest(0, v.view_count + excluded.view_count);
+
+    insert into paper_engagement_counts as c (paper_id, like_count, comment_count, feedback_count, view_count)
+    select d.paper_id, d.like_count, d.comment_count, d.feedback_count, d.view_count
+    from jsonb_to_recordset(deltas) as d(
+        paper_id uuid, like_count integer, comment_count integer, feedback_count integer, view_count integer
+    )
+    on conflict (paper_id) do update
+    set like_count = greatest(0, c.like_count + excluded.like_count),
+        comment_count = greatest(0, c.comment_count + excluded.comment_count),
+        feedback_count = greatest(0, c.feedback_count + excluded.feedback_count),
+        view_count = greatest(0, c.view_count + excluded.view_count),
+        updated_at = now()
+    returning c.*;
+$$;
@@ -0,0 +1,17 @@
+-- Apply summed shared-link view counts in one atomic statement.
+-- Called by shared_link_views.py with
+--
+--   deltas: [{"link_id", "views", "last_viewed_at"}, ...]
+--
+-- The increment happens in the UPDATE, so concurrent flushes from several
+-- backend processes never overwrite each other.
+create or replace function increment_shared_link_views(deltas jsonb)
+returns void
+language sql
+as $$
+    update paper_shared_links l
+    set view_count = coalesce(l.view_count, 0) + d.views,
+        last_viewed_at = greatest(l.last_viewed_at, d.last_viewed_at)
+    from jsonb_to_recordset(deltas) as d(link_id uuid, views integer, last_viewed_at timestamptz)
+    where l.id = d.link_id;
+$$;
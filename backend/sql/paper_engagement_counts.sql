@@ -0,0 +1,43 @@
+-- Summary tables behind counters.py. The backend adds every like, comment,
+-- feedback and view to them (increment_paper_engagement_counts.sql) and
+-- recounts the papers it wrote to against the raw tables every hour, so
+-- they only need to be backfilled once.
+
+create table if not exists paper_engagement_counts (
+    paper_id uuid primary key references papers(id) on delete cascade,
+    like_count integer not null default 0,
+    comment_count integer not null default 0,
+    feedback_count integer not null default 0,
+    view_count integer not null default 0,
+    updated_at timestamp with time zone not null default now()
+);
+
+create table if not exists paper_view_daily (
+    paper_id uuid not null references papers(id) on delete cascade,
+    day date not null,
+    view_count integer not null default 0,
+    primary key (paper_id, day)
+);
+
+-- Backfill from the existing rows
+insert into paper_engagement_counts (paper_id, like_count, comment_count, feedback_count, view_count)
+select
+    p.id,
+    (select count(*) from paper_likes where paper_id = p.id),
+    (select count(*) from paper_comments where paper_id = p.id),
+    (select count(*) from paper_feedback where paper_id = p.id),
+    (select count(*) from paper_views where paper_id = p.id)
+from papers p
+on conflict (paper_id) do update set
+    like_count = excluded.like_count,
+    comment_count = excluded.comment_count,
+    feedback_count = excluded.feedback_count,
+    view_count = excluded.view_count,
+    updated_at = now();
+
+insert into paper_view_daily (paper_id, day, view_count)
+select paper_id, viewed_at::date, count(*)
+from paper_views
+where viewed_at >= now() - interval '366 days'
+group by paper_id, viewed_at::date
+on conflict (paper_id, day) do update set view_count = excluded.view_count;
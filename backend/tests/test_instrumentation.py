@@ -0,0 +1,55 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import instrumentation
+from local_supabase import LocalSupabaseClient
+
+
+def _client():
+    local = LocalSupabaseClient()
+    local.table('profiles').insert([
+        {'id': 'a', 'full_name': 'Ada'},
+        {'id': 'b', 'full_name': 'Bea'},
+        {'id': 'c', 'full_name': 'Cy'},
+    ]).execute()
+    return instrumentation.InstrumentedClient(local)
+
+
+def _traced(run):
+    token = instrumentation.start_trace('test')
+    try:
+        result = run()
+        return result, instrumentation.current_trace().calls
+    finally:
+        instrumentation.end_trace(token)
+
+
+def test_chained_builder_methods_are_timed():
+    client = _client()
+    response, calls = _traced(lambda: client.table('profiles')
+                              .select('id').eq('id', 'b').execute())
+    assert [row['id'] for row in response.data] == ['b']
+    assert len(calls) == 1
+    kind, description, _ = calls[0]
+    assert kind == 'query'
+    assert description == "profiles.select('id').eq('id', 'b')"
+
+
+def test_builder_attribute_called_directly():
+    client = _client()
+    response, calls = _traced(lambda: client.table('profiles')
+                              .select('id').not_('id', 'in', '(a,b)')
+                              .order('full_name').execute())
+    assert [row['id'] for row in response.data] == ['c']
+    assert [call[0] for call in calls] == ['query']
+
+
+def test_builder_attribute_chained_without_calling():
+    client = _client()
+    response, calls = _traced(lambda: client.table('profiles')
+                              .select('id').not_.eq('id', 'a')
+                              .order('full_name').execute())
+    assert [row['id'] for row in response.data] == ['b', 'c']
+    assert len(calls) == 1
@@ -0,0 +1,121 @@
+"""Write-behind buffer for paper view logging.
+
+``log_paper_view`` used to run a "viewed in the last hour?" select and a
+single-row insert into ``paper_views`` for every page view. ``ViewBuffer``
+does the duplicate check against an in-memory TTL set keyed on the paper
+and the viewer (user id, or IP address for anonymous views) and appends
+accepted views to a bounded ring buffer. A flush job bulk-inserts the
+buffer once it holds ``batch_size`` views or ``flush_interval`` seconds
+after the first buffered view. The job queue drains pending jobs on
+shutdown, so buffered views are written on a graceful exit.
+
+The duplicate check is per process, so a view may be counted once more
+after a restart or when the same viewer hits another worker.
+"""
+import os
+import threading
+from collections import deque
+from datetime import datetime
+
+import instrumentation
+from caching import TTLCache
+
+view_outcomes = instrumentation.registry.register(instrumentation.Counter(
+    'agora_paper_views_total', 'Paper views by outcome in the write-behind buffer', ('outcome',),
+))
+
+
+class ViewBuffer:
+    """Deduplicates paper views in memory and writes them in batches"""
+
+    def __init__(self, client, queue=None, counters=None, batch_size=500, flush_interval=2.0,
+                 capacity=50000, dedup_window=3600, dedup_size=200000):
+        self.client = client
+        self.queue = queue
+        self.counters = counters
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._recent = TTLCache(maxsize=dedup_size, ttl=dedup_window)
+        self._buffer = deque(maxlen=capacity)
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._flush_scheduled = False
+        instrumentation.registry.register(instrumentation.Gauge(
+            'agora_view_buffer_depth', 'Paper views waiting to be written', (),
+            callback=lambda: {(): len(self._buffer)},
+        ))
+        if queue is not None:
+            queue.register('flush_paper_views', self.flush)
+
+    def log(self, paper_id, user_id=None, ip_address=None, user_agent=None):
+        """Buffer a view unless this viewer was already counted recently; True if buffered"""
+        viewer = user_id or ip_address
+        if viewer and not self._recent.add((paper_id, viewer)):
+            instrumentation.registry.inc(view_outcomes, ('duplicate',))
+            return False
+
+        view = {
+            "paper_id": paper_id,
+            "user_id": user_id,
+            "viewed_at": datetime.now().isoformat()
+        }
+        if ip_address:
+            view["ip_address"] = ip_address
+        if user_agent:
+            view["user_agent"] = user_agent
+
+        with self._lock:
+            if len(self._buffer) == self._buffer.maxlen:
+                # The ring buffer is full (writes have been failing); the oldest view is dropped
+                instrumentation.registry.inc(view_outcomes, ('dropped',))
+            self._buffer.append(view)
+            full = len(self._buffer) >= self.batch_size
+            schedule = full or not self._flush_scheduled
+            self._flush_scheduled = True
+        instrumentation.registry.inc(view_outcomes, ('buffered',))
+
+        if self.queue is None:
+            self.flush()
+        elif schedule:
+            self.queue.enqueue_in(0 if full else self.flush_interval, 'flush_paper_views')
+        return True
+
+    def pending(self):
+        with self._lock:
+            return len(self._buffer)
+
+    def flush(self):
+        """Bulk-insert every buffered view, ``batch_size`` rows per insert"""
+        with self._flush_lock:
+            written = 0
+            while True:
+                with self._lock:
+                    self._flush_scheduled = False
+                    batch = [self._buffer.popleft() for _ in range(min(self.batch_size, len(self._buffer)))]
+                if not batch:
+                    return written
+                try:
+                    self.client.table('paper_views').insert(batch).execute()
+                except Exception:
+                    # Put the batch back in order so the retried job writes it
+                    with self._lock:
+                        self._buffer.extendleft(reversed(batch))
+                    raise
+                written += len(batch)
+                instrumentation.registry.inc(view_outcomes, ('written',), len(batch))
+                if self.counters is not None:
+                    for view in batch:
+                        self.counters.record(view['paper_id'], 'views', at=view['viewed_at'])
+
+
+def create_view_buffer(client, queue=None, counters=None):
+    """View buffer configured from ``AGORA_VIEW_*`` environment variables"""
+    return ViewBuffer(
+        client,
+        queue,
+        counters,
+        batch_size=int(os.environ.get("AGORA_VIEW_BATCH_SIZE", 500)),
+        flush_interval=float(os.environ.get("AGORA_VIEW_FLUSH_SECONDS", 2)),
+        capacity=int(os.environ.get("AGORA_VIEW_BUFFER_CAPACITY", 50000)),
+        dedup_window=float(os.environ.get("AGORA_VIEW_DEDUP_SECONDS", 3600)),
+    )
@@ -0,0 +1,102 @@
+"""Which papers a user may see, resolved once and cached per user.
+
+``search_papers``, ``get_papers_by_category`` and the typeahead endpoint
+looked up the viewer's ``profiles.user_type`` and ``paper_authors`` rows on
+every request, then sent ``or(status.eq.published,id.in.(...))`` with one
+id per authored paper, so an author's filter (and URL) grew with every
+paper they wrote.
+
+``ViewerContexts.resolve`` returns a ``Viewer`` (staff flag plus the set of
+authored paper ids) from a short-lived cache, and ``create_paper`` drops
+the entries of the new paper's authors. Staff status comes from the
+``PermissionResolver`` cache (permissions.py).
+
+Visibility is then applied with filters of constant size: anonymous
+viewers and users without papers get ``status=published`` upstream, staff
+get no filter. Lists for authors read the published rows and, in batches
+of ``OWN_PAPER_BATCH`` ids, the author's unpublished papers, and merge
+them on the listing's sort order.
+"""
+import os
+
+from caching import TTLCache
+
+OWN_PAPER_BATCH = 100
+
+
+class Viewer:
+    """Staff flag and authored paper ids of the user a list is built for"""
+
+    __slots__ = ('user_id', 'is_staff', 'paper_ids')
+
+    def __init__(self, user_id=None, is_staff=False, paper_ids=frozenset()):
+        self.user_id = user_id
+        self.is_staff = is_staff
+        self.paper_ids = paper_ids
+
+    def can_see(self, paper):
+        return self.is_staff or paper.get('status') == 'published' or str(paper.get('id')) in self.paper_ids
+
+    def restrict(self, query):
+        """``query`` with the upstream part of the visibility filter"""
+        if self.is_staff or self.paper_ids:
+            return query
+        return query.eq('status', 'published')
+
+    def visible_rows(self, build_query, listing):
+        """Rows of ``build_query()`` the viewer may see, ordered and paged by ``listing``.
+
+        The select must include ``id`` and ``status``.
+        """
+        if self.is_staff or not self.paper_ids:
+            return listing.fetch(lambda: self.restrict(build_query()))
+        batches = [listing.fetch(lambda: build_query().eq('status', 'published'))]
+        paper_ids = sorted(self.paper_ids)
+        for start in range(0, len(paper_ids), OWN_PAPER_BATCH):
+            own = paper_ids[start:start + OWN_PAPER_BATCH]
+            batches.append(listing.fetch(lambda: build_query().in_('id', own).neq('status', 'published')))
+        return listing.merge(*batches)
+
+
+ANONYMOUS = Viewer()
+
+
+class ViewerContexts:
+    """Cached ``Viewer`` per user id"""
+
+    def __init__(self, client, permissions, maxsize=10000, ttl=30.0):
+        self.client = client
+        self.permissions = permissions
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    def resolve(self, user_id):
+        if not user_id:
+            return ANONYMOUS
+        user_id = str(user_id)
+        viewer = self._cache.get(user_id)
+        if viewer is not None:
+            return viewer
+        generation = self._cache.generation
+        viewer = self._load(user_id)
+        self._cache.set(user_id, viewer, generation=generation)
+        return viewer
+
+    def _load(self, user_id):
+        if self.permissions.is_staff(user_id):
+            return Viewer(user_id, is_staff=True)
+        authored = self.client.table('paper_authors').select('paper_id').eq('author_id', user_id).execute()
+        return Viewer(user_id, paper_ids=frozenset(str(row['paper_id']) for row in authored.data or ()))
+
+    def invalidate(self, *user_ids):
+        for user_id in user_ids:
+            self._cache.pop(str(user_id))
+
+
+def create_viewer_contexts(client, permissions):
+    """Viewer cache configured from ``AGORA_VIEWER_CACHE_*`` environment variables"""
+    return ViewerContexts(
+        client,
+        permissions,
+        maxsize=int(os.environ.get("AGORA_VIEWER_CACHE_SIZE", 10000)),
+        ttl=float(os.environ.get("AGORA_VIEWER_CACHE_SECONDS", 30)),
+    )